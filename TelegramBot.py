@@ -9,7 +9,10 @@ from telegram import Update
 from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters, ContextTypes
 from dotenv import load_dotenv
 
-from query_data import query_rag
+from intent_router import ASK_TOKEN
+from query_data import astream_rag
+from rag_runtime import get_runtime
+from telegram_streaming import stream_reply
 from Prime_Leads.main_graph import main_PrimeLeads
 
 
@@ -19,8 +22,6 @@ TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 # Simple in-memory state
 user_state = {}  # { user_id: "WAITING_PRIMELEADS_URL" }
 
-ASK_TOKEN = "[[ASK:PRIMELEADS_URL]]"
-
 def extract_url(text: str) -> str | None:
     """Grab the first http(s) URL and validate it."""
     m = re.search(r"(data/sample_website_url[^\s]+)", text, flags=re.IGNORECASE)
@@ -57,8 +58,8 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             user_state.pop(user_id, None)
         return
 
-    # 2) Normal flow: ask the LLM
-    response = query_rag(text)
+    # 2) Normal flow: stream the answer into one message that is edited as tokens arrive
+    response = await stream_reply(update.message, astream_rag(text))
 
     # If the LLM asked for a PrimeLeads URL, set state and send a cleaned message
     if ASK_TOKEN in response:
@@ -67,13 +68,13 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             clean = "🔗 Please send the URL you want PrimeLeads to process."
         user_state[user_id] = "WAITING_PRIMELEADS_URL"
         await update.message.reply_text(clean)
-        return
-
-    # Otherwise just reply with the LLM answer
-    await update.message.reply_text(response)
 
 if __name__ == "__main__":
-    app = ApplicationBuilder().token(TOKEN).build()
+    # Load the FAISS index and LLM clients once, before the first message arrives
+    get_runtime().snapshot()
+
+    # Handle messages from different users concurrently instead of one update at a time
+    app = ApplicationBuilder().token(TOKEN).concurrent_updates(True).build()
     app.add_handler(CommandHandler("start", start))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
     app.run_polling()
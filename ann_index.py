@@ -0,0 +1,412 @@
+import json
+import math
+import os
+from typing import NamedTuple
+
+import faiss
+import numpy as np
+from langchain.vectorstores.faiss import FAISS
+
+from faiss_store import load_store
+from get_embading_function import check_embeddings, embedding_identity
+
+INDEX_META_FILE = "index_meta.json"
+INDEX_TYPES = ("flat", "ivf", "hnsw", "ivfpq")
+CODECS = ("float32", "float16", "int8")
+REDUCTIONS = ("none", "pca", "truncate")
+
+# Unset = keep whatever the existing index was built with (flat float32 for a new one)
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "")
+FAISS_CODEC = os.getenv("FAISS_CODEC", "")
+FAISS_REDUCE = os.getenv("FAISS_REDUCE", "")
+FAISS_REDUCE_DIM = int(os.getenv("FAISS_REDUCE_DIM", "0"))
+FAISS_NLIST = int(os.getenv("FAISS_NLIST", "0"))  # 0 = about 4 * sqrt(vectors)
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_EF_CONSTRUCTION = int(os.getenv("FAISS_EF_CONSTRUCTION", "80"))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "0"))  # 0 = one 8-bit sub-quantizer per 8 dimensions
+FAISS_TRAIN_SAMPLE = int(os.getenv("FAISS_TRAIN_SAMPLE", "100000"))
+# Below this many vectors an exact scan is as fast as any ANN index, so the index stays flat
+FAISS_ANN_MIN_VECTORS = int(os.getenv("FAISS_ANN_MIN_VECTORS", "10000"))
+# IVF centroids are retrained once the index has grown this much past its training set
+FAISS_RETRAIN_GROWTH = float(os.getenv("FAISS_RETRAIN_GROWTH", "4.0"))
+
+SQ_TYPES = {"float16": faiss.ScalarQuantizer.QT_fp16, "int8": faiss.ScalarQuantizer.QT_8bit}
+
+
+class IndexConfig(NamedTuple):
+    kind: str = "flat"
+    codec: str = "float32"
+    reduce: str = "none"
+    reduce_dim: int = 0
+    nlist: int = FAISS_NLIST
+    nprobe: int = FAISS_NPROBE
+    hnsw_m: int = FAISS_HNSW_M
+    ef_construction: int = FAISS_EF_CONSTRUCTION
+    ef_search: int = FAISS_EF_SEARCH
+    pq_m: int = FAISS_PQ_M
+    train_sample: int = FAISS_TRAIN_SAMPLE
+
+
+def resolve_config(meta: dict, **overrides) -> IndexConfig:
+    """
+    Storage layout (kind, codec, reduce, reduce_dim) from the keyword arguments,
+    else the FAISS_* environment, else what the index was built with.
+    """
+    requested = meta.get("requested", {})
+    defaults = {"kind": FAISS_INDEX_TYPE, "codec": FAISS_CODEC, "reduce": FAISS_REDUCE, "reduce_dim": FAISS_REDUCE_DIM}
+    values = {}
+    for field, env_value in defaults.items():
+        value = overrides.get(field)
+        if value is None:
+            value = env_value or requested.get(field)
+        if value is not None:
+            values[field] = value
+    config = IndexConfig(**values)
+    for value, allowed, what in (
+        (config.kind, INDEX_TYPES, "index type"),
+        (config.codec, CODECS, "vector codec"),
+        (config.reduce, REDUCTIONS, "dimensionality reduction"),
+    ):
+        if value not in allowed:
+            raise ValueError(f"Unknown FAISS {what} '{value}', expected one of {', '.join(allowed)}")
+    return config
+
+
+def _base(index):
+    """The index behind an IndexPreTransform (PCA / truncation), or index itself."""
+    if isinstance(index, faiss.IndexPreTransform):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def index_kind(index) -> str:
+    index = _base(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def index_codec(index) -> str:
+    index = _base(index)
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "pq"
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return {qtype: codec for codec, qtype in SQ_TYPES.items()}[index.sq.qtype]
+    return "float32"
+
+
+def index_layout(index) -> dict:
+    reduce, reduce_dim = "none", 0
+    if isinstance(index, faiss.IndexPreTransform):
+        transform = faiss.downcast_VectorTransform(index.chain.at(0))
+        reduce = "pca" if isinstance(transform, faiss.PCAMatrix) else "truncate"
+        reduce_dim = transform.d_out
+    return {"kind": index_kind(index), "codec": index_codec(index), "reduce": reduce, "reduce_dim": reduce_dim}
+
+
+def effective_config(config: IndexConfig, n: int, dim: int) -> tuple[IndexConfig, list[str]]:
+    """What can actually be built for n vectors of dim dimensions, with the reasons it differs."""
+    notes = []
+    if config.kind != "flat" and n < FAISS_ANN_MIN_VECTORS:
+        notes.append(f"keeping a flat index until it holds {FAISS_ANN_MIN_VECTORS} vectors ({n} now)")
+        config = config._replace(kind="flat")
+    if config.reduce != "none" and not 0 < config.reduce_dim < dim:
+        notes.append(f"reduce_dim must be between 1 and {dim - 1}, storing all {dim} dimensions")
+        config = config._replace(reduce="none", reduce_dim=0)
+    elif config.reduce == "pca" and n < config.reduce_dim:
+        notes.append(f"PCA to {config.reduce_dim} dims needs at least that many vectors ({n} now)")
+        config = config._replace(reduce="none", reduce_dim=0)
+    if config.reduce == "none":
+        config = config._replace(reduce_dim=0)
+    return config, notes
+
+
+def config_layout(config: IndexConfig) -> dict:
+    return {
+        "kind": config.kind,
+        "codec": "pq" if config.kind == "ivfpq" else config.codec,
+        "reduce": config.reduce,
+        "reduce_dim": config.reduce_dim,
+    }
+
+
+def auto_nlist(n: int) -> int:
+    # At least ~39 training points per centroid, which is what k-means in faiss asks for
+    return max(1, min(int(4 * math.sqrt(n)), n // 39))
+
+
+def auto_pq_m(dim: int) -> int:
+    m = max(1, dim // 8)
+    while dim % m:
+        m -= 1
+    return m
+
+
+def _new_index(config: IndexConfig, dim: int, n: int):
+    qtype = SQ_TYPES.get(config.codec)
+    if config.kind == "flat":
+        return faiss.IndexFlatL2(dim) if qtype is None else faiss.IndexScalarQuantizer(dim, qtype, faiss.METRIC_L2)
+    if config.kind == "hnsw":
+        if qtype is None:
+            index = faiss.IndexHNSWFlat(dim, config.hnsw_m)
+        else:
+            index = faiss.IndexHNSWSQ(dim, qtype, config.hnsw_m)
+        index.hnsw.efConstruction = config.ef_construction
+        return index
+    nlist = config.nlist or auto_nlist(n)
+    quantizer = faiss.IndexFlatL2(dim)
+    if config.kind == "ivfpq":
+        return faiss.IndexIVFPQ(quantizer, dim, nlist, config.pq_m or auto_pq_m(dim), 8)
+    if qtype is None:
+        return faiss.IndexIVFFlat(quantizer, dim, nlist)
+    return faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, qtype, faiss.METRIC_L2)
+
+
+def build_index(config: IndexConfig, vectors: np.ndarray, seed: int = 0):
+    """
+    Train (on a sample) and fill a new faiss index with vectors. With a
+    reduction the index is wrapped in an IndexPreTransform, so full-size
+    vectors go in on add() and search() alike and callers never see the
+    projection.
+    """
+    n, dim = vectors.shape
+    sample = vectors
+    if n > config.train_sample:
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(n, config.train_sample, replace=False)]
+
+    if config.reduce == "none":
+        index = _new_index(config, dim, n)
+    else:
+        index = faiss.IndexPreTransform(_new_index(config, config.reduce_dim, n))
+        if config.reduce == "pca":
+            index.prepend_transform(faiss.PCAMatrix(dim, config.reduce_dim))
+        else:
+            # Matryoshka prefix: keep the leading dims and re-normalize, as the
+            # model does for text-embedding-3 `dimensions`
+            index.prepend_transform(faiss.NormalizationTransform(config.reduce_dim))
+            index.prepend_transform(faiss.RemapDimensionsTransform(dim, config.reduce_dim, False))
+    if not index.is_trained:
+        index.train(sample)
+    index.add(vectors)
+    set_search_params(index, config.nprobe, config.ef_search)
+    return index
+
+
+def set_search_params(index, nprobe: int, ef_search: int):
+    index = _base(index)
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(nprobe, index.nlist)
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search
+
+
+def search_within(index, vector, positions, k: int) -> list[tuple[int, float]]:
+    """
+    The k nearest of the vectors at `positions` only, as (position, squared
+    L2 distance) pairs: faiss skips every other vector while it searches,
+    with the index's own nprobe / efSearch. HNSW may return fewer than k
+    when the allowed vectors are a small part of the graph.
+    """
+    selector = faiss.IDSelectorBatch(np.asarray(sorted(set(positions)), dtype=np.int64))
+    base = _base(index)
+    if isinstance(base, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=base.nprobe)
+    elif isinstance(base, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=base.hnsw.efSearch)
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    if base is not index:
+        wrapped = faiss.SearchParametersPreTransform()
+        wrapped.index_params = params
+        params = wrapped
+    distances, found = index.search(np.asarray([vector], dtype=np.float32), k, params=params)
+    return [(int(p), float(d)) for p, d in zip(found[0], distances[0]) if p >= 0]
+
+
+def index_vectors(index, positions=None) -> np.ndarray:
+    """
+    Stored vectors at positions (all by default), mapped back to the input
+    dimension. Exact for float32 flat, HNSW and IVF indexes; compressed or
+    reduced indexes return their approximation.
+    """
+    if isinstance(_base(index), faiss.IndexIVF):
+        _base(index).make_direct_map()
+    if positions is None:
+        return index.reconstruct_n(0, index.ntotal)
+    positions = list(positions)
+    if not positions:
+        return np.empty((0, index.d), dtype=np.float32)
+    return np.vstack([index.reconstruct(int(i)) for i in positions])
+
+
+def copy_codes(index, positions) -> faiss.Index:
+    """
+    A new index holding the vectors at positions, in that order, as the codes
+    index stores for them, behind copies of its trained quantizers and
+    projection. Nothing is decoded and encoded again, so compressed and
+    reduced vectors score exactly as they do in index. An HNSW graph cannot
+    be split, so its stored vectors are copied into a flat index instead.
+    """
+    positions = np.asarray(list(positions), dtype=np.int64)
+    source = _base(index)
+    if isinstance(source, faiss.IndexHNSW):
+        source = faiss.downcast_index(source.storage)
+    copy = faiss.clone_index(source)
+    copy.reset()  # keeps what was trained
+    if isinstance(source, faiss.IndexIVF):
+        # Same lists and codes, renumbered to the order of positions
+        local = {int(position): i for i, position in enumerate(positions)}
+        invlists, code_size = source.invlists, source.invlists.code_size
+        for list_no in range(source.nlist):
+            size = invlists.list_size(list_no)
+            if not size:
+                continue
+            ids = faiss.rev_swig_ptr(invlists.get_ids(list_no), size)
+            keep = [j for j, position in enumerate(ids) if int(position) in local]
+            if not keep:
+                continue
+            codes = faiss.rev_swig_ptr(invlists.get_codes(list_no), size * code_size).reshape(size, code_size)
+            new_ids = np.array([local[int(ids[j])] for j in keep], dtype=np.int64)
+            kept_codes = np.ascontiguousarray(codes[keep])
+            copy.invlists.add_entries(list_no, len(keep), faiss.swig_ptr(new_ids), faiss.swig_ptr(kept_codes))
+        copy.ntotal = len(positions)
+    else:
+        codes = faiss.vector_to_array(source.codes).reshape(source.ntotal, source.code_size)
+        copy.add_sa_codes(np.ascontiguousarray(codes[positions]))
+    if not isinstance(index, faiss.IndexPreTransform):
+        return copy
+    # The trained projection is shared with index, which is kept alive for it
+    wrapped = faiss.IndexPreTransform(copy)
+    for i in reversed(range(index.chain.size())):
+        wrapped.prepend_transform(faiss.downcast_VectorTransform(index.chain.at(i)))
+    wrapped.referenced_objects.append(index)
+    return wrapped
+
+
+def delete_chunks(db: FAISS, ids) -> FAISS:
+    """
+    db.delete() for any index type. Only flat indexes renumber their vectors on
+    remove_ids(), which the LangChain docstore mapping relies on, so IVF and
+    reduced indexes are replaced by a copy of their remaining stored codes
+    (see copy_codes). HNSW cannot drop graph nodes: its remaining vectors are
+    read back and added again, which leaves their flat or SQ storage codes
+    byte for byte as they were.
+    """
+    if isinstance(db.index, faiss.IndexFlatCodes):
+        db.delete(list(ids))
+        return db
+    drop = set(ids)
+    keep = [(i, doc_id) for i, doc_id in sorted(db.index_to_docstore_id.items()) if doc_id not in drop]
+    positions = [i for i, _ in keep]
+    base = _base(db.index)
+    if isinstance(base, faiss.IndexHNSW):
+        vectors = index_vectors(base, positions)
+        db.index.reset()
+        if len(vectors):
+            base.add(vectors)
+        db.index.ntotal = base.ntotal
+    else:
+        db.index = copy_codes(db.index, positions)
+    db.docstore.delete([doc_id for doc_id in ids])
+    db.index_to_docstore_id = {position: doc_id for position, (_, doc_id) in enumerate(keep)}
+    return db
+
+
+def apply_index_config(db: FAISS, config: IndexConfig, meta: dict) -> tuple[FAISS, dict]:
+    """
+    Rebuild db in the configured layout (type, codec, reduction) if it is not
+    stored that way yet, or retrain an IVF index that has outgrown its training
+    set. Returns the db and the metadata to store next to it.
+    """
+    ntotal, dim = db.index.ntotal, db.index.d
+    target, notes = effective_config(config, ntotal, dim)
+    layout = index_layout(db.index)
+    trained_on = meta.get("trained_on", ntotal)
+    outgrown = layout["kind"] in ("ivf", "ivfpq") and ntotal > trained_on * FAISS_RETRAIN_GROWTH
+
+    if layout != config_layout(target) or outgrown:
+        for note in notes:
+            print(f"ℹ️ {note.capitalize()}")
+        if layout["codec"] != "float32" or layout["reduce"] != "none":
+            print("⚠️ Rebuilding from compressed vectors; `populate_db.py --reset` rebuilds from full-precision embeddings")
+        vectors = index_vectors(db.index)
+        db.index = build_index(target, vectors)
+        trained_on = ntotal
+        size = len(faiss.serialize_index(db.index))
+        print(
+            f"🏗️ Built {describe_layout(index_layout(db.index))} index over {ntotal} vectors: "
+            f"{size / max(ntotal, 1):.0f} bytes/vector vs {dim * 4} as float32"
+        )
+
+    set_search_params(db.index, config.nprobe, config.ef_search)
+    return db, {
+        "index_type": index_kind(db.index),
+        **{k: v for k, v in index_layout(db.index).items() if k != "kind"},
+        "requested": config._asdict(),
+        "dim": dim,
+        "ntotal": ntotal,
+        "trained_on": trained_on,
+        "params": search_params(db.index),
+        # Queries must embed with the same backend and model; load_index refuses others
+        "embedding": embedding_identity(db.embedding_function),
+    }
+
+
+def describe_layout(layout: dict) -> str:
+    text = f"{layout['kind']} {layout['codec']}"
+    if layout["reduce"] != "none":
+        text += f" {layout['reduce']}-{layout['reduce_dim']}"
+    return text
+
+
+def search_params(index) -> dict:
+    index = _base(index)
+    if isinstance(index, faiss.IndexIVFPQ):
+        return {"nlist": index.nlist, "nprobe": index.nprobe, "pq_m": index.pq.M}
+    if isinstance(index, faiss.IndexIVF):
+        return {"nlist": index.nlist, "nprobe": index.nprobe}
+    if isinstance(index, faiss.IndexHNSW):
+        return {"M": index.hnsw.nb_neighbors(1), "efSearch": index.hnsw.efSearch}
+    return {}
+
+
+def read_index_meta(path: str) -> dict:
+    try:
+        with open(os.path.join(path, INDEX_META_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def write_index_meta(path: str, meta: dict):
+    tmp_path = os.path.join(path, INDEX_META_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(path, INDEX_META_FILE))
+
+
+def load_index(path: str, embeddings, writable: bool = False) -> FAISS:
+    """
+    faiss_store.load_store plus the search knobs recorded at build time;
+    FAISS_NPROBE / FAISS_EF_SEARCH in the environment override them per process.
+    Raises EmbeddingMismatchError if the index was built with other embeddings.
+    """
+    meta = read_index_meta(path)
+    check_embeddings(meta, embeddings, path)
+    db = load_store(path, embeddings, writable=writable)
+    params = meta.get("params", {})
+    set_search_params(
+        db.index,
+        int(os.getenv("FAISS_NPROBE") or params.get("nprobe", FAISS_NPROBE)),
+        int(os.getenv("FAISS_EF_SEARCH") or params.get("efSearch", FAISS_EF_SEARCH)),
+    )
+    return db
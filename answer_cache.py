@@ -0,0 +1,181 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "answer_cache.sqlite3")
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600)))
+
+
+class CacheEntry:
+    def __init__(self, row_id: int, question: str, vector: np.ndarray, answer: str, sources: list, created_at: float):
+        self.row_id = row_id
+        self.question = question
+        self.vector = vector
+        self.answer = answer
+        self.sources = sources
+        self.created_at = created_at
+
+
+def _unit(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class AnswerCache:
+    """
+    Semantic cache of RAG answers. A question is a hit when it matches a cached
+    one exactly (after normalization) or its embedding is within `threshold`
+    cosine similarity (the embedding backend's `same_question` threshold). Entries belong to one index version, so rebuilding the
+    knowledge base invalidates them. Memory is bounded by LRU + TTL eviction and
+    entries are persisted to SQLite so a restarted bot comes back warm.
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        path: str = ANSWER_CACHE_PATH,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        ttl: float = ANSWER_CACHE_TTL,
+    ):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.index_version = None
+        self.hits = 0
+        self.exact_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries: OrderedDict[int, CacheEntry] = OrderedDict()
+        self._by_question: dict[str, int] = {}
+        self._matrix = None
+        self._matrix_ids: list[int] = []
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                index_version TEXT NOT NULL,
+                question TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                answer TEXT NOT NULL,
+                sources TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    # --- index version ---
+
+    def _use_version(self, index_version: str):
+        """Drop everything built against another version of the index, then load ours."""
+        if index_version == self.index_version:
+            return
+        self._conn.execute("DELETE FROM answers WHERE index_version != ?", (index_version,))
+        self._conn.execute("DELETE FROM answers WHERE created_at < ?", (time.time() - self.ttl,))
+        self._conn.commit()
+
+        self._entries.clear()
+        self._by_question.clear()
+        rows = self._conn.execute(
+            "SELECT id, question, vector, answer, sources, created_at FROM answers "
+            "WHERE index_version = ? ORDER BY last_used DESC LIMIT ?",
+            (index_version, self.max_entries),
+        ).fetchall()
+        for row_id, question, blob, answer, sources, created_at in reversed(rows):
+            vector = np.frombuffer(blob, dtype=np.float32)
+            self._entries[row_id] = CacheEntry(row_id, question, vector, answer, json.loads(sources), created_at)
+            self._by_question[question] = row_id
+        self._matrix = None
+        self.index_version = index_version
+
+    # --- lookup / store ---
+
+    def lookup_exact(self, question: str, index_version: str) -> CacheEntry | None:
+        with self._lock:
+            self._use_version(index_version)
+            row_id = self._by_question.get(question)
+            entry = self._touch(row_id) if row_id is not None else None
+            if entry:
+                self.hits += 1
+                self.exact_hits += 1
+            return entry
+
+    def lookup(self, vector, index_version: str) -> CacheEntry | None:
+        with self._lock:
+            self._use_version(index_version)
+            entry = None
+            if self._entries:
+                if self._matrix is None:
+                    self._matrix_ids = list(self._entries)
+                    self._matrix = np.stack([self._entries[i].vector for i in self._matrix_ids])
+                scores = self._matrix @ _unit(vector)
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    entry = self._touch(self._matrix_ids[best])
+            if entry:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry
+
+    def store(self, question: str, vector, answer: str, sources: list, index_version: str):
+        with self._lock:
+            self._use_version(index_version)
+            if question in self._by_question:
+                return
+            vector = _unit(vector)
+            now = time.time()
+            cursor = self._conn.execute(
+                "INSERT INTO answers (index_version, question, vector, answer, sources, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (index_version, question, vector.tobytes(), answer, json.dumps(sources), now, now),
+            )
+            row_id = cursor.lastrowid
+            self._entries[row_id] = CacheEntry(row_id, question, vector, answer, sources, now)
+            self._by_question[question] = row_id
+            while len(self._entries) > self.max_entries:
+                self._evict(next(iter(self._entries)))
+            self._conn.commit()
+            self._matrix = None
+
+    def _touch(self, row_id: int) -> CacheEntry | None:
+        entry = self._entries.get(row_id)
+        if entry is None:
+            return None
+        if time.time() - entry.created_at > self.ttl:
+            self._evict(row_id)
+            self._conn.commit()
+            self._matrix = None
+            return None
+        self._entries.move_to_end(row_id)
+        self._conn.execute("UPDATE answers SET last_used = ? WHERE id = ?", (time.time(), row_id))
+        self._conn.commit()
+        return entry
+
+    def _evict(self, row_id: int):
+        entry = self._entries.pop(row_id)
+        self._by_question.pop(entry.question, None)
+        self._conn.execute("DELETE FROM answers WHERE id = ?", (row_id,))
+        self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "exact_hits": self.exact_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,160 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import openai
+from langchain_core.embeddings import Embeddings
+
+from token_utils import count_tokens
+
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "50000"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "512"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_RPM = int(os.getenv("EMBED_RPM", "3000"))
+EMBED_TPM = int(os.getenv("EMBED_TPM", "1000000"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+
+class RateLimiter:
+    """Token buckets for requests-per-minute and tokens-per-minute, shared by all workers."""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int):
+        tokens = min(tokens, self.tpm)  # a single oversized batch must still be able to go
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                elapsed = now - self._updated
+                self._updated = now
+                self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+                self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                wait_for = max(
+                    (1 - self._requests) * 60 / self.rpm,
+                    (tokens - self._tokens) * 60 / self.tpm,
+                )
+            time.sleep(wait_for)
+
+
+def make_batches(token_counts: list[int], max_tokens: int, max_size: int) -> list[list[int]]:
+    """Group text positions into batches under both a token budget and an input count."""
+    batches, current, current_tokens = [], [], 0
+    for i, tokens in enumerate(token_counts):
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_size):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+class BatchEmbedder(Embeddings):
+    """
+    Embeds documents in token-budgeted batches on a thread pool, under a shared
+    RPM/TPM limiter, retrying rate-limit and transient errors with exponential
+    backoff. iter_batches() yields each batch as soon as it completes so callers
+    can stream vectors into the index.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        batch_tokens: int = EMBED_BATCH_TOKENS,
+        batch_size: int = EMBED_BATCH_SIZE,
+        concurrency: int = EMBED_CONCURRENCY,
+        rpm: int = EMBED_RPM,
+        tpm: int = EMBED_TPM,
+        max_retries: int = EMBED_MAX_RETRIES,
+    ):
+        self.embeddings = embeddings
+        self.model = getattr(embeddings, "model", None)
+        self.dimensions = getattr(embeddings, "dimensions", None)
+        self.batch_tokens = batch_tokens
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(rpm, tpm)
+        self.max_retries = max_retries
+        self.texts = 0
+        self.tokens = 0
+        self.batches = 0
+        self.retries = 0
+        self.seconds = 0.0
+
+    def _embed_batch(self, texts: list[str], tokens: int) -> list[list[float]]:
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(tokens)
+            try:
+                return self.embeddings.embed_documents(texts)
+            except RETRYABLE_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                time.sleep(min(60.0, 2 ** attempt) * (0.5 + random.random() / 2))
+
+    def iter_batches(self, texts: list[str]):
+        """Yield (positions in texts, vectors) per batch, in completion order."""
+        if not texts:
+            return
+        start = time.perf_counter()
+        token_counts = [count_tokens(t) for t in texts]
+        batches = make_batches(token_counts, self.batch_tokens, self.batch_size)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            pending = {}
+            for positions in batches:
+                tokens = sum(token_counts[i] for i in positions)
+                future = pool.submit(self._embed_batch, [texts[i] for i in positions], tokens)
+                pending[future] = (positions, tokens)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    positions, tokens = pending.pop(future)
+                    vectors = future.result()
+                    self.texts += len(positions)
+                    self.tokens += tokens
+                    self.batches += 1
+                    yield positions, vectors
+
+        self.seconds += time.perf_counter() - start
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        vectors = [None] * len(texts)
+        for positions, batch_vectors in self.iter_batches(texts):
+            for i, vector in zip(positions, batch_vectors):
+                vectors[i] = vector
+        return vectors
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
+
+    def report(self):
+        if not self.texts:
+            return
+        seconds = max(self.seconds, 1e-9)
+        print(
+            f"🚀 Embedded {self.texts} chunks / {self.tokens} tokens in {self.batches} batches "
+            f"({self.concurrency} workers, {self.retries} retries): "
+            f"{self.texts / seconds:.1f} chunks/s, {self.tokens / seconds:.0f} tokens/s"
+        )
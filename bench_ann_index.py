@@ -0,0 +1,102 @@
+"""
+Recall, latency and memory of the FAISS index types on a synthetic clustered
+corpus, against exact (flat) search as ground truth.
+
+    python bench_ann_index.py --vectors 1000000 --dim 256 --queries 1000
+    python bench_ann_index.py --vectors 100000 --types ivf hnsw --nprobe 4 16 64 --ef-search 32 128
+"""
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from ann_index import IndexConfig, build_index, set_search_params
+
+
+def synthetic_corpus(n: int, dim: int, clusters: int, seed: int = 0, latent_dim: int = 32) -> np.ndarray:
+    """
+    Topic clusters in a low-dimensional latent space projected up to dim, plus a
+    little noise, normalized like text embeddings (whose intrinsic dimension is
+    far below their nominal one). Topics are fixed; `seed` only varies the
+    samples, so corpus and queries come from the same distribution.
+    """
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((clusters, latent_dim)).astype(np.float32)
+    projection = rng.standard_normal((latent_dim, dim)).astype(np.float32) / np.sqrt(latent_dim)
+    rng = np.random.default_rng(seed)
+    vectors = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100_000):
+        end = min(start + 100_000, n)
+        labels = rng.integers(0, clusters, end - start)
+        latent = centers[labels] + 0.5 * rng.standard_normal((end - start, latent_dim)).astype(np.float32)
+        vectors[start:end] = latent @ projection + 0.05 * rng.standard_normal((end - start, dim)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def measure(index, queries: np.ndarray, truth: np.ndarray, k: int) -> dict:
+    # One query at a time, like the bot does; batch search would hide the per-query cost
+    latencies = []
+    found = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found[i] = ids[0]
+    return {
+        "recall": recall_at_k(found, truth),
+        "p50": float(np.percentile(latencies, 50)),
+        "p99": float(np.percentile(latencies, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--types", nargs="+", default=["flat", "ivf", "hnsw", "ivfpq"])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 64, 256])
+    args = parser.parse_args()
+
+    print(f"🧪 Corpus: {args.vectors} x {args.dim} float32 ({args.vectors * args.dim * 4 / 2**20:.0f} MB raw)")
+    vectors = synthetic_corpus(args.vectors, args.dim, args.clusters)
+    queries = synthetic_corpus(args.queries, args.dim, args.clusters, seed=1)
+
+    exact = faiss.IndexFlatL2(args.dim)
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    print(f"{'index':<8} {'param':<14} {'build s':>8} {'memory MB':>10} {f'recall@{args.k}':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for kind in args.types:
+        start = time.perf_counter()
+        index = exact if kind == "flat" else build_index(IndexConfig(kind=kind), vectors)
+        build_seconds = 0.0 if kind == "flat" else time.perf_counter() - start
+        memory_mb = len(faiss.serialize_index(index)) / 2**20
+
+        if kind in ("ivf", "ivfpq"):
+            sweep = [(f"nprobe={n}", n, 0) for n in args.nprobe]
+        elif kind == "hnsw":
+            sweep = [(f"efSearch={ef}", 0, ef) for ef in args.ef_search]
+        else:
+            sweep = [("exact", 0, 0)]
+        for label, nprobe, ef_search in sweep:
+            set_search_params(index, nprobe, ef_search)
+            result = measure(index, queries, truth, args.k)
+            print(
+                f"{kind:<8} {label:<14} {build_seconds:>8.1f} {memory_mb:>10.1f} "
+                f"{result['recall']:>9.3f} {result['p50']:>8.3f} {result['p99']:>8.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
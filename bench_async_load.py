@@ -0,0 +1,88 @@
+"""
+Concurrent-user throughput of aquery_rag against a local stand-in for the
+OpenAI API (see fake_openai_server.py), compared with the blocking query_rag
+the Telegram bot used to call inline, plus how many embeddings requests the
+async path's micro-batcher sent for the questions and the wait it added,
+and how many chat completions the async users needed.
+
+    python bench_async_load.py --users 1 4 16 32 --chat-latency 0.5
+    python bench_async_load.py --embed-window 0    # one embeddings request per question
+    python bench_async_load.py --same-question     # every user asks the same thing at once
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from fake_openai_server import FakeOpenAIServer
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    parser.add_argument("--chat-latency", type=float, default=0.5)
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--embed-window", type=float, default=5.0, help="Query embedding batch window in ms")
+    parser.add_argument("--embed-batch", type=int, default=16, help="Max questions per embeddings request")
+    parser.add_argument("--same-question", action="store_true", help="Every user asks the same question")
+    parser.add_argument("--no-single-flight", action="store_true", help="Answer identical in-flight questions separately")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(0, args.embedding_latency, args.chat_latency).start()
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    os.environ["OPENAI_API_KEY"] = "sk-fake"
+    os.environ["API_KEY"] = "sk-fake"
+    os.environ["OPENAI_EMBEDDING_CTX_CHECK"] = "0"  # no tiktoken download for a local stand-in
+    os.environ["ANSWER_CACHE_ENABLED"] = "0"  # every question must pay the full round trip
+    os.environ["RAG_MAX_CONCURRENCY"] = str(args.max_concurrency)
+    os.environ["RAG_EMBED_BATCH_WINDOW_MS"] = str(args.embed_window)
+    os.environ["RAG_EMBED_BATCH_MAX"] = str(args.embed_batch)
+    os.environ["RAG_SINGLE_FLIGHT"] = "0" if args.no_single_flight else "1"
+    # Stand-in embeddings are random, so no chunk would pass the relevance cutoff
+    os.environ["RAG_MIN_SIMILARITY"] = "-1"
+
+    # Imported after the environment points the clients at the fake server
+    from query_data import aquery_rag, query_batcher, query_rag, question_flights
+    from rag_runtime import get_runtime
+
+    get_runtime().snapshot()
+    question = "What does PrimeVision automate for operations teams?" + ("" if args.same_question else " (user {})")
+
+    print(f"📊 Stand-in latency: embeddings {args.embedding_latency * 1000:.0f} ms, chat {args.chat_latency * 1000:.0f} ms")
+    print(
+        f"{'users':>6} {'blocking q/s':>14} {'async q/s':>11} {'speed-up':>9} {'async p50 ms':>13} "
+        f"{'embed calls':>11} {'wait p95 ms':>11} {'chat calls':>10} {'coalesced':>9}"
+    )
+    for users in args.users:
+        start = time.perf_counter()
+        for i in range(users):
+            query_rag(question.format(i))
+        blocking = users / (time.perf_counter() - start)
+
+        async def one(i):
+            t0 = time.perf_counter()
+            await aquery_rag(question.format(i))
+            return time.perf_counter() - t0
+
+        async def run_all():
+            latencies = await asyncio.gather(*(one(i) for i in range(users)))
+            return latencies, query_batcher().stats()
+
+        chat_calls, coalesced = server.chat_calls, question_flights.coalesced
+        start = time.perf_counter()
+        latencies, batching = asyncio.run(run_all())
+        concurrent = users / (time.perf_counter() - start)
+        latencies.sort()
+
+        print(
+            f"{users:>6} {blocking:>14.2f} {concurrent:>11.2f} {concurrent / blocking:>8.1f}x "
+            f"{latencies[len(latencies) // 2] * 1000:>13.0f} {batching['calls']:>11} {batching['wait_ms_p95']:>11.1f} "
+            f"{server.chat_calls - chat_calls:>10} {question_flights.coalesced - coalesced:>9}"
+        )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
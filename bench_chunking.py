@@ -0,0 +1,85 @@
+"""
+The original 800/80-character splitter against the token- and
+structure-aware chunker: chunk counts, chunk lengths, index size on disk,
+context tokens per prompt and retrieval hit rate on the knowledge base in data/.
+
+    OPENAI_API_KEY=... python bench_chunking.py
+    python bench_chunking.py --embeddings hash   # offline, no API calls
+
+Hit rate uses the evaluation questions of bench_hybrid_retrieval.py: a
+question is answered when one of the first k hybrid results contains all of
+its key phrases.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from langchain.vectorstores.faiss import FAISS
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+import hybrid_search
+from bench_hybrid_retrieval import EVAL_SET, relevant
+from chunker import iter_chunks
+from faiss_store import save_store
+from get_embading_function import BACKENDS, get_embedding_function
+from lexical_index import LexicalIndex
+from populate_db import calculate_chunk_ids, load_documents
+from rag_runtime import IndexSnapshot
+from token_utils import count_tokens
+
+
+def recursive_chunks(pages):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=80, length_function=len)
+    return splitter.split_documents(pages)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--embeddings", choices=list(BACKENDS), default="openai")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--chunk-tokens", type=int, nargs="+", default=[150, 200, 300])
+    args = parser.parse_args()
+
+    embeddings = get_embedding_function(args.embeddings)
+    pages = load_documents()
+    vectors = embeddings.embed_documents([q for q, _ in EVAL_SET])
+
+    settings = [("recursive 800ch", recursive_chunks)] + [
+        (f"structured {n}tok", lambda p, n=n: list(iter_chunks(p, chunk_tokens=n))) for n in args.chunk_tokens
+    ]
+    print(f"🧪 {len(pages)} pages, {len(EVAL_SET)} questions, {args.embeddings} embeddings, k={args.k}")
+    print(
+        f"{'chunker':<18} {'chunks':>6} {'mean tok':>8} {'max tok':>7} {'chunk ms':>8} "
+        f"{'index KB':>8} {'ctx tokens':>10} {'hit rate':>8}"
+    )
+    for name, split in settings:
+        start = time.perf_counter()
+        chunks = split(pages)
+        split_ms = (time.perf_counter() - start) * 1000
+        chunks = list({c.metadata["id"]: c for c in calculate_chunk_ids(chunks)}.values())
+        lengths = [count_tokens(c.page_content) for c in chunks]
+        db = FAISS.from_documents(chunks, embeddings, ids=[c.metadata["id"] for c in chunks])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            save_store(db, tmp)
+            LexicalIndex(tmp).sync(db)
+            size = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp))
+            lexical = LexicalIndex.open(tmp)
+            snapshot = IndexSnapshot("bench", db, None, lexical)
+            hits, tokens = 0, []
+            for (question, phrases), vector in zip(EVAL_SET, vectors):
+                docs = hybrid_search.search(snapshot, question, vector, args.k)
+                hits += any(relevant(doc, phrases) for doc in docs)
+                tokens.append(sum(count_tokens(doc.page_content) for doc in docs))
+            lexical.close()
+
+        print(
+            f"{name:<18} {len(chunks):>6} {np.mean(lengths):>8.0f} {max(lengths):>7} {split_ms:>8.1f} "
+            f"{size / 1024:>8.0f} {np.mean(tokens):>10.0f} {hits / len(EVAL_SET):>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
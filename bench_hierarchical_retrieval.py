@@ -0,0 +1,143 @@
+"""
+Flat retrieval against coarse-to-fine retrieval (section summaries first,
+then only the chosen sections' chunks) on the evaluation questions of
+bench_hybrid_retrieval.py plus a few broad ones: hit rate, vectors compared
+per question, retrieval latency and the prompt tokens of the packed context
+at each k.
+
+    OPENAI_API_KEY=... python bench_hierarchical_retrieval.py
+    python bench_hierarchical_retrieval.py --embeddings hash   # offline, no API calls
+
+Product questions are excluded unless --with-products is given: those are
+scoped to product partitions either way (see bench_product_partitions.py).
+--scale N also times the dense stage alone against N-fold copies of the
+chunk and summary vectors, to show how both stages grow with the knowledge
+base; hit rate and tokens always come from the real index.
+"""
+import os
+
+# Go coarse-to-fine on this small KB too; served indexes stay flat below the threshold
+os.environ.setdefault("RAG_HIERARCHICAL_MIN_CHUNKS", "0")
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+from langchain.vectorstores.faiss import FAISS
+
+import hybrid_search
+from ann_index import index_vectors, search_within
+from bench_hybrid_retrieval import EVAL_SET, relevant
+from bench_product_partitions import scaled_index
+from context_packer import pack_context
+from get_embading_function import BACKENDS, get_embedding_function, similarity_thresholds
+from lexical_index import LexicalIndex
+from populate_db import calculate_chunk_ids, load_documents, split_documents
+from product_scope import detect_products
+from rag_runtime import IndexSnapshot
+from section_summaries import load_summaries, save_summaries
+from token_utils import count_tokens
+
+# Questions about the big picture rather than one fact
+BROAD_SET = [
+    ("What does FastAutomate offer?", ["PrimeVision, PrimeLeads"]),
+    ("What is FastAutomate's vision?", ["Company Vision"]),
+    ("Who are FastAutomate's customers?", ["Target Audience"]),
+    ("What makes Primius.ai different?", ["Core Differentiators"]),
+    ("How do I get started in the workspace?", ["Workspace Navigation"]),
+    ("What are the best practices for using the platform?", ["Best Practices"]),
+]
+
+
+def _ms(run, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        run()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def time_at_scale(db, summaries, vectors, scale: int, repeat: int):
+    """Dense stage only: one flat search against a summary search plus a search within the chosen sections."""
+    rng = np.random.default_rng(0)
+    n, sections = db.index.ntotal, summaries.index.ntotal
+    chunks = scaled_index(index_vectors(db.index), scale, rng)
+    coarse = scaled_index(index_vectors(summaries.index), scale, rng)
+    members = [summaries.docstore.search(summaries.index_to_docstore_id[i]).metadata["positions"] for i in range(sections)]
+    depth, k = hybrid_search.RAG_FUSION_DEPTH, hybrid_search.RAG_SECTION_K
+    flat_ms, coarse_ms, compared = [], [], []
+    for vector in vectors:
+        query = np.asarray([vector], dtype=np.float32)
+        flat_ms.append(_ms(lambda: chunks.search(query, depth), repeat))
+
+        def two_stage():
+            _, chosen = coarse.search(query, k)
+            positions = [p + (s // sections) * n for s in chosen[0] for p in members[s % sections]]
+            search_within(chunks, vector, positions, depth)
+            return positions
+
+        coarse_ms.append(_ms(two_stage, repeat))
+        compared.append(coarse.ntotal + len(two_stage()))
+    print(f"\n⏱️ Dense stage at x{scale} ({chunks.ntotal} chunks, {coarse.ntotal} sections)")
+    print(f"{'flat':<13} compared {chunks.ntotal:>8} {np.mean(flat_ms):>8.3f} ms")
+    print(f"{'hierarchical':<13} compared {np.mean(compared):>8.0f} {np.mean(coarse_ms):>8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--embeddings", choices=list(BACKENDS), default="openai")
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 4, 6])
+    parser.add_argument("--with-products", action="store_true", help="Also ask the questions that name a product")
+    parser.add_argument("--repeat", type=int, default=20, help="Timing repetitions per question")
+    parser.add_argument("--scale", type=int, default=0, help="Also time the dense stage on this many copies")
+    args = parser.parse_args()
+
+    questions = [(q, p) for q, p in EVAL_SET + BROAD_SET if args.with_products or not detect_products(q)]
+    embeddings = get_embedding_function(args.embeddings)
+    min_similarity = similarity_thresholds(embeddings).relevant
+    chunks = calculate_chunk_ids(split_documents(load_documents()))
+    unique = list({c.metadata["id"]: c for c in chunks}.values())
+    db = FAISS.from_documents(unique, embeddings, ids=[c.metadata["id"] for c in unique])
+    vectors = embeddings.embed_documents([q for q, _ in questions])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sections = save_summaries(db, tmp)
+        LexicalIndex(tmp).sync(db)
+        lexical = LexicalIndex.open(tmp)
+        summaries = load_summaries(tmp, embeddings)
+        flat = IndexSnapshot("bench", db, None, lexical)
+        hierarchical = IndexSnapshot("bench", db, None, lexical, summaries=summaries)
+
+        print(
+            f"🧪 {len(unique)} chunks in {sections} sections, {len(questions)} questions, "
+            f"{args.embeddings} embeddings, {hybrid_search.RAG_SECTION_K} sections per question"
+        )
+        print(f"{'retrieval':<13} {'k':>2} {'hit rate':>8} {'compared':>8} {'p50 ms':>7} {'ctx tokens':>10}")
+        for name, snapshot in (("flat", flat), ("hierarchical", hierarchical)):
+            for k in args.k:
+                hits, compared, latencies, tokens = 0, [], [], []
+                for (question, phrases), vector in zip(questions, vectors):
+                    chosen = hybrid_search.chosen_sections(snapshot, vector)
+                    if chosen:
+                        compared.append(summaries.index.ntotal + sum(len(s.metadata["positions"]) for s in chosen))
+                    else:
+                        compared.append(db.index.ntotal)
+                    candidates = hybrid_search.search_scored(snapshot, question, vector)
+                    hits += any(relevant(c.doc, phrases) for c in candidates[:k])
+                    docs = pack_context(candidates, min_similarity, max_chunks=k)
+                    tokens.append(sum(count_tokens(doc.page_content) for doc in docs))
+                    for _ in range(args.repeat):
+                        start = time.perf_counter()
+                        hybrid_search.search_scored(snapshot, question, vector)
+                        latencies.append((time.perf_counter() - start) * 1000)
+                print(
+                    f"{name:<13} {k:>2} {hits / len(questions):>8.2f} {np.mean(compared):>8.0f} "
+                    f"{np.percentile(latencies, 50):>7.2f} {np.mean(tokens):>10.0f}"
+                )
+        if args.scale:
+            time_at_scale(db, summaries, vectors, args.scale, args.repeat)
+        lexical.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Recall and latency of dense, lexical (BM25) and hybrid (RRF) retrieval on
+questions about the knowledge base in data/, plus the context tokens each
+setting hands to the LLM.
+
+    OPENAI_API_KEY=... python bench_hybrid_retrieval.py
+    python bench_hybrid_retrieval.py --embeddings hash    # offline, no API calls
+    python bench_hybrid_retrieval.py --embeddings local   # offline CPU model
+
+A question counts as answered at k when one of the first k chunks contains
+all of its key phrases. `hash` stands in for a real embedding model with the
+intent router's hashed n-gram features; it is cheap and deterministic but
+far more lexical than trained embeddings, so use it for latency and for
+smoke-testing the pipeline rather than for absolute recall.
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+from langchain.vectorstores.faiss import FAISS
+
+import hybrid_search
+from get_embading_function import BACKENDS, get_embedding_function
+from lexical_index import LexicalIndex
+from populate_db import calculate_chunk_ids, load_documents, split_documents
+from rag_runtime import IndexSnapshot
+from token_utils import count_tokens
+
+# (question, key phrases a relevant chunk contains)
+EVAL_SET = [
+    ("What is PrimeVision?", ["PrimeVision"]),
+    ("What is VisionFlow?", ["VisionFlow"]),
+    ("What was Primius.ai previously called?", ["PrimeFlow"]),
+    ("How does PrimeCRM keep CRM data clean?", ["PrimeCRM", "dedup"]),
+    ("What data quality does PrimeCRM reach?", ["95%"]),
+    ("Does PrimeRecruits contact candidates?", ["PrimeRecruits", "PrimeReachOut"]),
+    ("Which messaging APIs is PrimeReachOut integrated with?", ["SendGrid"]),
+    ("Which channels does PrimeReachOut sequence across?", ["WhatsApp"]),
+    ("How much does the Starter plan cost?", ["Starter"]),
+    ("What is the overage per credit?", ["Overage"]),
+    ("What is One-Click Setup?", ["One-Click Setup"]),
+    ("What is an Output?", ["What is an Output"]),
+    ("How do I export leads?", ["Export Leads"]),
+    ("How do I upload a job description to PrimeRecruits?", ["Upload JD"]),
+    ("How do I create a new ICP?", ["Create ICP"]),
+    ("Which industries does FastAutomate focus on?", ["Core Verticals"]),
+    ("What is the company motto?", ["Motto"]),
+    ("What does Account Status show in the sidebar?", ["Account Status"]),
+    ("How much faster is PrimeVision deployment than traditional RPA?", ["90%"]),
+    ("How do I pick the tone of outreach messages?", ["tone preset"]),
+]
+
+
+def relevant(doc, phrases: list[str]) -> bool:
+    text = doc.page_content.lower()
+    return all(p.lower() in text for p in phrases)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--embeddings", choices=list(BACKENDS), default="openai")
+    parser.add_argument("--repeat", type=int, default=20, help="Timing repetitions per question")
+    args = parser.parse_args()
+
+    embeddings = get_embedding_function(args.embeddings)
+    chunks = calculate_chunk_ids(split_documents(load_documents()))
+    unique = list({c.metadata["id"]: c for c in chunks}.values())
+    db = FAISS.from_documents(unique, embeddings, ids=[c.metadata["id"] for c in unique])
+    vectors = embeddings.embed_documents([q for q, _ in EVAL_SET])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        LexicalIndex(tmp).sync(db)
+        lexical = LexicalIndex.open(tmp)
+        dense_only, hybrid = IndexSnapshot("bench", db, None), IndexSnapshot("bench", db, None, lexical)
+
+        def lexical_search(question, vector, k):
+            return [db.docstore.search(chunk_id) for chunk_id, _ in lexical.search(question, k)]
+
+        settings = [
+            ("dense", 4, lambda q, v, k: hybrid_search.search(dense_only, q, v, k)),
+            ("dense", 3, lambda q, v, k: hybrid_search.search(dense_only, q, v, k)),
+            ("bm25", 3, lexical_search),
+            ("hybrid", 3, lambda q, v, k: hybrid_search.search(hybrid, q, v, k)),
+            ("hybrid", 4, lambda q, v, k: hybrid_search.search(hybrid, q, v, k)),
+        ]
+        print(f"🧪 {len(unique)} chunks, {len(EVAL_SET)} questions, {args.embeddings} embeddings")
+        print(f"{'retriever':<10} {'k':>2} {'recall':>7} {'MRR':>6} {'ctx tokens':>11} {'p50 ms':>7} {'p99 ms':>7}")
+        for name, k, run in settings:
+            hits, reciprocal_ranks, tokens, latencies = 0, [], [], []
+            for (question, phrases), vector in zip(EVAL_SET, vectors):
+                docs = run(question, vector, k)
+                ranks = [i for i, doc in enumerate(docs, start=1) if relevant(doc, phrases)]
+                hits += bool(ranks)
+                reciprocal_ranks.append(1 / ranks[0] if ranks else 0.0)
+                tokens.append(sum(count_tokens(doc.page_content) for doc in docs))
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    run(question, vector, k)
+                    latencies.append((time.perf_counter() - start) * 1000)
+            print(
+                f"{name:<10} {k:>2} {hits / len(EVAL_SET):>7.2f} {np.mean(reciprocal_ranks):>6.2f} "
+                f"{np.mean(tokens):>11.0f} {np.percentile(latencies, 50):>7.2f} {np.percentile(latencies, 99):>7.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Load time and memory of the pickled LangChain index versus the memory-mapped
+index with an SQLite docstore, measured in separate worker processes the way
+the bot, Streamlit and API workers each load their own copy.
+
+    python bench_index_loading.py --chunks 100000 --dim 1536 --workers 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+CHUNK_TEXT = "PrimeLeads identifies, enriches and scores leads; PrimeReachOut runs the outreach. " * 10
+
+
+def process_memory_mb() -> dict:
+    """Anonymous (private heap) and file-backed (shareable page cache) resident memory."""
+    memory = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("VmRSS", "RssAnon", "RssFile")):
+                key, value = line.split(":")
+                memory[key] = int(value.split()[0]) / 1024
+    return memory
+
+
+def child(fmt: str, path: str, queries: int):
+    from langchain_core.embeddings import FakeEmbeddings
+
+    from faiss_store import load_store
+
+    before = process_memory_mb()
+    start = time.perf_counter()
+    db = load_store(path, FakeEmbeddings(size=1))
+    load_seconds = time.perf_counter() - start
+
+    rng = np.random.default_rng(0)
+    latencies = []
+    for vector in rng.standard_normal((queries, db.index.d)).astype(np.float32):
+        start = time.perf_counter()
+        db.similarity_search_by_vector(vector.tolist(), k=4)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    after = process_memory_mb()
+    print(json.dumps({
+        "format": fmt,
+        "load_s": load_seconds,
+        "first_query_ms": latencies[0],
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "anon_mb": after["RssAnon"] - before["RssAnon"],
+        "file_mb": after["RssFile"] - before["RssFile"],
+    }))
+
+
+def build(chunks: int, dim: int, pickle_path: str, store_path: str):
+    from langchain.vectorstores.faiss import FAISS
+    from langchain_core.embeddings import FakeEmbeddings
+
+    from faiss_store import save_store
+
+    vectors = np.random.default_rng(0).standard_normal((chunks, dim)).astype(np.float32)
+    db = FAISS.from_embeddings(
+        [(f"{i} {CHUNK_TEXT}", v) for i, v in enumerate(vectors.tolist())],
+        FakeEmbeddings(size=dim),
+        metadatas=[{"source": f"data/kb_{i // 100}.pdf", "page": i % 100} for i in range(chunks)],
+        ids=[f"data/kb_{i // 100}.pdf:{i % 100}:{i}" for i in range(chunks)],
+    )
+    db.save_local(pickle_path)
+    save_store(db, store_path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--child", nargs=2, metavar=("FORMAT", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child, args.queries)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pickle_path, store_path = os.path.join(tmp, "pickle"), os.path.join(tmp, "store")
+        print(f"🧪 Building {args.chunks} chunks x {args.dim} dims in both formats")
+        build(args.chunks, args.dim, pickle_path, store_path)
+        for fmt, path in (("pickle", pickle_path), ("mmap+sqlite", store_path)):
+            size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+            # Workers run concurrently, like the services sharing one host
+            procs = [
+                subprocess.Popen(
+                    [sys.executable, __file__, "--child", fmt, path, "--queries", str(args.queries)],
+                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+                )
+                for _ in range(args.workers)
+            ]
+            results = [json.loads(p.communicate()[0].strip().splitlines()[-1]) for p in procs]
+            print(
+                f"{fmt:<12} on disk {size / 2**20:7.1f} MB | load {np.mean([r['load_s'] for r in results]):6.3f} s | "
+                f"first query {np.mean([r['first_query_ms'] for r in results]):7.2f} ms | "
+                f"p50 {np.mean([r['p50_ms'] for r in results]):6.2f} ms | "
+                f"private {np.mean([r['anon_mb'] for r in results]):7.1f} MB/worker | "
+                f"page cache {np.mean([r['file_mb'] for r in results]):7.1f} MB/worker (shared)"
+            )
+
+
+if __name__ == "__main__":
+    main()
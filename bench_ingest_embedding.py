@@ -0,0 +1,40 @@
+"""
+Ingestion embedding throughput versus worker count, against the local fake
+embedding server (no OpenAI calls).
+
+    python bench_ingest_embedding.py --chunks 4000 --workers 1 2 4 8
+"""
+import argparse
+
+from langchain_openai import OpenAIEmbeddings
+
+from batch_embedder import BatchEmbedder
+from fake_openai_server import FakeOpenAIServer
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--batch-tokens", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per embeddings request.")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(0, embedding_latency=args.latency).start()
+    embeddings = OpenAIEmbeddings(base_url=server.base_url, api_key="sk-fake", check_embedding_ctx_length=False)
+    texts = [
+        f"Chunk {i}: PrimeLeads identifies, enriches and scores leads; PrimeReachOut owns outreach. " * 8
+        for i in range(args.chunks)
+    ]
+
+    for workers in args.workers:
+        embedder = BatchEmbedder(embeddings, batch_tokens=args.batch_tokens, concurrency=workers)
+        for _ in embedder.iter_batches(texts):
+            pass
+        embedder.report()
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
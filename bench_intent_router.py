@@ -0,0 +1,76 @@
+"""
+Hit-rate and latency of the local intent router on held-out messages.
+
+    python bench_intent_router.py
+"""
+import statistics
+import time
+
+from intent_router import GREETING, KB_QUESTION, PRIMELEADS, PRIMEREACHOUT, route_intent
+
+# Not part of intent_router.LABELED_EXAMPLES
+EVAL_SET = [
+    ("Hello!", GREETING),
+    ("hey there", GREETING),
+    ("Good evening", GREETING),
+    ("hi, how are you doing today", GREETING),
+    ("thank you", GREETING),
+    ("Use PrimeLeads", PRIMELEADS),
+    ("please run prime leads", PRIMELEADS),
+    ("I'd like to use PrimeLeads on our company site", PRIMELEADS),
+    ("can you find leads for my website", PRIMELEADS),
+    ("prime leads", PRIMELEADS),
+    ("email these leads for me", PRIMEREACHOUT),
+    ("send a follow up to the prospects", PRIMEREACHOUT),
+    ("schedule interviews with the shortlisted candidates", PRIMEREACHOUT),
+    ("contact the leads on linkedin", PRIMEREACHOUT),
+    ("book a demo call with these prospects", PRIMEREACHOUT),
+    ("What does PrimeLeads do?", KB_QUESTION),
+    ("What is the difference between PrimeRecruits and PrimeLeads?", KB_QUESTION),
+    ("How does PrimeVision handle invoices?", KB_QUESTION),
+    ("Does PrimeCRM deduplicate records?", KB_QUESTION),
+    ("What pricing plans are available?", KB_QUESTION),
+    ("Which product handles lead scoring?", KB_QUESTION),
+    ("How do I connect my CRM to Primius.ai?", KB_QUESTION),
+    ("Can PrimeLeads send emails?", KB_QUESTION),
+    ("Tell me about FastAutomate", KB_QUESTION),
+    ("What kind of data sources does PrimeLeads enrich from?", KB_QUESTION),
+    ("Can I use PrimeLeads for recruiting?", KB_QUESTION),
+    ("Should I use PrimeLeads or PrimeRecruits?", KB_QUESTION),
+    ("Send me the pricing pdf", KB_QUESTION),
+]
+
+
+def main(repeats: int = 200):
+    correct = routed = routable = false_routes = kb_total = 0
+    for text, expected in EVAL_SET:
+        route = route_intent(text)
+        predicted = route.intent if route else KB_QUESTION
+        correct += predicted == expected
+        if expected == KB_QUESTION:
+            kb_total += 1
+            false_routes += route is not None
+        else:
+            routable += 1
+            routed += route is not None and route.intent == expected
+
+    samples = []
+    for _ in range(repeats):
+        for text, _ in EVAL_SET:
+            start = time.perf_counter()
+            route_intent(text)
+            samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+
+    print(f"📊 Intent router over {len(EVAL_SET)} held-out messages")
+    print(f"Accuracy:                      {correct / len(EVAL_SET):.0%}")
+    print(f"Routing intents short-circuited: {routed}/{routable} ({routed / routable:.0%})")
+    print(f"KB questions wrongly routed:   {false_routes}/{kb_total}")
+    print(
+        f"Latency: mean {statistics.mean(samples):.1f} µs, p50 {statistics.median(samples):.1f} µs, "
+        f"p99 {samples[int(len(samples) * 0.99)]:.1f} µs"
+    )
+
+
+if __name__ == "__main__":
+    main()
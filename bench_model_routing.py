@@ -0,0 +1,89 @@
+"""
+Which chat model the router picks for the evaluation questions of
+bench_hybrid_retrieval.py plus broad and advisory ones, and what that does
+to the projected LLM bill and answer latency against sending everything to
+the strong model. Features come from the real index; prompt tokens are the
+system prompt, template and packed context, the answer is assumed to be
+--answer-tokens long and --fast-ms / --strong-ms are the per-tier answer
+latencies to assume.
+
+    OPENAI_API_KEY=... python bench_model_routing.py
+    python bench_model_routing.py --embeddings hash   # offline, no API calls
+    python bench_model_routing.py --verbose           # the tier and reason of every question
+"""
+import argparse
+import tempfile
+
+import numpy as np
+from langchain.vectorstores.faiss import FAISS
+
+import hybrid_search
+import model_router
+from bench_hierarchical_retrieval import BROAD_SET
+from bench_hybrid_retrieval import EVAL_SET
+from context_packer import pack_context
+from get_embading_function import BACKENDS, get_embedding_function, similarity_thresholds
+from lexical_index import LexicalIndex
+from populate_db import calculate_chunk_ids, load_documents, split_documents
+from query_data import _build_messages
+from rag_runtime import IndexSnapshot
+from token_utils import count_tokens
+
+# Questions that ask for judgement across products or a plan, not one fact
+ADVISORY_SET = [
+    "We are a 20-person recruiting agency drowning in CVs. Which products should we start with and why?",
+    "Compare PrimeLeads and PrimeCRM for cleaning up our existing lead lists.",
+    "What is the best way to move our outreach from spreadsheets into PrimeReachOut?",
+    "Should we use PrimeVision or keep our current RPA tool for invoice processing?",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--embeddings", choices=list(BACKENDS), default="openai")
+    parser.add_argument("--answer-tokens", type=int, default=150)
+    parser.add_argument("--fast-ms", type=float, default=900, help="Assumed answer latency of the fast model")
+    parser.add_argument("--strong-ms", type=float, default=4500, help="Assumed answer latency of the strong model")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    questions = [q for q, _ in EVAL_SET + BROAD_SET] + ADVISORY_SET
+    embeddings = get_embedding_function(args.embeddings)
+    confident = similarity_thresholds(embeddings).confident
+    chunks = calculate_chunk_ids(split_documents(load_documents()))
+    unique = list({c.metadata["id"]: c for c in chunks}.values())
+    db = FAISS.from_documents(unique, embeddings, ids=[c.metadata["id"] for c in unique])
+    vectors = embeddings.embed_documents(questions)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        LexicalIndex(tmp).sync(db)
+        snapshot = IndexSnapshot("bench", db, None, LexicalIndex.open(tmp))
+
+        routed_usd, strong_usd, routed_ms, reasons = [], [], [], {}
+        for question, vector in zip(questions, vectors):
+            candidates = hybrid_search.search_scored(snapshot, question, vector)
+            docs = pack_context(candidates, max_chunks=hybrid_search.result_size(snapshot), min_similarity=-1.0)
+            prompt = sum(count_tokens(m.content) for m in _build_messages(question, docs))
+            choice = model_router.choose_model(model_router.question_features(question, candidates), confident)
+            routed_usd.append(model_router.cost(choice.model, prompt, args.answer_tokens))
+            strong_usd.append(model_router.cost(model_router.RAG_STRONG_MODEL, prompt, args.answer_tokens))
+            routed_ms.append(args.fast_ms if choice.tier == model_router.FAST else args.strong_ms)
+            reasons[choice.reason] = reasons.get(choice.reason, 0) + 1
+            if args.verbose:
+                print(f"{choice.tier:<7} {choice.reason:<30} {question}")
+        snapshot.lexical.close()
+
+    fast = sum(ms == args.fast_ms for ms in routed_ms)
+    print(
+        f"🧪 {len(questions)} questions, {args.embeddings} embeddings, "
+        f"{model_router.RAG_FAST_MODEL} / {model_router.RAG_STRONG_MODEL}"
+    )
+    print(f"{'policy':<12} {'fast share':>10} {'$ / 1k q':>9} {'mean ms':>8}")
+    print(f"{'all strong':<12} {0:>10.2f} {np.mean(strong_usd) * 1000:>9.2f} {args.strong_ms:>8.0f}")
+    print(f"{'routed':<12} {fast / len(questions):>10.2f} {np.mean(routed_usd) * 1000:>9.2f} {np.mean(routed_ms):>8.0f}")
+    for reason, count in sorted(reasons.items(), key=lambda item: -item[1]):
+        print(f"  {count:>3}  {reason}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+PDF parsing time for PyPDFDirectoryLoader versus the process-pool loader on a
+synthetic corpus, for an increasing number of workers.
+
+    python bench_pdf_loading.py --pdfs 200 --pages 12 --workers 1 2 4 8
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from langchain_community.document_loaders import PyPDFDirectoryLoader
+
+from parallel_pdf_loader import load_pdfs_parallel
+
+LINE = "PrimeLeads identifies, enriches and scores leads. PrimeReachOut owns outreach and scheduling."
+
+
+def write_synthetic_pdf(path: str, pages: int, lines_per_page: int = 40):
+    """Minimal valid PDF with Helvetica text on every page (no third-party writer needed)."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for p in range(pages):
+        text = "".join(
+            f"({LINE} page {p + 1} line {i + 1}) Tj T* " for i in range(lines_per_page)
+        )
+        stream = f"BT /F1 9 Tf 11 TL 36 800 Td {text}ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{i} 0 R" for i in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdfs", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=12)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_path:
+        for i in range(args.pdfs):
+            write_synthetic_pdf(os.path.join(data_path, f"kb_{i:04d}.pdf"), args.pages)
+
+        start = time.perf_counter()
+        baseline = PyPDFDirectoryLoader(data_path).load()
+        baseline_s = time.perf_counter() - start
+        expected = sorted((d.metadata["source"], d.metadata["page"], d.page_content) for d in baseline)
+
+        print(f"📊 {args.pdfs} PDFs x {args.pages} pages, {os.cpu_count()} cores available")
+        print(f"{'PyPDFDirectoryLoader':<24} {baseline_s:7.2f}s")
+        for workers in sorted(set(args.workers)):
+            start = time.perf_counter()
+            docs = load_pdfs_parallel(data_path, workers=workers)
+            elapsed = time.perf_counter() - start
+            same = [(d.metadata["source"], d.metadata["page"], d.page_content) for d in docs] == expected
+            print(
+                f"{f'parallel, {workers} workers':<24} {elapsed:7.2f}s  "
+                f"speed-up {baseline_s / elapsed:4.1f}x  identical output: {same}"
+            )
+
+
+if __name__ == "__main__":
+    main()
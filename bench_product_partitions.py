@@ -0,0 +1,107 @@
+"""
+Whole-index retrieval against product-scoped retrieval (per-product FAISS
+partitions plus the BM25 product filter) on the evaluation questions that
+name a product: vectors scanned per question, dense search latency, hit
+rate at k and the packed context tokens the LLM would receive.
+
+    OPENAI_API_KEY=... python bench_product_partitions.py
+    python bench_product_partitions.py --embeddings hash              # offline, no API calls
+    python bench_product_partitions.py --embeddings hash --scale 200  # latency at ~200x the KB
+
+--scale N times the search of N-fold copies of the index and of each
+partition (with a little noise), to show how the two scale once the
+knowledge base is larger than the few dozen chunks in data/; hit rate and
+context tokens always come from the real index.
+"""
+import argparse
+import tempfile
+import time
+
+import faiss
+import numpy as np
+from langchain.vectorstores.faiss import FAISS
+
+import hybrid_search
+from ann_index import index_vectors, resolve_config
+from bench_hybrid_retrieval import EVAL_SET, relevant
+from context_packer import pack_context
+from get_embading_function import BACKENDS, get_embedding_function, similarity_thresholds
+from lexical_index import LexicalIndex
+from populate_db import calculate_chunk_ids, load_documents, split_documents
+from product_scope import ProductPartitions, question_products, save_partitions
+from rag_runtime import IndexSnapshot
+from token_utils import count_tokens
+
+
+def scaled_index(vectors: np.ndarray, scale: int, rng) -> faiss.IndexFlatL2:
+    """A flat index of vectors plus scale - 1 noisy copies of them, to time searches on a bigger KB."""
+    copies = [vectors] + [vectors + rng.normal(0, 0.01, vectors.shape).astype(np.float32) for _ in range(scale - 1)]
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(np.vstack(copies))
+    return index
+
+
+def _latency_ms(index, vector, k: int, repeat: int) -> float:
+    query = np.asarray([vector], dtype=np.float32)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        index.search(query, k)
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--embeddings", choices=list(BACKENDS), default="openai")
+    parser.add_argument("--k", type=int, default=hybrid_search.RAG_TOP_K)
+    parser.add_argument("--scale", type=int, default=1, help="Copies of the index searched for the latency column")
+    parser.add_argument("--repeat", type=int, default=50, help="Timing repetitions per question")
+    args = parser.parse_args()
+
+    questions = [(q, phrases, question_products(q)) for q, phrases in EVAL_SET if question_products(q)]
+    embeddings = get_embedding_function(args.embeddings)
+    min_similarity = similarity_thresholds(embeddings).relevant
+    chunks = calculate_chunk_ids(split_documents(load_documents()))
+    unique = list({c.metadata["id"]: c for c in chunks}.values())
+    db = FAISS.from_documents(unique, embeddings, ids=[c.metadata["id"] for c in unique])
+    vectors = embeddings.embed_documents([q for q, _, _ in questions])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        save_partitions(db, tmp, resolve_config({}))
+        LexicalIndex(tmp).sync(db)
+        lexical = LexicalIndex.open(tmp)
+        partitions = ProductPartitions.open(tmp, nprobe=1, ef_search=16)
+        full = IndexSnapshot("bench", db, None, lexical)
+        scoped = IndexSnapshot("bench", db, None, lexical, partitions)
+
+        rng = np.random.default_rng(0)
+        timed_full = scaled_index(index_vectors(db.index), args.scale, rng)
+        timed_parts = {p: scaled_index(index_vectors(i), args.scale, rng) for p, i in partitions.indexes.items()}
+
+        print(
+            f"🧪 {len(unique)} chunks (x{args.scale} for latency), {len(questions)} product questions, "
+            f"{args.embeddings} embeddings, k={args.k}"
+        )
+        print(f"{'retrieval':<10} {'scanned':>8} {'dense ms':>9} {'hit rate':>8} {'ctx tokens':>10}")
+        for name, snapshot in (("full", full), ("scoped", scoped)):
+            scanned, latencies, hits, tokens = [], [], 0, []
+            for (question, phrases, products), vector in zip(questions, vectors):
+                if snapshot is full:
+                    indexes = [timed_full]
+                else:
+                    indexes = [timed_parts[p] for p in products if p in timed_parts]
+                scanned.append(sum(index.ntotal for index in indexes))
+                latencies.append(sum(_latency_ms(index, vector, hybrid_search.RAG_FUSION_DEPTH, args.repeat)
+                                     for index in indexes))
+                candidates = hybrid_search.search_scored(snapshot, question, vector)
+                hits += any(relevant(c.doc, phrases) for c in candidates[:args.k])
+                docs = pack_context(candidates, min_similarity, max_chunks=args.k)
+                tokens.append(sum(count_tokens(doc.page_content) for doc in docs))
+            print(
+                f"{name:<10} {np.mean(scanned):>8.0f} {np.mean(latencies):>9.3f} "
+                f"{hits / len(questions):>8.2f} {np.mean(tokens):>10.0f}"
+            )
+        lexical.close()
+
+
+if __name__ == "__main__":
+    main()
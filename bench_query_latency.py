@@ -0,0 +1,81 @@
+"""
+Per-query latency of query_rag before/after keeping the index resident.
+
+    python bench_query_latency.py              # setup cost only, no API calls
+    python bench_query_latency.py --live -n 5  # full questions against OpenAI
+"""
+import argparse
+import os
+import statistics
+import time
+
+from dotenv import load_dotenv
+from langchain.vectorstores.faiss import FAISS
+from langchain.chains import RetrievalQA
+from langchain_openai import ChatOpenAI
+from get_embading_function import get_embedding_function
+from query_data import query_rag
+from rag_runtime import FAISS_PATH, get_runtime
+
+load_dotenv()
+
+QUESTIONS = [
+    "What does PrimeLeads do?",
+    "Can PrimeRecruits contact candidates for me?",
+    "How does PrimeVision automate document workflows?",
+    "What is Primius.ai?",
+    "Which product schedules meetings with leads?",
+]
+
+
+def reload_per_query(question: str, live: bool):
+    # What query_rag used to do for every question
+    db = FAISS.load_local(FAISS_PATH, embeddings=get_embedding_function(), allow_dangerous_deserialization=True)
+    llm = ChatOpenAI(model="gpt-4", temperature=0, api_key=os.getenv("OPENAI_API_KEY"))
+    chain = RetrievalQA.from_chain_type(llm=llm, retriever=db.as_retriever())
+    if live:
+        chain.invoke({"query": question})
+
+
+def resident(question: str, live: bool):
+    get_runtime().snapshot()
+    if live:
+        query_rag(question)
+
+
+def timed(fn, runs: int, live: bool):
+    samples = []
+    for i in range(runs):
+        start = time.perf_counter()
+        fn(QUESTIONS[i % len(QUESTIONS)], live)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(label: str, samples: list[float]):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{label:<22} mean {statistics.mean(samples):8.2f} ms   p50 {statistics.median(samples):8.2f} ms   p95 {p95:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--runs", type=int, default=50)
+    parser.add_argument("--live", action="store_true", help="Also run the questions through the LLM.")
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+    get_runtime().snapshot()  # first load is paid once at process start-up
+    before = timed(reload_per_query, args.runs, args.live)
+    after = timed(resident, args.runs, args.live)
+
+    mode = "end-to-end" if args.live else "setup only"
+    print(f"📊 query_rag latency ({mode}, {args.runs} runs)")
+    report("reload per query", before)
+    report("resident runtime", after)
+    print(f"Saved per query: {statistics.mean(before) - statistics.mean(after):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
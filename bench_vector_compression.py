@@ -0,0 +1,81 @@
+"""
+Memory saved versus recall lost by each vector codec / dimensionality
+reduction, against exact float32 search over the same vectors.
+
+    python bench_vector_compression.py --vectors 200000 --dim 1536
+    python bench_vector_compression.py --index faiss_index --holdout 0.1
+
+With --index, the evaluation set is the knowledge base's own vectors: a
+held-out fraction of them is used as queries against the rest.
+"""
+import argparse
+
+import faiss
+import numpy as np
+
+from ann_index import IndexConfig, build_index, index_vectors
+from bench_ann_index import recall_at_k, synthetic_corpus
+
+LAYOUTS = [
+    ("float32", "none", 0),
+    ("float16", "none", 0),
+    ("int8", "none", 0),
+    ("float32", "pca", 2),
+    ("float32", "pca", 4),
+    ("float32", "truncate", 2),
+    ("float16", "pca", 2),
+    ("int8", "pca", 4),
+]
+
+
+def evaluation_set(args) -> tuple[np.ndarray, np.ndarray]:
+    if not args.index:
+        return (
+            synthetic_corpus(args.vectors, args.dim, args.clusters),
+            synthetic_corpus(args.queries, args.dim, args.clusters, seed=1),
+        )
+    vectors = index_vectors(faiss.read_index(f"{args.index}/index.faiss")).astype(np.float32)
+    rng = np.random.default_rng(0)
+    order = rng.permutation(len(vectors))
+    held_out = max(1, int(len(vectors) * args.holdout))
+    return vectors[order[held_out:]], vectors[order[:held_out]]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--index", help="Evaluate on the vectors of this FAISS index directory instead")
+    parser.add_argument("--holdout", type=float, default=0.1)
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+
+    corpus, queries = evaluation_set(args)
+    n, dim = corpus.shape
+    exact = faiss.IndexFlatL2(dim)
+    exact.add(corpus)
+    _, truth = exact.search(queries, args.k)
+    print(f"🧪 {n} vectors x {dim} dims, {len(queries)} queries")
+
+    print(f"{'layout':<22} {'bytes/vec':>10} {'total MB':>9} {'saved':>7} {f'recall@{args.k}':>9}")
+    baseline = None
+    for codec, reduce, divisor in LAYOUTS:
+        reduce_dim = dim // divisor if divisor else 0
+        if reduce == "pca" and n < reduce_dim:
+            continue
+        config = IndexConfig(codec=codec, reduce=reduce, reduce_dim=reduce_dim)
+        index = build_index(config, corpus)
+        size = len(faiss.serialize_index(index))
+        baseline = baseline or size
+        _, found = index.search(queries, args.k)
+        label = codec if reduce == "none" else f"{codec} {reduce}-{reduce_dim}"
+        print(
+            f"{label:<22} {size / n:>10.0f} {size / 2**20:>9.1f} {1 - size / baseline:>7.1%} "
+            f"{recall_at_k(found, truth):>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import os
+import re
+from typing import Iterable, Iterator, NamedTuple
+
+from langchain.schema.document import Document
+
+from token_utils import count_tokens
+
+# "structured" (below) or "recursive": the original 800/80-character splitter
+CHUNKER = os.getenv("CHUNKER", "structured")
+# Chunk length in model tokens; 200 is about the old 800 characters of English
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "200"))
+# Trailing blocks of a chunk repeated at the start of the next, within one section
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "20"))
+# A heading starts a new chunk once the current one is at least this full
+MIN_SECTION_FRACTION = 0.5
+HEADING_MAX_CHARS = 70
+# Bumped whenever the structured chunker splits or labels the same pages differently
+STRUCTURED_VERSION = 2
+
+# "1. Introduction", "3.2 Creating a New ICP", "Phase 3 – Tone & Message Review", "Part 1: Strategic Overview"
+_NUMBERED_HEADING = re.compile(r"^(\d+(\.\d+)*\.?|(Part|Phase|Step|Section|Chapter) \d+[:.–-]?)\s+\S")
+# "•", "o" (Wingdings sub-bullets as extracted by pypdf), "-", "1." / "a)" list items
+_BULLET = re.compile(r"^([•●▪◦‣∙·o*–-]|\d+[.)]|[a-z][.)])\s+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+# "## Proof Points", "== PrimeCRM ==": Markdown exported to PDF keeps its heading markers
+_MARKDOWN_HEADING = re.compile(r"^(#{1,6}\s+\S|==.*==$)")
+# Headings that open a section ("3.2 PrimeLeads — ...", "# PrimeVision", "== Pricing ==") rather
+# than a sub-heading ("Description", "Phase 2 – Processing") or a short numbered step
+_SECTION_HEADING = re.compile(r"^(==|#\s|\d+\.\d+\s|\d+\.\s+[A-Z][^*]*$)")
+SECTION_MAX_WORDS = 6
+
+
+class Block(NamedTuple):
+    kind: str  # "heading", "item" or "text"
+    text: str
+    page: dict  # metadata of the page the block starts on
+    tokens: int
+    section: str | None = None  # the section heading the block falls under
+
+
+def is_heading(line: str) -> bool:
+    """Short line without closing punctuation that is numbered or reads like a title, or a Markdown heading."""
+    if _MARKDOWN_HEADING.match(line):
+        return True
+    if len(line) > HEADING_MAX_CHARS or line.endswith((".", ",", ";", ":")):
+        return False
+    if _NUMBERED_HEADING.match(line):
+        return True
+    words = line.split()
+    return bool(words) and len(words) <= 8 and line[0].isupper() and not _BULLET.match(line)
+
+
+def is_section_heading(line: str) -> bool:
+    """Heading that opens a top-level section of a document, as opposed to a sub-heading or a step."""
+    if not _SECTION_HEADING.match(line):
+        return False
+    # "4. Lead Scoring — Ranks leads by fit and" is a wrapped list item, not a section
+    return line.startswith(("==", "#")) or len(line.split()) <= SECTION_MAX_WORDS + 1
+
+
+def page_blocks(page: Document) -> Iterator[Block]:
+    """
+    Headings, list items and paragraphs of one extracted page. Wrapped lines
+    are joined to the block they continue; blank lines end a block.
+    """
+    kind, lines = None, []
+
+    def block():
+        text = "\n".join(lines)
+        return Block(kind, text, page.metadata, count_tokens(text))
+
+    for raw in page.page_content.splitlines():
+        line = raw.strip()
+        if not line:
+            if lines:
+                yield block()
+            kind, lines = None, []
+        elif is_heading(line) or _BULLET.match(line) or kind in (None, "heading"):
+            if lines:
+                yield block()
+            kind = "heading" if is_heading(line) else "item" if _BULLET.match(line) else "text"
+            lines = [line]
+        else:
+            lines.append(line)
+    if lines:
+        yield block()
+
+
+def _split_oversized(block: Block, chunk_tokens: int) -> Iterator[Block]:
+    """Cut a block longer than a chunk at sentence ends, and at word gaps if a sentence is too long."""
+    pieces = []
+    for sentence in _SENTENCE_END.split(block.text):
+        if count_tokens(sentence) <= chunk_tokens:
+            pieces.append(sentence)
+            continue
+        words = []
+        for word in sentence.split(" "):
+            if words and count_tokens(" ".join(words + [word])) > chunk_tokens:
+                pieces.append(" ".join(words))
+                words = []
+            words.append(word)
+        pieces.append(" ".join(words))
+
+    text = ""
+    for piece in pieces:
+        candidate = f"{text} {piece}" if text else piece
+        if text and count_tokens(candidate) > chunk_tokens:
+            yield block._replace(text=text, tokens=count_tokens(text))
+            candidate = piece
+        text = candidate
+    if text:
+        yield block._replace(text=text, tokens=count_tokens(text))
+
+
+def _chunk(blocks: list[Block]) -> Document:
+    first, last = blocks[0].page, blocks[-1].page
+    # "page" is where the chunk starts, so chunk IDs and manifests keep their meaning
+    metadata = {**first, "page_end": last.get("page")}
+    if blocks[0].section:
+        metadata["section"] = blocks[0].section
+    return Document(page_content="\n".join(b.text for b in blocks), metadata=metadata)
+
+
+def _overlap(blocks: list[Block], overlap_tokens: int) -> list[Block]:
+    carried, tokens = [], 0
+    for block in reversed(blocks):
+        if tokens + block.tokens > overlap_tokens:
+            break
+        carried.insert(0, block)
+        tokens += block.tokens
+    # Never start a chunk with nothing but repeated text
+    return carried if len(carried) < len(blocks) else []
+
+
+def iter_chunks(
+    pages: Iterable[Document],
+    chunk_tokens: int = CHUNK_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+) -> Iterator[Document]:
+    """
+    Token-measured chunks of (source, page)-ordered pages. Chunks break at
+    headings once they are half full and otherwise between list items and
+    paragraphs, so a section is not cut mid-sentence; a chunk may run on
+    into the next page of the same PDF and records its last page in
+    "page_end", and the section heading it starts under in "section".
+    Pages are consumed lazily and only the chunk being built is held, so any
+    page iterator can be streamed through.
+    """
+    current: list[Block] = []
+    tokens = 0
+    source = section = None
+    for page in pages:
+        if page.metadata.get("source") != source:
+            if current:
+                yield _chunk(current)
+            current, tokens, source, section = [], 0, page.metadata.get("source"), None
+        for block in page_blocks(page):
+            if block.kind == "heading" and is_section_heading(block.text):
+                section = block.text
+            block = block._replace(section=section)
+            for piece in _split_oversized(block, chunk_tokens) if block.tokens > chunk_tokens else [block]:
+                new_section = piece.kind == "heading" and tokens >= chunk_tokens * MIN_SECTION_FRACTION
+                if current and (new_section or tokens + piece.tokens + 1 > chunk_tokens):
+                    # Headings go with the text under them, not at the end of the previous chunk
+                    trailing = []
+                    while current and current[-1].kind == "heading":
+                        trailing.insert(0, current.pop())
+                    if current:
+                        yield _chunk(current)
+                    current = ([] if new_section else _overlap(current, overlap_tokens)) + trailing
+                    tokens = sum(b.tokens + 1 for b in current)
+                current.append(piece)
+                tokens += piece.tokens + 1
+    if current:
+        yield _chunk(current)
+
+
+def chunker_signature() -> str:
+    """Identifies the chunking settings; files chunked with other settings are re-ingested."""
+    if CHUNKER == "recursive":
+        return "recursive:800:80"
+    return f"structured{STRUCTURED_VERSION}:{CHUNK_TOKENS}:{CHUNK_OVERLAP_TOKENS}"
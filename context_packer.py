@@ -0,0 +1,128 @@
+import os
+
+from langchain.schema.document import Document
+
+from near_duplicates import shingles
+from token_utils import count_tokens
+
+# Dense hits need the embedding backend's `relevant` similarity to the question
+# (get_embading_function.similarity_thresholds); BM25 hits need this
+# IDF-weighted share of the question's terms instead. On
+# data/, off-topic questions ("a python script to sort a list") reach 0.31
+# through one shared word and KB questions 0.4 or more.
+RAG_MIN_TERM_COVERAGE = float(os.getenv("RAG_MIN_TERM_COVERAGE", "0.4"))
+# Tokens of retrieved context per prompt, after merging and deduplication
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "1200"))
+# Word-trigram Jaccard similarity above which two chunks count as the same text
+DUPLICATE_THRESHOLD = 0.8
+# Shortest suffix/prefix overlap that joins two chunks of one page; the splitter
+# overlaps neighbours by up to 80 characters
+MIN_OVERLAP_CHARS = 20
+MAX_OVERLAP_CHARS = 200
+
+
+def is_relevant(candidate, min_similarity: float, min_coverage: float = RAG_MIN_TERM_COVERAGE) -> bool:
+    """Close enough to the question in embedding space, or found by BM25 for enough of its terms."""
+    if candidate.similarity is not None and candidate.similarity >= min_similarity:
+        return True
+    return candidate.lexical_rank is not None and (candidate.lexical_coverage or 0.0) >= min_coverage
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def deduplicate(docs: list[Document], threshold: float = DUPLICATE_THRESHOLD) -> list[Document]:
+    """Drop chunks whose text nearly repeats a better-ranked one (re-uploaded or copied pages)."""
+    kept, kept_shingles = [], []
+    for doc in docs:
+        doc_shingles = shingles(doc.page_content)
+        if all(_jaccard(doc_shingles, other) < threshold for other in kept_shingles):
+            kept.append(doc)
+            kept_shingles.append(doc_shingles)
+    return kept
+
+
+def overlap(first: str, second: str) -> int:
+    """Length of the longest end of `first` that `second` starts with, 0 below MIN_OVERLAP_CHARS."""
+    for size in range(min(len(first), len(second), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if first.endswith(second[:size]):
+            return size
+    return 0
+
+
+def source_ids(doc: Document) -> list[str]:
+    """Chunk IDs a packed document was built from."""
+    return doc.metadata.get("ids") or [doc.metadata.get("id") or doc.metadata.get("source")]
+
+
+def _join(first: Document, second: Document, size: int) -> Document:
+    metadata = {**first.metadata, "ids": source_ids(first) + source_ids(second)}
+    return Document(page_content=first.page_content + second.page_content[size:], metadata=metadata)
+
+
+def _page(doc: Document) -> tuple:
+    return doc.metadata.get("source"), doc.metadata.get("page")
+
+
+def merge_adjacent(docs: list[Document]) -> list[Document]:
+    """
+    Join chunks of the same source page that the splitter cut with an
+    overlap, so the shared text is sent once. A merged chunk takes the place
+    of its best-ranked part and lists every part's ID under "ids".
+    """
+    merged: list[Document] = []
+    for doc in docs:
+        position = len(merged)
+        joined = True
+        while joined:  # the joined text may now touch another chunk
+            joined = False
+            for i, other in enumerate(merged):
+                if _page(other) != _page(doc):
+                    continue
+                if size := overlap(other.page_content, doc.page_content):
+                    doc = _join(other, doc, size)
+                elif size := overlap(doc.page_content, other.page_content):
+                    doc = _join(doc, other, size)
+                else:
+                    continue
+                del merged[i]
+                position, joined = min(position, i), True
+                break
+        merged.insert(position, doc)
+    return merged
+
+
+def _truncate(doc: Document, budget: int) -> Document:
+    tokens = count_tokens(doc.page_content)
+    text = doc.page_content[: len(doc.page_content) * budget // tokens]
+    while text and count_tokens(text) > budget:
+        text = text[: int(len(text) * 0.9)]
+    return Document(page_content=text.rsplit(" ", 1)[0] if " " in text else text, metadata=doc.metadata)
+
+
+def pack_context(
+    candidates,
+    min_similarity: float,
+    budget: int = RAG_CONTEXT_TOKENS,
+    max_chunks: int | None = None,
+) -> list[Document]:
+    """
+    Context for one prompt from ranked hybrid_search.Candidates: irrelevant
+    chunks (dense similarity below min_similarity, on the embedding backend's
+    scale, and too few BM25 terms) dropped, near-duplicates removed, the best max_chunks kept with
+    overlapping neighbours joined, then as many as fit in `budget` tokens in
+    rank order. Empty when nothing in the knowledge base is relevant.
+    """
+    docs = deduplicate([candidate.doc for candidate in candidates if is_relevant(candidate, min_similarity)])
+    packed, used = [], 0
+    for doc in merge_adjacent(docs[:max_chunks]):
+        tokens = count_tokens(doc.page_content)
+        if used + tokens <= budget:
+            packed.append(doc)
+            used += tokens
+        elif not packed:
+            # The best chunk alone is over budget; send as much of it as fits
+            packed.append(_truncate(doc, budget))
+            used = budget
+    return packed
@@ -0,0 +1,112 @@
+import os
+import re
+import zlib
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+LOCAL_EMBEDDING_BATCH = int(os.getenv("LOCAL_EMBEDDING_BATCH", "32"))
+# 0 = let onnxruntime use every core; set lower when API or bot workers share the host
+LOCAL_EMBEDDING_THREADS = int(os.getenv("LOCAL_EMBEDDING_THREADS", "0"))
+# Word pieces per text; all-MiniLM-L6-v2 was trained on 256
+LOCAL_EMBEDDING_MAX_TOKENS = int(os.getenv("LOCAL_EMBEDDING_MAX_TOKENS", "256"))
+
+
+# Stored vectors depend on every detail of HashingEmbeddings._embed: bump the
+# version whenever it changes, so indexes built before are reported as mismatched
+HASH_EMBEDDING_VERSION = 1
+HASH_EMBEDDING_DIM = 2048
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic, offline embeddings: hashed word unigrams/bigrams and
+    character trigrams as a dense unit vector. Free and instant, for tests and
+    benchmarks; far more lexical than a trained model.
+    """
+
+    model = f"hashed-ngrams-{HASH_EMBEDDING_DIM}-v{HASH_EMBEDDING_VERSION}"
+
+    def _embed(self, text: str) -> list[float]:
+        words = re.sub(r"[^\w\s]", " ", text.lower()).split()
+        grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"#{word}#"
+            grams.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+
+        vector = np.zeros(HASH_EMBEDDING_DIM, dtype=np.float32)
+        for gram in grams:
+            vector[zlib.crc32(gram.encode("utf-8")) % HASH_EMBEDDING_DIM] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    Sentence-transformers model run on the CPU with onnxruntime: the ONNX export
+    and tokenizer are fetched once from the Hugging Face Hub into its local
+    cache, then texts are embedded in batches (mean pooling, unit length)
+    without any network call.
+    """
+
+    def __init__(
+        self,
+        model: str = LOCAL_EMBEDDING_MODEL,
+        batch_size: int = LOCAL_EMBEDDING_BATCH,
+        threads: int = LOCAL_EMBEDDING_THREADS,
+        max_tokens: int = LOCAL_EMBEDDING_MAX_TOKENS,
+    ):
+        try:
+            import onnxruntime
+            from huggingface_hub import hf_hub_download
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(
+                "EMBEDDING_BACKEND=local needs onnxruntime, tokenizers and huggingface_hub (see requirements.txt)"
+            ) from e
+
+        self.model = model
+        self.batch_size = batch_size
+        self.tokenizer = Tokenizer.from_file(hf_hub_download(model, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_tokens)
+        self.tokenizer.enable_padding()  # to the longest text of each batch
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(
+            hf_hub_download(model, "onnx/model.onnx"), options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def _embed_batch(self, texts: list[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.zeros_like(ids)
+        hidden = self.session.run(None, feeds)[0]  # (batch, tokens, dim)
+        pooled = (hidden * mask[..., None]).sum(axis=1) / np.maximum(mask.sum(axis=1, keepdims=True), 1)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        vectors = [None] * len(texts)
+        # Texts of similar length share a batch, so little compute goes to padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for start in range(0, len(order), self.batch_size):
+            positions = order[start:start + self.batch_size]
+            for i, vector in zip(positions, self._embed_batch([texts[i] for i in positions])):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed_batch([text])[0].tolist()
@@ -0,0 +1,174 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3")
+EMBEDDING_CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "512"))
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def model_name(embeddings) -> str:
+    """Identify the embedding model so vectors from different models never mix."""
+    name = getattr(embeddings, "model", None) or type(embeddings).__name__
+    dimensions = getattr(embeddings, "dimensions", None)
+    return f"{name}:{dimensions}" if dimensions else name
+
+
+class EmbeddingCache:
+    """
+    Disk-backed, content-addressed store of embedding vectors keyed by
+    (model, sha256 of the text). It lives outside faiss_index/ so that
+    `populate_db.py --reset` can rebuild the index without re-embedding
+    unchanged text. Least recently used vectors are evicted past max_mb.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_mb: float = EMBEDDING_CACHE_MAX_MB):
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, content_hash)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    def get_many(self, model: str, hashes: list[str]) -> dict[str, list[float]]:
+        found = {}
+        with self._lock:
+            unique = list(dict.fromkeys(hashes))
+            for i in range(0, len(unique), 500):
+                batch = unique[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT content_hash, vector FROM embeddings WHERE model = ? "
+                    f"AND content_hash IN ({','.join('?' * len(batch))})",
+                    (model, *batch),
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND content_hash = ?",
+                    [(now, model, key) for key in found],
+                )
+                self._conn.commit()
+            self.hits += sum(1 for h in hashes if h in found)
+            self.misses += sum(1 for h in hashes if h not in found)
+        return found
+
+    def put_many(self, model: str, items: dict[str, list[float]]):
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, content_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                [(model, key, np.asarray(v, dtype=np.float32).tobytes(), now) for key, v in items.items()],
+            )
+            self._evict_over_budget()
+            self._conn.commit()
+
+    def _evict_over_budget(self):
+        total = self._size_bytes()
+        while total > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT rowid, length(vector) FROM embeddings ORDER BY last_used LIMIT 256"
+            ).fetchall()
+            if not rows:
+                break
+            for rowid, size in rows:
+                self._conn.execute("DELETE FROM embeddings WHERE rowid = ?", (rowid,))
+                total -= size
+                self.evictions += 1
+                if total <= self.max_bytes:
+                    break
+
+    def _size_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(length(vector)), 0) FROM embeddings").fetchone()[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            size = self._size_bytes()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "size_mb": size / (1024 * 1024),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends texts missing from the cache to the underlying model."""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache | None = None):
+        self.embeddings = embeddings
+        self.cache = cache or EmbeddingCache()
+        self.model = model_name(embeddings)
+        self.api_texts = 0
+
+    def iter_batches(self, texts: list[str]):
+        """Yield (positions in texts, vectors): cache hits first, then misses as they are embedded."""
+        hashes = [content_hash(t) for t in texts]
+        vectors = self.cache.get_many(self.model, hashes)
+
+        hit_positions = [i for i, key in enumerate(hashes) if key in vectors]
+        if hit_positions:
+            yield hit_positions, [vectors[hashes[i]] for i in hit_positions]
+
+        # Each distinct missing text is embedded once, even if it occurs several times
+        missing = {}
+        for i, key in enumerate(hashes):
+            if key not in vectors:
+                missing.setdefault(key, []).append(i)
+        if not missing:
+            return
+        keys = list(missing)
+        missing_texts = [texts[missing[key][0]] for key in keys]
+        self.api_texts += len(missing_texts)
+
+        if hasattr(self.embeddings, "iter_batches"):
+            batches = self.embeddings.iter_batches(missing_texts)
+        else:
+            batches = [(list(range(len(missing_texts))), self.embeddings.embed_documents(missing_texts))]
+
+        for positions, batch_vectors in batches:
+            fresh = {keys[i]: vector for i, vector in zip(positions, batch_vectors)}
+            self.cache.put_many(self.model, fresh)
+            out_positions, out_vectors = [], []
+            for key, vector in fresh.items():
+                for i in missing[key]:
+                    out_positions.append(i)
+                    out_vectors.append(vector)
+            yield out_positions, out_vectors
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        vectors = [None] * len(texts)
+        for positions, batch_vectors in self.iter_batches(texts):
+            for i, vector in zip(positions, batch_vectors):
+                vectors[i] = vector
+        return vectors
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
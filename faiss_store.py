@@ -0,0 +1,198 @@
+import json
+import os
+import sqlite3
+import shutil
+import threading
+import time
+from collections.abc import Mapping
+from pathlib import Path
+
+import faiss
+from langchain.schema.document import Document
+from langchain.vectorstores.faiss import FAISS
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "docstore.sqlite3"
+LEGACY_DOCSTORE_FILE = "index.pkl"  # pickled LangChain docstore written by FAISS.save_local
+# Each save of faiss_index/ is a directory under versions/; CURRENT names the one readers open
+VERSIONS_DIR = "versions"
+CURRENT_FILE = "CURRENT"
+
+# Read-only loads map the vectors instead of copying them into the process
+FAISS_MMAP = os.getenv("FAISS_MMAP", "1") == "1"
+
+
+def store_files(path: str) -> tuple[str, ...]:
+    """The files that make up the index at path, in whichever format it was saved."""
+    if os.path.exists(os.path.join(path, DOCSTORE_FILE)):
+        return INDEX_FILE, DOCSTORE_FILE
+    return INDEX_FILE, LEGACY_DOCSTORE_FILE
+
+
+def current_store(path: str) -> str:
+    """
+    The directory holding the files of the index at path: the version CURRENT
+    names, or path itself for an index saved before versioning. Readers resolve
+    it once and open every file from it, so they never mix two saves.
+    """
+    try:
+        with open(os.path.join(path, CURRENT_FILE), encoding="utf-8") as f:
+            return os.path.join(path, VERSIONS_DIR, f.read().strip())
+    except FileNotFoundError:
+        return path
+
+
+def new_version(path: str) -> str:
+    """An empty directory for the next save of the index at path; nothing reads it before publish_version()."""
+    directory = os.path.join(path, VERSIONS_DIR, f"v{time.time_ns()}")
+    os.makedirs(directory)
+    return directory
+
+
+def publish_version(path: str, directory: str):
+    """
+    Point CURRENT at a version written by new_version(), in one rename. The
+    version it replaces stays for readers that resolved CURRENT just before;
+    older ones are removed (open mmaps and connections keep their files readable).
+    """
+    previous = os.path.basename(current_store(path))
+    current_path = os.path.join(path, CURRENT_FILE)
+    with open(current_path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(os.path.basename(directory))
+    os.replace(current_path + ".tmp", current_path)
+    root = os.path.join(path, VERSIONS_DIR)
+    for name in os.listdir(root):
+        if name not in (os.path.basename(directory), previous):
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def remove_versions(path: str):
+    if os.path.exists(os.path.join(path, CURRENT_FILE)):
+        os.remove(os.path.join(path, CURRENT_FILE))
+    shutil.rmtree(os.path.join(path, VERSIONS_DIR), ignore_errors=True)
+
+
+class SqliteDocstore(Docstore):
+    """
+    Read-only docstore over docstore.sqlite3: a chunk's text and metadata are
+    only read when it is among the hits of a search. The connection is opened
+    once and shared by all threads, so it keeps reading the file this snapshot
+    was loaded from even after a writer renames a new one into place.
+    """
+
+    def __init__(self, path: str):
+        uri = Path(path).resolve().as_uri() + "?mode=ro"
+        self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def _fetchone(self, sql: str, params: tuple):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def search(self, search: str) -> Document | str:
+        row = self._fetchone("SELECT content, metadata FROM chunks WHERE id = ?", (search,))
+        if row is None:
+            return f"ID {search} not found."
+        return Document(page_content=row[0], metadata=json.loads(row[1]), id=search)
+
+
+class PositionMap(Mapping):
+    """FAISS position -> chunk ID, looked up in the docstore instead of held in memory."""
+
+    def __init__(self, docstore: SqliteDocstore):
+        self.docstore = docstore
+        self._len = docstore._fetchone("SELECT COUNT(*) FROM chunks", ())[0]
+
+    def __getitem__(self, position) -> str:
+        row = self.docstore._fetchone("SELECT id FROM chunks WHERE position = ?", (int(position),))
+        if row is None:
+            raise KeyError(position)
+        return row[0]
+
+    def __iter__(self):
+        with self.docstore._lock:
+            positions = self.docstore._conn.execute("SELECT position FROM chunks ORDER BY position").fetchall()
+        return (row[0] for row in positions)
+
+    def __len__(self) -> int:
+        return self._len
+
+
+def save_store(db: FAISS, path: str):
+    """
+    Write the vectors and an SQLite docstore, each to a temporary file that is
+    then renamed into place. Readers that mapped the previous files keep a valid
+    view of them; a pickled docstore from the old format is removed.
+    """
+    os.makedirs(path, exist_ok=True)
+    docstore_path = os.path.join(path, DOCSTORE_FILE)
+    tmp_docstore = docstore_path + ".tmp"
+    if os.path.exists(tmp_docstore):
+        os.remove(tmp_docstore)
+    conn = sqlite3.connect(tmp_docstore)
+    conn.execute(
+        """CREATE TABLE chunks (
+            position INTEGER PRIMARY KEY,
+            id TEXT NOT NULL UNIQUE,
+            content TEXT NOT NULL,
+            metadata TEXT NOT NULL
+        )"""
+    )
+    rows = []
+    for position, doc_id in sorted(db.index_to_docstore_id.items()):
+        doc = db.docstore.search(doc_id)
+        rows.append((position, doc_id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False)))
+    conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+    index_path = os.path.join(path, INDEX_FILE)
+    faiss.write_index(db.index, index_path + ".tmp")
+    # Docstore first: a reader that sees the new index.faiss also sees its chunks
+    os.replace(tmp_docstore, docstore_path)
+    os.replace(index_path + ".tmp", index_path)
+
+    legacy_path = os.path.join(path, LEGACY_DOCSTORE_FILE)
+    if os.path.exists(legacy_path):
+        os.remove(legacy_path)
+
+
+def remove_store(path: str):
+    for name in (INDEX_FILE, DOCSTORE_FILE, LEGACY_DOCSTORE_FILE):
+        if os.path.exists(os.path.join(path, name)):
+            os.remove(os.path.join(path, name))
+
+
+def load_store(path: str, embeddings, writable: bool = False) -> FAISS:
+    """
+    Load the index at path. Read-only loads memory-map the vectors (shared
+    through the page cache by every process that serves the same index) and
+    leave chunk texts on disk. Writable loads read everything into memory, as
+    adding or deleting vectors needs. Indexes saved in the old pickle format are
+    still loaded, through FAISS.load_local.
+    """
+    docstore_path = os.path.join(path, DOCSTORE_FILE)
+    if not os.path.exists(docstore_path):
+        return FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+
+    index_path = os.path.join(path, INDEX_FILE)
+    if writable:
+        index = faiss.read_index(index_path)
+        conn = sqlite3.connect(docstore_path)
+        rows = conn.execute("SELECT position, id, content, metadata FROM chunks").fetchall()
+        conn.close()
+        return FAISS(
+            embeddings,
+            index,
+            InMemoryDocstore({
+                doc_id: Document(page_content=content, metadata=json.loads(metadata), id=doc_id)
+                for _, doc_id, content, metadata in rows
+            }),
+            {position: doc_id for position, doc_id, _, _ in rows},
+        )
+
+    index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP_IFC if FAISS_MMAP else 0)
+    docstore = SqliteDocstore(docstore_path)
+    return FAISS(embeddings, index, docstore, PositionMap(docstore))
@@ -0,0 +1,42 @@
+"""
+Embeddings stand-ins for the tests: NoEmbeddings for indexes built from
+vectors the test supplies itself, CountingEmbeddings to see what gets
+embedded and how it is batched. Neither loads a model or calls an API.
+"""
+from langchain_core.embeddings import Embeddings
+
+
+class NoEmbeddings(Embeddings):
+    """Fails the test if anything is embedded."""
+
+    def __init__(self, reason: str = "vectors are supplied directly"):
+        self.reason = reason
+
+    def embed_documents(self, texts):
+        raise AssertionError(self.reason)
+
+    def embed_query(self, text):
+        raise AssertionError(self.reason)
+
+
+class CountingEmbeddings(Embeddings):
+    """Records each embed_documents batch in .calls; a text embeds as [len(text), 1.0]."""
+
+    model = "counting-test"
+
+    def __init__(self, fail: bool = False):
+        self.calls = []
+        self.fail = fail
+
+    @property
+    def texts(self) -> list[str]:
+        return [text for batch in self.calls for text in batch]
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        if self.fail:
+            raise RuntimeError("embeddings endpoint down")
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
@@ -0,0 +1,176 @@
+"""
+Local stand-in for the OpenAI embeddings and chat completions endpoints, for
+load tests and benchmarks that must not hit the real (paid) API.
+
+    python fake_openai_server.py --port 8765 --embedding-latency 0.05 --chat-latency 0.8
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=sk-fake OPENAI_EMBEDDING_CTX_CHECK=0 python populate_db.py
+
+Token-array inputs (what OpenAIEmbeddings sends with its tiktoken length
+check on) are accepted too and embed as deterministically as text.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+EMBEDDING_DIM = 1536
+
+
+def fake_embedding(text: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """Deterministic unit vector derived from the text, so equal inputs embed equally."""
+    seed = int.from_bytes(hashlib.md5(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, port: int = 0, embedding_latency: float = 0.05, chat_latency: float = 0.5):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.embedding_latency = embedding_latency
+        self.chat_latency = chat_latency
+        self.embedding_calls = 0
+        self.embedding_inputs = 0
+        self.chat_calls = 0
+        self.rate_limit_next = 0  # answer this many embedding requests with 429 first
+        self._counter_lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeOpenAIServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path.endswith("/embeddings"):
+            self._embeddings(body)
+        elif self.path.endswith("/chat/completions"):
+            self._chat(body)
+        else:
+            self.send_error(404)
+
+    def _send_json(self, payload: dict):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _embeddings(self, body: dict):
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        with self.server._counter_lock:
+            rate_limited = self.server.rate_limit_next > 0
+            if rate_limited:
+                self.server.rate_limit_next -= 1
+        if rate_limited:
+            data = json.dumps({"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}).encode("utf-8")
+            self.send_response(429)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        with self.server._counter_lock:
+            self.server.embedding_calls += 1
+            self.server.embedding_inputs += len(inputs)
+        time.sleep(self.server.embedding_latency)
+
+        data = []
+        for i, text in enumerate(inputs):
+            vector = fake_embedding(text if isinstance(text, str) else json.dumps(text), body.get("dimensions") or EMBEDDING_DIM)
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.tobytes()).decode("ascii")
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        tokens = sum(len(str(text)) // 4 + 1 for text in inputs)
+        self._send_json({
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "text-embedding-ada-002"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    def _chat(self, body: dict):
+        with self.server._counter_lock:
+            self.server.chat_calls += 1
+
+        question = body["messages"][-1]["content"].rsplit("Question:", 1)[-1].split("\nHelpful Answer", 1)[0].strip()
+        answer = f"This is a stand-in answer to: {question[:200]}"
+        prompt_tokens = sum(len(str(m.get("content", ""))) // 4 for m in body["messages"])
+        if body.get("stream"):
+            self._stream_chat(body, answer, prompt_tokens)
+            return
+
+        time.sleep(self.server.chat_latency)
+        self._send_json({
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(answer) // 4,
+                "total_tokens": prompt_tokens + len(answer) // 4,
+            },
+        })
+
+    def _stream_chat(self, body: dict, answer: str, prompt_tokens: int):
+        # A fifth of the latency before the first token, the rest spread across the tokens
+        words = answer.split(" ")
+        time.sleep(self.server.chat_latency * 0.2)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+
+        def event(payload: dict):
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        base = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": body.get("model", "gpt-4")}
+        for i, word in enumerate(words):
+            delta = {"content": word if i == 0 else f" {word}"}
+            event({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+            time.sleep(self.server.chat_latency * 0.8 / len(words))
+        event({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if body.get("stream_options", {}).get("include_usage"):
+            completion_tokens = len(answer) // 4
+            event({**base, "choices": [], "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            }})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    parser.add_argument("--chat-latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(args.port, args.embedding_latency, args.chat_latency)
+    print(f"🧪 Fake OpenAI server on {server.base_url}")
+    server.serve_forever()
@@ -1,5 +1,95 @@
+from typing import NamedTuple
+
 from langchain_openai import OpenAIEmbeddings
 import os
 
-def get_embedding_function():
-    return OpenAIEmbeddings(api_key=os.getenv("API_KEY"))
\ No newline at end of file
+from embedding_backends import HashingEmbeddings, LocalEmbeddings
+from embedding_cache import model_name
+
+# openai (text-embedding-ada-002), local (CPU sentence-transformers model) or hash (offline, for tests)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+# tiktoken splitting of over-long inputs; offline stand-ins (fake_openai_server.py) turn it off,
+# since tiktoken downloads its encoding on first use
+OPENAI_EMBEDDING_CTX_CHECK = os.getenv("OPENAI_EMBEDDING_CTX_CHECK", "1") == "1"
+
+
+class SimilarityThresholds(NamedTuple):
+    relevant: float  # a chunk is about the question (context_packer.pack_context)
+    confident: float  # retrieval is sure enough for the fast model (model_router.choose_model)
+    same_question: float  # two questions can share a cached answer (answer_cache.AnswerCache)
+
+
+# Cosine similarity means something different per model. ada-002 puts unrelated text
+# around 0.7; MiniLM puts it near 0.1 and on-topic passages at 0.4-0.7; the hashed
+# n-grams score off-topic questions on data/ up to 0.30 and rephrasings about 0.8.
+SIMILARITY_THRESHOLDS = {
+    "openai": SimilarityThresholds(relevant=0.75, confident=0.82, same_question=0.95),
+    "local": SimilarityThresholds(relevant=0.35, confident=0.5, same_question=0.9),
+    "hash": SimilarityThresholds(relevant=0.32, confident=0.42, same_question=0.75),
+}
+
+
+class EmbeddingMismatchError(ValueError):
+    """The index was built with other embeddings than the ones configured to query it."""
+
+
+def _openai():
+    return OpenAIEmbeddings(api_key=os.getenv("API_KEY"), check_embedding_ctx_length=OPENAI_EMBEDDING_CTX_CHECK)
+
+
+BACKENDS = {
+    "openai": _openai,
+    "local": LocalEmbeddings,
+    "hash": HashingEmbeddings,
+}
+_BACKEND_NAMES = {OpenAIEmbeddings: "openai", LocalEmbeddings: "local", HashingEmbeddings: "hash"}
+
+
+def get_embedding_function(backend: str | None = None):
+    backend = backend or EMBEDDING_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}', expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[backend]()
+
+
+def embedding_identity(embeddings) -> dict:
+    """Backend and model behind an embeddings object, through cache and batching wrappers."""
+    while hasattr(embeddings, "embeddings"):
+        embeddings = embeddings.embeddings
+    backend = _BACKEND_NAMES.get(type(embeddings), type(embeddings).__name__)
+    return {"backend": backend, "model": model_name(embeddings)}
+
+
+def check_embeddings(meta: dict, embeddings, path: str):
+    """
+    Refuse to pair an index with embeddings other than the ones it was built
+    with: the vectors would not be comparable and every search would return
+    arbitrary chunks. Indexes that predate the record are not checked.
+    """
+    built_with = meta.get("embedding")
+    configured = embedding_identity(embeddings)
+    if built_with and built_with != configured:
+        raise EmbeddingMismatchError(
+            f"The index at '{path}' was built with {built_with['backend']} embeddings ({built_with['model']}) "
+            f"but {configured['backend']} ({configured['model']}) is configured. Set "
+            f"EMBEDDING_BACKEND={built_with['backend']}, or rebuild with `python populate_db.py --reset`."
+        )
+
+
+def similarity_thresholds(embeddings) -> SimilarityThresholds:
+    """
+    The similarity cutoffs for the embeddings' backend. RAG_MIN_SIMILARITY,
+    ROUTE_FAST_MIN_SIMILARITY and ANSWER_CACHE_THRESHOLD, when set, override
+    them whatever the backend.
+    """
+    defaults = SIMILARITY_THRESHOLDS.get(embedding_identity(embeddings)["backend"], SIMILARITY_THRESHOLDS["openai"])
+
+    def setting(name: str, default: float) -> float:
+        value = os.getenv(name)
+        return float(value) if value else default
+
+    return SimilarityThresholds(
+        relevant=setting("RAG_MIN_SIMILARITY", defaults.relevant),
+        confident=setting("ROUTE_FAST_MIN_SIMILARITY", defaults.confident),
+        same_question=setting("ANSWER_CACHE_THRESHOLD", defaults.same_question),
+    )
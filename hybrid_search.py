@@ -0,0 +1,127 @@
+import os
+from typing import NamedTuple
+
+from langchain.schema.document import Document
+
+from ann_index import search_within
+from lexical_index import term_coverage
+from product_scope import RAG_PRODUCT_SCOPE, question_products
+from section_summaries import RAG_HIERARCHICAL, RAG_HIERARCHICAL_MIN_CHUNKS, RAG_SECTION_K
+
+# Chunks handed to the LLM. Fused rankings put exact-term hits next to
+# semantic ones, so fewer chunks are needed than with dense search alone.
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "3"))
+# Dense-only retrieval (no lexical index, or RAG_HYBRID=0)
+RAG_DENSE_K = int(os.getenv("RAG_DENSE_K", "4"))
+RAG_HYBRID = os.getenv("RAG_HYBRID", "1") == "1"
+# Candidates taken from each ranking before fusion
+RAG_FUSION_DEPTH = int(os.getenv("RAG_FUSION_DEPTH", "20"))
+# The usual RRF constant; damps the influence of any single ranking's top positions
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], rrf_k: int = RRF_K) -> list[tuple[str, float]]:
+    """Fuse ranked ID lists by summing 1 / (rrf_k + rank); best first, ties in first-seen order."""
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class Candidate(NamedTuple):
+    doc: Document
+    similarity: float | None  # cosine similarity to the question; None if only BM25 found it
+    lexical_rank: int | None  # 1-based rank in the BM25 results; None if BM25 did not find it
+    lexical_coverage: float | None = None  # IDF-weighted share of the question's terms in the chunk
+
+
+def _doc_id(doc: Document) -> str:
+    return doc.metadata.get("id") or doc.id
+
+
+def result_size(snapshot) -> int:
+    """How many chunks a question gets: RAG_TOP_K with hybrid retrieval, RAG_DENSE_K without."""
+    return RAG_TOP_K if RAG_HYBRID and snapshot.lexical is not None else RAG_DENSE_K
+
+
+def question_scope(snapshot, question: str) -> list[str]:
+    """Partitions a question is searched in; [] searches the whole index."""
+    if not RAG_PRODUCT_SCOPE or getattr(snapshot, "partitions", None) is None:
+        return []
+    return question_products(question)
+
+
+def chosen_sections(snapshot, vector: list[float], k: int | None = None) -> list[Document]:
+    """
+    The k (RAG_SECTION_K) section summaries nearest the question; [] when
+    hierarchical retrieval is off, the index has no summaries or is too
+    small to need them.
+    """
+    summaries = getattr(snapshot, "summaries", None)
+    if not RAG_HIERARCHICAL or summaries is None or snapshot.db.index.ntotal < RAG_HIERARCHICAL_MIN_CHUNKS:
+        return []
+    return summaries.similarity_search_by_vector(vector, k=k or RAG_SECTION_K)
+
+
+def _dense(snapshot, vector: list[float], depth: int, products: list[str]) -> list[tuple[Document, float]]:
+    if products:
+        hits = snapshot.partitions.search(products, vector, depth)
+    elif sections := chosen_sections(snapshot, vector):
+        # Coarse to fine: only the chunks of the best-matching sections are compared
+        members = {p: i for s in sections for p, i in zip(s.metadata["positions"], s.metadata["ids"])}
+        mapping = snapshot.db.index_to_docstore_id
+        hits = [
+            (members[p], d)
+            for p, d in search_within(snapshot.db.index, vector, members, depth)
+            # Summaries are saved just before the vectors; skip positions a newer save renumbered
+            if mapping.get(p) == members[p]
+        ]
+    else:
+        return snapshot.db.similarity_search_with_score_by_vector(vector, k=depth)
+    docs = []
+    for chunk_id, distance in hits:
+        doc = snapshot.db.docstore.search(chunk_id)
+        if isinstance(doc, Document):  # else removed after the partitions or summaries were written
+            docs.append((doc, distance))
+    return docs
+
+
+def search_scored(snapshot, question: str, vector: list[float], depth: int = RAG_FUSION_DEPTH) -> list[Candidate]:
+    """
+    Up to `depth` dense hits fused with up to `depth` BM25 hits by reciprocal
+    rank fusion, best first, each with the scores a context packer needs.
+    Dense hits alone when the index has no lexical part (or RAG_HYBRID=0).
+    A question that names products is searched only among their chunks: in
+    their partitions of the vector index and under their tags in BM25. Any
+    other question is matched against section summaries first and the dense
+    search covers only the chunks of the chosen sections; BM25 still looks
+    at every chunk, so an exact term outside them is not lost.
+    """
+    products = question_scope(snapshot, question)
+    dense = _dense(snapshot, vector, depth, products)
+    # Embeddings are unit length, so squared L2 distance d maps to cosine 1 - d/2
+    candidates = {_doc_id(doc): Candidate(doc, 1.0 - float(distance) / 2, None) for doc, distance in dense}
+    lexical = snapshot.lexical if RAG_HYBRID else None
+    if lexical is None:
+        return list(candidates.values())
+
+    lexical_ids = [chunk_id for chunk_id, _ in lexical.search(question, depth, products)]
+    weights = lexical.term_weights(question) if lexical_ids else {}
+    for rank, chunk_id in enumerate(lexical_ids, start=1):
+        candidate = candidates.get(chunk_id)
+        if candidate is not None:
+            coverage = term_coverage(weights, candidate.doc.page_content)
+            candidates[chunk_id] = candidate._replace(lexical_rank=rank, lexical_coverage=coverage)
+            continue
+        doc = snapshot.db.docstore.search(chunk_id)
+        if isinstance(doc, Document):  # else indexed lexically after this snapshot was loaded
+            candidates[chunk_id] = Candidate(doc, None, rank, term_coverage(weights, doc.page_content))
+
+    fused = reciprocal_rank_fusion([[_doc_id(doc) for doc, _ in dense], lexical_ids])
+    return [candidates[chunk_id] for chunk_id, _ in fused if chunk_id in candidates]
+
+
+def search(snapshot, question: str, vector: list[float], k: int | None = None) -> list[Document]:
+    """The best k chunks for one question (see search_scored), without scores."""
+    return [candidate.doc for candidate in search_scored(snapshot, question, vector)[:k or result_size(snapshot)]]
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+
+MANIFEST_FILE = "manifest.json"
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestManifest:
+    """
+    Record of every source file in the index: size, mtime, content hash, the
+    chunk IDs it produced and the index version it was ingested at. Lives next
+    to the FAISS files, so `--reset` forgets it together with the index.
+    """
+
+    def __init__(self, index_path: str):
+        self.path = os.path.join(index_path, MANIFEST_FILE)
+        self.index_version = 0
+        self.files: dict[str, dict] = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.index_version = data.get("index_version", 0)
+            self.files = data.get("files", {})
+
+    def diff(self, paths: list[str], chunker: str | None = None) -> dict[str, list[str]]:
+        """
+        Split paths into added / modified / unchanged, plus manifest entries whose
+        file is gone. Size + mtime are checked first; a file is only hashed when
+        they differ, so an unchanged corpus costs one stat() per file. With
+        `chunker`, files chunked under other settings are reported as modified.
+        """
+        changes = {"added": [], "modified": [], "unchanged": [], "removed": []}
+        for path in paths:
+            entry = self.files.get(path)
+            if entry is None:
+                changes["added"].append(path)
+                continue
+            if chunker is not None and entry.get("chunker") != chunker:
+                changes["modified"].append(path)
+                continue
+            st = os.stat(path)
+            if st.st_size == entry["size"] and st.st_mtime_ns == entry["mtime_ns"]:
+                changes["unchanged"].append(path)
+            elif file_sha256(path) == entry["sha256"]:
+                # Touched but not edited: remember the new mtime and move on
+                entry["size"], entry["mtime_ns"] = st.st_size, st.st_mtime_ns
+                changes["unchanged"].append(path)
+            else:
+                changes["modified"].append(path)
+        seen = set(paths)
+        changes["removed"] = [path for path in self.files if path not in seen]
+        return changes
+
+    def record(self, path: str, chunk_ids: list[str], chunker: str | None = None):
+        st = os.stat(path)
+        self.files[path] = {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha256": file_sha256(path),
+            "chunk_ids": chunk_ids,
+            "index_version": self.index_version,
+            "chunker": chunker,
+        }
+
+    def forget(self, path: str):
+        self.files.pop(path, None)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"index_version": self.index_version, "files": self.files}, f, indent=2)
+        os.replace(tmp_path, self.path)
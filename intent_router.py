@@ -0,0 +1,184 @@
+"""
+Local intent router that runs before retrieval and the LLM.
+
+Routing intents (use PrimeLeads, hand off to PrimeReachOut, greetings) get a
+canned reply in microseconds with no network call. Everything else is a
+knowledge-base question and goes on to query_rag's RAG path.
+"""
+import math
+import re
+import zlib
+from typing import NamedTuple
+
+ASK_TOKEN = "[[ASK:PRIMELEADS_URL]]"
+
+PRIMELEADS = "primeleads"
+PRIMEREACHOUT = "primereachout"
+GREETING = "greeting"
+KB_QUESTION = "kb_question"
+
+REPLIES = {
+    PRIMELEADS: f"{ASK_TOKEN} 🔗 Please provide the URL you want PrimeLeads to process.",
+    PRIMEREACHOUT: (
+        "Sending messages, emailing, following up and scheduling are handled by **PrimeReachOut**. "
+        "PrimeLeads or PrimeRecruits can build and score the list first, then PrimeReachOut takes over "
+        "the personalized outreach and calendar booking. Would you like me to set up that handoff?"
+    ),
+    GREETING: (
+        "Hello! 👋 I'm the FastAutomate assistant. Tell me a little about your role and what you're "
+        "trying to achieve, and I'll point you to the right Primius.ai solution."
+    ),
+}
+
+# --- Stage 1: keyword rules ---
+KEYWORD_RULES = [
+    (GREETING, re.compile(
+        r"^(hi+|hello|hey+|hiya|yo|salam|salaam|assalamu? ?alaikum|marhaba|good (morning|afternoon|evening)|"
+        r"greetings|thanks|thank you|thx)( there| team| bot)?[\s,!.?👋]*(how are you( doing)?( today)?)?[\s!.?👋]*$",
+        re.IGNORECASE,
+    )),
+    (PRIMELEADS, re.compile(
+        r"\b(use|run|start|launch|try|open|execute|activate)\b.{0,20}\bprime ?leads\b|^prime ?leads[\s!.]*$",
+        re.IGNORECASE,
+    )),
+]
+
+# Questions about a product ("can PrimeLeads send emails?", "should I use PrimeLeads or
+# PrimeRecruits?") and requests for material ("send me the pricing pdf") are KB questions,
+# not requests to run it; checked before the keyword rules, so they win over them
+KB_QUESTION_PATTERN = re.compile(
+    r"^(what|how|why|which|who|when|where|does|do|is it possible|is|are|tell me|explain|should i|"
+    r"(send|show|give) me|(can|could|would) (i|prime ?\w+|primius|fastautomate|it|the|your|this)\b)",
+    re.IGNORECASE,
+)
+
+# --- Stage 2: nearest-centroid classifier over hashed n-gram features ---
+LABELED_EXAMPLES = {
+    PRIMELEADS: [
+        "use primeleads",
+        "run prime leads on my website",
+        "i want to use primeleads for my company",
+        "can you run primeleads for me",
+        "start a primeleads search",
+        "generate leads for my website with primeleads",
+        "let's try prime leads",
+        "find leads for my business url",
+        "analyze my website and find leads",
+    ],
+    PRIMEREACHOUT: [
+        "send emails to these leads",
+        "email 100 leads for me",
+        "contact these candidates",
+        "follow up with the prospects",
+        "schedule a meeting with this lead",
+        "book interviews with the candidates",
+        "message these people on linkedin",
+        "set up calls with my shortlisted leads",
+        "reach out to the prospects and schedule demos",
+    ],
+    GREETING: [
+        "hi",
+        "hello there",
+        "hey how are you",
+        "good morning",
+        "salam",
+        "hi team",
+        "hello bot",
+        "thanks a lot",
+    ],
+    KB_QUESTION: [
+        "what does primeleads do",
+        "what is primius ai",
+        "how does primevision automate documents",
+        "what features does primecrm have",
+        "how is primerecruits different from primeleads",
+        "how much does the platform cost",
+        "which product should i use for lead scoring",
+        "can primeleads send outreach emails",
+        "explain how lead enrichment works",
+        "what integrations do you support",
+        "how do i get started with the platform",
+        "who is fastautomate",
+    ],
+}
+
+FEATURE_DIM = 2048
+MIN_SIMILARITY = 0.35
+MIN_MARGIN = 0.05
+
+
+class Route(NamedTuple):
+    intent: str
+    reply: str
+    score: float
+    stage: str
+
+
+def _normalize(text: str) -> str:
+    text = text.lower().replace("prime leads", "primeleads").replace("prime reachout", "primereachout")
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+def featurize(text: str) -> dict[int, float]:
+    """Sparse, L2-normalized bag of hashed word unigrams/bigrams and char trigrams."""
+    words = _normalize(text).split()
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"#{word}#"
+        grams.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+
+    features: dict[int, float] = {}
+    for gram in grams:
+        bucket = zlib.crc32(gram.encode("utf-8")) % FEATURE_DIM
+        features[bucket] = features.get(bucket, 0.0) + 1.0
+
+    norm = math.sqrt(sum(v * v for v in features.values()))
+    return {k: v / norm for k, v in features.items()} if norm else features
+
+
+def _centroid(vectors: list[dict[int, float]]) -> dict[int, float]:
+    total: dict[int, float] = {}
+    for vector in vectors:
+        for k, v in vector.items():
+            total[k] = total.get(k, 0.0) + v
+    norm = math.sqrt(sum(v * v for v in total.values()))
+    return {k: v / norm for k, v in total.items()}
+
+
+def _dot(a: dict[int, float], b: dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+CENTROIDS = {
+    intent: _centroid([featurize(example) for example in examples])
+    for intent, examples in LABELED_EXAMPLES.items()
+}
+
+
+def classify(text: str) -> tuple[str, float, float]:
+    """Return (best intent, its similarity, margin over the runner-up)."""
+    vector = featurize(text)
+    scores = sorted(((_dot(vector, c), intent) for intent, c in CENTROIDS.items()), reverse=True)
+    (best_score, best_intent), (second_score, _) = scores[0], scores[1]
+    return best_intent, best_score, best_score - second_score
+
+
+def route_intent(question: str) -> Route | None:
+    """A canned Route for routing intents, or None when the question needs the KB."""
+    text = question.strip()
+    if not text:
+        return None
+
+    if KB_QUESTION_PATTERN.search(text):
+        return None
+
+    for intent, pattern in KEYWORD_RULES:
+        if pattern.search(text):
+            return Route(intent, REPLIES[intent], 1.0, "keyword")
+
+    intent, score, margin = classify(text)
+    if intent != KB_QUESTION and score >= MIN_SIMILARITY and margin >= MIN_MARGIN:
+        return Route(intent, REPLIES[intent], score, "centroid")
+    return None
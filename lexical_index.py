@@ -0,0 +1,153 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+from product_scope import chunk_products
+
+LEXICAL_FILE = "lexical.sqlite3"
+
+# Question words that would otherwise match most chunks; BM25 weighs the rest
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it me my of on or our "
+    "the to we what when where which who why will with you your ll re ve much many than was were".split()
+)
+
+
+def query_terms(text: str) -> list[str]:
+    """The question's distinct searchable terms, in order."""
+    # Single letters are mostly contraction debris ("what's" -> "what", "s")
+    return list(dict.fromkeys(t for t in re.findall(r"\w+", text.lower()) if len(t) > 1 and t not in STOPWORDS))
+
+
+def match_query(text: str) -> str:
+    """FTS5 MATCH expression: any of the question's terms, each quoted so no FTS syntax leaks in."""
+    return " OR ".join(f'"{term}"' for term in query_terms(text))
+
+
+def term_coverage(weights: dict[str, float], text: str) -> float:
+    """
+    IDF-weighted share of the question's terms that occur in text. BM25 ORs
+    the terms, so one common word ("list", "about") is enough for a match;
+    this tells a chunk about the question from one that shares a word with it.
+    """
+    total = sum(weights.values())
+    if not total:
+        return 0.0
+    words = set(re.findall(r"\w+", text.lower()))
+    return sum(weight for term, weight in weights.items() if term in words) / total
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over chunk texts (SQLite FTS5), stored as
+    lexical.sqlite3 beside the vectors of the index. Ingestion keeps it in step
+    with the FAISS docstore through sync(); exact terms such as product names
+    are found even when the dense embedding ranks them low. Each chunk's
+    product tags are indexed in a second column, so a search can be limited
+    to the chunks of some products inside the index itself.
+    """
+
+    def __init__(self, index_path: str, readonly: bool = False):
+        self.path = os.path.join(index_path, LEXICAL_FILE)
+        if readonly:
+            uri = Path(self.path).resolve().as_uri() + "?mode=ro"
+            self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            os.makedirs(index_path, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            # Readers keep searching while ingestion writes
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            if not self._has_products():
+                # Built before product tags: rebuilt in full by the next sync()
+                self._conn.execute("DROP TABLE IF EXISTS chunks")
+                self._conn.execute("DROP TABLE IF EXISTS chunk_ids")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS chunk_ids (rowid INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE)")
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5(content, products, tokenize='unicode61')"
+            )
+            self._conn.commit()
+        # Per-term document counts for term_weights; temp, so read-only handles can create it too
+        self._conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp.chunks_vocab USING fts5vocab(main, 'chunks', 'col')")
+        self.scoped = self._has_products()
+        self._lock = threading.Lock()
+
+    def _has_products(self) -> bool:
+        return any(row[1] == "products" for row in self._conn.execute("PRAGMA table_info(chunks)"))
+
+    @classmethod
+    def open(cls, index_path: str) -> "LexicalIndex | None":
+        """Read-only handle for query processes, or None if the index has no lexical part yet."""
+        if not os.path.exists(os.path.join(index_path, LEXICAL_FILE)):
+            return None
+        return cls(index_path, readonly=True)
+
+    def search(self, query: str, k: int, products: list[str] | None = None) -> list[tuple[str, float]]:
+        """
+        Best k (chunk ID, BM25 score) pairs, most relevant first; with products,
+        only among chunks tagged with one of them (ignored by an index built
+        before product tags).
+        """
+        expression = match_query(query)
+        if not expression:
+            return []
+        if self.scoped:
+            # Terms score in the content column only; the tags just filter
+            expression = f"content : ({expression})"
+            if products:
+                expression += " AND products : (" + " OR ".join(f'"{p}"' for p in products) + ")"
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_ids.id, bm25(chunks, 1.0, 0.0) FROM chunks JOIN chunk_ids ON chunk_ids.rowid = chunks.rowid "
+                "WHERE chunks MATCH ? ORDER BY bm25(chunks, 1.0, 0.0) LIMIT ?",
+                (expression, k),
+            ).fetchall()
+        # FTS5 scores are negative, lower is better
+        return [(chunk_id, -score) for chunk_id, score in rows]
+
+    def term_weights(self, query: str) -> dict[str, float]:
+        """BM25 IDF of each query term over the chunk texts; terms no chunk contains weigh the most."""
+        terms = query_terms(query)
+        if not terms:
+            return {}
+        with self._lock:
+            (n,) = self._conn.execute("SELECT count(*) FROM chunk_ids").fetchone()
+            counts = dict(self._conn.execute(
+                f"SELECT term, doc FROM temp.chunks_vocab WHERE col = 'content' AND term IN ({', '.join('?' * len(terms))})",
+                terms,
+            ).fetchall())
+        return {term: math.log((n - counts.get(term, 0) + 0.5) / (counts.get(term, 0) + 0.5) + 1) for term in terms}
+
+    def ids(self) -> set[str]:
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT id FROM chunk_ids")}
+
+    def sync(self, db) -> tuple[int, int]:
+        """
+        Add the chunks db has and the index lacks, drop the ones db no longer
+        has. Unchanged chunks are not touched, so this is incremental.
+        Returns (added, removed).
+        """
+        wanted = set(db.index_to_docstore_id.values()) if db is not None else set()
+        present = self.ids()
+        added = [chunk_id for chunk_id in wanted if chunk_id not in present]
+        removed = [chunk_id for chunk_id in present if chunk_id not in wanted]
+        with self._lock:
+            for chunk_id in removed:
+                (rowid,) = self._conn.execute("SELECT rowid FROM chunk_ids WHERE id = ?", (chunk_id,)).fetchone()
+                self._conn.execute("DELETE FROM chunks WHERE rowid = ?", (rowid,))
+                self._conn.execute("DELETE FROM chunk_ids WHERE rowid = ?", (rowid,))
+            for chunk_id in added:
+                doc = db.docstore.search(chunk_id)
+                rowid = self._conn.execute("INSERT INTO chunk_ids (id) VALUES (?)", (chunk_id,)).lastrowid
+                self._conn.execute(
+                    "INSERT INTO chunks (rowid, content, products) VALUES (?, ?, ?)",
+                    (rowid, doc.page_content, " ".join(chunk_products(doc))),
+                )
+            self._conn.commit()
+        return len(added), len(removed)
+
+    def close(self):
+        self._conn.close()
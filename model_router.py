@@ -0,0 +1,192 @@
+"""
+Cost- and latency-tiered choice of chat model for knowledge-base questions.
+
+Greetings and handoffs never get here (see intent_router.py). Every other
+question is scored from local features only: its length, its form, how
+many products it spans and how confident retrieval was. A short factual
+question with a confident top chunk goes to the fast tier, and everything
+else goes to the strong tier. A fast answer that opens with "I don't know"
+is escalated and asked again on the strong tier. choose_model is a pure
+function of QuestionFeatures, so policies can be tested without a model
+or an index.
+"""
+import os
+import re
+import threading
+from collections import deque
+from typing import NamedTuple
+
+import numpy as np
+
+from product_scope import detect_products
+from token_utils import count_tokens
+
+RAG_MODEL_ROUTING = os.getenv("RAG_MODEL_ROUTING", "1") == "1"
+RAG_FAST_MODEL = os.getenv("RAG_FAST_MODEL", "gpt-4o-mini")
+RAG_STRONG_MODEL = os.getenv("RAG_STRONG_MODEL", "gpt-4")
+# Longest question, in tokens, the fast tier answers
+ROUTE_FAST_MAX_TOKENS = int(os.getenv("ROUTE_FAST_MAX_TOKENS", "24"))
+# Characters of a fast streamed answer held back to see whether it opens with "I don't know"
+UNSURE_PREFIX_CHARS = 48
+
+FAST = "fast"
+STRONG = "strong"
+
+# USD per million input / output tokens; models missing here are logged at no cost
+MODEL_PRICES = {
+    "gpt-4": (30.0, 60.0),
+    "gpt-4-turbo": (10.0, 30.0),
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-3.5-turbo": (0.5, 1.5),
+}
+
+# Asks for reasoning, comparison or advice rather than one fact
+_HARD_TERMS = re.compile(
+    r"\b(why|compare[sd]?|comparison|differen(ce|ces|t)|versus|vs|recommend\w*|should (i|we)|"
+    r"best (way|option|fit|approach)|strateg(y|ies)|pros and cons|trade-?offs?|migrat\w*|roi|"
+    r"step[- ]by[- ]step|walk me through)\b",
+    re.IGNORECASE,
+)
+# Factual openings: what/who/when/where, yes-no questions, prices and counts, one-step how-tos
+_SIMPLE_FORM = re.compile(
+    r"^(what|who|when|where|which|is|are|does|do|can|list|"
+    r"how (much|many|long|do i|can i|do you))\b",
+    re.IGNORECASE,
+)
+# The model following QUESTION_TEMPLATE's "just say that you don't know"
+_UNSURE = re.compile(
+    r"^\W*(i (don'?t|do not) know|i'?m (not sure|sorry|unable)|i am (not sure|sorry|unable)|"
+    r"i (couldn'?t|could not|cannot|can'?t) (find|answer|determine)|"
+    r"(the|this) (provided )?context (does(n'?t| not)|do(es)? not))",
+    re.IGNORECASE,
+)
+
+
+class QuestionFeatures(NamedTuple):
+    tokens: int
+    products: int  # products the question names
+    simple_form: bool
+    hard_terms: bool
+    best_similarity: float | None  # best dense hit; None if only BM25 found anything
+    lexical_agrees: bool  # the top fused chunk was also ranked first by BM25
+
+
+class ModelChoice(NamedTuple):
+    tier: str
+    model: str
+    reason: str
+    escalated: bool = False  # asked again after the fast tier was unsure
+    fast_usage: tuple[int, int] = (0, 0)  # (input, output) tokens of the unsure fast attempt
+
+
+def question_features(question: str, candidates: list) -> QuestionFeatures:
+    """Features of a question and its hybrid_search candidates (best first)."""
+    similarities = [c.similarity for c in candidates if c.similarity is not None]
+    return QuestionFeatures(
+        tokens=count_tokens(question),
+        products=len(detect_products(question)),
+        simple_form=bool(_SIMPLE_FORM.search(question.strip())),
+        hard_terms=bool(_HARD_TERMS.search(question)),
+        best_similarity=max(similarities) if similarities else None,
+        lexical_agrees=bool(candidates) and candidates[0].lexical_rank == 1,
+    )
+
+
+def choose_model(features: QuestionFeatures, min_similarity: float) -> ModelChoice:
+    """
+    The tier for a question. The fast tier needs the best chunk at min_similarity
+    (the embedding backend's `confident` threshold) or ranked first by BM25 too.
+    """
+
+    def strong(reason: str) -> ModelChoice:
+        return ModelChoice(STRONG, RAG_STRONG_MODEL, reason)
+
+    if not RAG_MODEL_ROUTING:
+        return strong("routing off")
+    if features.hard_terms:
+        return strong("asks for reasoning or advice")
+    if features.products > 1:
+        return strong(f"spans {features.products} products")
+    if features.tokens > ROUTE_FAST_MAX_TOKENS:
+        return strong(f"long question ({features.tokens} tokens)")
+    if not features.simple_form:
+        return strong("open-ended question")
+    confident = features.best_similarity is not None and features.best_similarity >= min_similarity
+    if not (confident or features.lexical_agrees):
+        return strong("low retrieval confidence")
+    return ModelChoice(FAST, RAG_FAST_MODEL, "short factual question")
+
+
+def escalate(choice: ModelChoice, fast_usage: tuple[int, int]) -> ModelChoice:
+    """The strong-tier retry of a fast answer that was unsure, given the fast attempt's (input, output) tokens."""
+    return ModelChoice(STRONG, RAG_STRONG_MODEL, f"{choice.model} was unsure", escalated=True, fast_usage=fast_usage)
+
+
+def unsure_opening(text: str, done: bool = False) -> bool | None:
+    """
+    Whether an answer opens with "I don't know". None while a stream has
+    produced too little to tell; once it is done, an empty answer counts as unsure.
+    """
+    if _UNSURE.search(text):
+        return True
+    if not text.strip():
+        return True if done else None
+    if len(text) < UNSURE_PREFIX_CHARS and not done:
+        return None
+    return False
+
+
+def cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    price_in, price_out = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (input_tokens * price_in + output_tokens * price_out) / 1_000_000
+
+
+class ModelRouter:
+    """Per-tier latency, token and cost accounting for the answers of one process."""
+
+    def __init__(self):
+        self.answers = {FAST: 0, STRONG: 0}
+        self.cost_usd = {FAST: 0.0, STRONG: 0.0}
+        self.fast_attempts = 0
+        self.escalations = 0
+        # What the questions the fast tier kept would have cost on the strong model
+        self.strong_equivalent_usd = 0.0
+        self._latencies_ms = {FAST: deque(maxlen=10_000), STRONG: deque(maxlen=10_000)}
+        self._lock = threading.Lock()
+
+    def record(self, choice: ModelChoice, latency_s: float, input_tokens: int, output_tokens: int) -> float:
+        """Account for one completion and log it; returns its cost in USD."""
+        spent = cost(choice.model, input_tokens, output_tokens)
+        with self._lock:
+            self._latencies_ms[choice.tier].append(latency_s * 1000)
+            self.cost_usd[choice.tier] += spent
+            self.answers[choice.tier] += 1
+            if choice.tier == FAST:
+                self.fast_attempts += 1
+                self.strong_equivalent_usd += cost(RAG_STRONG_MODEL, input_tokens, output_tokens)
+            elif choice.escalated:
+                # The fast attempt did not end up answering: take back what it was credited
+                self.escalations += 1
+                self.answers[FAST] -= 1
+                self.strong_equivalent_usd -= cost(RAG_STRONG_MODEL, *choice.fast_usage)
+        tag = "⤴️ escalated to" if choice.escalated else "🎚️"
+        print(f"{tag} {choice.tier} model {choice.model} ({choice.reason}): {latency_s * 1000:.0f} ms, ${spent:.5f}")
+        return spent
+
+    def stats(self) -> dict:
+        result = {}
+        for tier in (FAST, STRONG):
+            latencies = np.array(self._latencies_ms[tier]) if self._latencies_ms[tier] else np.zeros(1)
+            result[tier] = {
+                "answers": self.answers[tier],
+                "latency_ms_p50": float(np.percentile(latencies, 50)),
+                "latency_ms_p95": float(np.percentile(latencies, 95)),
+                "cost_usd": self.cost_usd[tier],
+            }
+        answered = self.answers[FAST] + self.answers[STRONG]
+        result["fast_share"] = self.answers[FAST] / answered if answered else 0.0
+        result["escalations"] = self.escalations
+        result["escalation_rate"] = self.escalations / self.fast_attempts if self.fast_attempts else 0.0
+        result["cost_saved_usd"] = self.strong_equivalent_usd - self.cost_usd[FAST]
+        return result
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import zlib
+
+import numpy as np
+from langchain.schema.document import Document
+
+NEAR_DUPLICATES_FILE = "near_duplicates.sqlite3"
+NEAR_DUP_ENABLED = os.getenv("NEAR_DUP_ENABLED", "1") == "1"
+# Estimated word-trigram Jaccard similarity above which a chunk is folded into an indexed one
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.8"))
+NUM_PERM = 128
+# 16 bands of 8 rows: pairs at Jaccard 0.8 share a band with probability ~0.97, pairs at 0.5 ~0.06
+BANDS, ROWS = 16, 8
+
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, 2**63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64)
+
+
+def shingles(text: str) -> set[tuple[str, ...]]:
+    """Word trigrams of the lower-cased text, ignoring punctuation and whitespace."""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < 3:
+        return {tuple(words)}
+    return {tuple(words[i:i + 3]) for i in range(len(words) - 2)}
+
+
+def minhash(text: str) -> np.ndarray:
+    """NUM_PERM-value MinHash signature of the text's word trigrams (multiply-shift hashing)."""
+    hashes = np.array([zlib.crc32(" ".join(s).encode("utf-8")) for s in shingles(text)], dtype=np.uint64)
+    with np.errstate(over="ignore"):  # the products are meant to wrap modulo 2**64
+        permuted = (np.outer(hashes, _A) + _B) >> np.uint64(32)
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Jaccard similarity estimated from two signatures."""
+    return float(np.mean(a == b))
+
+
+def _band_keys(signature: np.ndarray) -> list[int]:
+    keys = []
+    for band in range(BANDS):
+        digest = hashlib.blake2b(bytes([band]) + signature[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8)
+        keys.append(int.from_bytes(digest.digest(), "big", signed=True))
+    return keys
+
+
+class NearDuplicateIndex:
+    """
+    MinHash LSH over the chunks in the FAISS index, stored as
+    faiss_index/near_duplicates.sqlite3. Ingestion looks every new chunk up
+    here before embedding it: a chunk that nearly repeats an indexed one is
+    not embedded or indexed, but recorded as a duplicate of that
+    representative together with its own text and metadata, so it can take
+    the representative's place if that one is deleted.
+    """
+
+    def __init__(self, index_path: str, threshold: float = NEAR_DUP_THRESHOLD):
+        os.makedirs(index_path, exist_ok=True)
+        self.path = os.path.join(index_path, NEAR_DUPLICATES_FILE)
+        self.threshold = threshold
+        self._conn = sqlite3.connect(self.path)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS signatures (id TEXT PRIMARY KEY, signature BLOB NOT NULL);
+            CREATE TABLE IF NOT EXISTS bands (key INTEGER NOT NULL, id TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS bands_key ON bands (key);
+            CREATE INDEX IF NOT EXISTS bands_id ON bands (id);
+            CREATE TABLE IF NOT EXISTS duplicates (
+                id TEXT PRIMARY KEY,
+                representative TEXT NOT NULL,
+                similarity REAL NOT NULL,
+                content TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS duplicates_representative ON duplicates (representative);
+            """
+        )
+
+    def is_duplicate(self, chunk_id: str) -> bool:
+        return self._conn.execute("SELECT 1 FROM duplicates WHERE id = ?", (chunk_id,)).fetchone() is not None
+
+    def find(self, signature: np.ndarray) -> tuple[str, float] | None:
+        """Most similar representative at or above the threshold, as (ID, estimated Jaccard)."""
+        keys = _band_keys(signature)
+        placeholders = ",".join("?" * len(keys))
+        candidates = self._conn.execute(
+            f"SELECT DISTINCT signatures.id, signatures.signature FROM bands "
+            f"JOIN signatures ON signatures.id = bands.id WHERE bands.key IN ({placeholders})",
+            keys,
+        ).fetchall()
+        best = None
+        for chunk_id, blob in candidates:
+            score = similarity(signature, np.frombuffer(blob, dtype=np.uint32))
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (chunk_id, score)
+        return best
+
+    def add(self, chunk_id: str, signature: np.ndarray):
+        """Register an indexed chunk as a representative."""
+        self._conn.execute("INSERT OR REPLACE INTO signatures VALUES (?, ?)", (chunk_id, signature.tobytes()))
+        self._conn.execute("DELETE FROM bands WHERE id = ?", (chunk_id,))
+        self._conn.executemany("INSERT INTO bands VALUES (?, ?)", [(key, chunk_id) for key in _band_keys(signature)])
+
+    def add_duplicate(self, doc: Document, representative: str, score: float):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO duplicates VALUES (?, ?, ?, ?, ?)",
+            (doc.metadata["id"], representative, score, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False)),
+        )
+
+    def duplicates_of(self, representative: str) -> list[dict]:
+        """Provenance of the chunks folded into one representative."""
+        rows = self._conn.execute(
+            "SELECT id, similarity, metadata FROM duplicates WHERE representative = ? ORDER BY id", (representative,)
+        ).fetchall()
+        return [{"id": chunk_id, "similarity": score, **json.loads(metadata)} for chunk_id, score, metadata in rows]
+
+    def remove(self, chunk_ids) -> list[Document]:
+        """
+        Forget chunks that left the index or their source. Duplicates of a
+        removed representative that are not removed themselves are returned,
+        to be ingested again in its place.
+        """
+        chunk_ids = set(chunk_ids)
+        orphaned = {}
+        for chunk_id in chunk_ids:
+            self._conn.execute("DELETE FROM signatures WHERE id = ?", (chunk_id,))
+            self._conn.execute("DELETE FROM bands WHERE id = ?", (chunk_id,))
+            self._conn.execute("DELETE FROM duplicates WHERE id = ?", (chunk_id,))
+            for dup_id, content, metadata in self._conn.execute(
+                "SELECT id, content, metadata FROM duplicates WHERE representative = ?", (chunk_id,)
+            ).fetchall():
+                if dup_id not in chunk_ids:
+                    orphaned[dup_id] = Document(page_content=content, metadata=json.loads(metadata))
+            self._conn.execute("DELETE FROM duplicates WHERE representative = ?", (chunk_id,))
+        return list(orphaned.values())
+
+    def retain(self, chunk_ids) -> list[Document]:
+        """remove() every representative not in chunk_ids, e.g. after the index was rebuilt."""
+        keep = set(chunk_ids)
+        representatives = [row[0] for row in self._conn.execute("SELECT id FROM signatures")]
+        return self.remove(chunk_id for chunk_id in representatives if chunk_id not in keep)
+
+    def backfill(self, db) -> int:
+        """Sign the indexed chunks that have no signature yet (indexes built before deduplication)."""
+        signed = {row[0] for row in self._conn.execute("SELECT id FROM signatures")}
+        missing = [chunk_id for chunk_id in db.index_to_docstore_id.values() if chunk_id not in signed]
+        for chunk_id in missing:
+            self.add(chunk_id, minhash(db.docstore.search(chunk_id).page_content))
+        return len(missing)
+
+    def counts(self) -> tuple[int, int]:
+        """(representatives, duplicates)."""
+        (representatives,) = self._conn.execute("SELECT COUNT(*) FROM signatures").fetchone()
+        (duplicates,) = self._conn.execute("SELECT COUNT(*) FROM duplicates").fetchone()
+        return representatives, duplicates
+
+    def commit(self):
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
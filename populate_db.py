@@ -2,9 +2,44 @@ import argparse
 import hashlib
 import os
 import shutil
-from langchain_community.document_loaders import PyPDFDirectoryLoader
+import time
+
+import numpy as np
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain.schema.document import Document
+from chunker import CHUNKER, chunker_signature, iter_chunks
+from ann_index import (
+    CODECS,
+    INDEX_TYPES,
+    REDUCTIONS,
+    INDEX_META_FILE,
+    apply_index_config,
+    delete_chunks,
+    index_vectors,
+    load_index,
+    read_index_meta,
+    resolve_config,
+    write_index_meta,
+)
+from faiss_store import (
+    INDEX_FILE,
+    current_store,
+    load_store,
+    new_version,
+    publish_version,
+    remove_store,
+    remove_versions,
+    save_store,
+    store_files,
+)
+from ingest_manifest import IngestManifest
+from lexical_index import LEXICAL_FILE, LexicalIndex
+from near_duplicates import NEAR_DUP_ENABLED, NEAR_DUPLICATES_FILE, NearDuplicateIndex, minhash
+from parallel_pdf_loader import list_pdfs, load_pdfs_parallel
+from product_scope import has_partitions, remove_partitions, save_partitions, tag_chunks
+from section_summaries import has_summaries, remove_summaries, save_summaries
+from batch_embedder import BatchEmbedder
+from embedding_cache import CachedEmbeddings
 from get_embading_function import get_embedding_function
 from langchain.vectorstores.faiss import FAISS  # <- use FAISS instead of Chroma
 
@@ -14,82 +49,447 @@ DATA_PATH = "data"
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--reset", action="store_true", help="Reset the database.")
+    parser.add_argument("--vacuum", action="store_true", help="Rebuild a compact index without orphans or duplicates.")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, help="FAISS index type (default: keep the current one).")
+    parser.add_argument("--codec", choices=CODECS, help="Store vectors as float32, float16 or int8 (default: keep).")
+    parser.add_argument("--reduce", choices=REDUCTIONS, help="Project vectors with PCA or truncate them (Matryoshka).")
+    parser.add_argument("--reduce-dim", type=int, help="Dimensions kept by --reduce.")
     args = parser.parse_args()
+    index_options = {"kind": args.index_type, "codec": args.codec, "reduce": args.reduce, "reduce_dim": args.reduce_dim}
     if args.reset:
         print("✨ Clearing Database")
         clear_database()
+    if args.vacuum:
+        vacuum_index(CHROMA_PATH, index_options=index_options)
+        return
 
-    documents = load_documents()
-    chunks = split_documents(documents)
-    add_to_faiss(chunks)
+    start = time.perf_counter()
+    # Only PDFs that were added or edited since the last run are parsed and chunked
+    manifest = IngestManifest(CHROMA_PATH)
+    # Files chunked with other chunker settings count as modified and are re-chunked
+    changes = manifest.diff(list_pdfs(DATA_PATH), chunker=chunker_signature())
+    to_process = changes["added"] + changes["modified"]
 
+    for path in changes["added"]:
+        print(f"➕ New: {path}")
+    for path in changes["modified"]:
+        print(f"✏️ Modified: {path}")
+    for path in changes["removed"]:
+        print(f"🗑️ Removed: {path}")
 
-def load_documents():
-    loader = PyPDFDirectoryLoader(DATA_PATH)
-    return loader.load()
+    # Chunks that edited or deleted PDFs no longer produce are dropped from the index
+    stale_ids = set()
+    for path in changes["modified"] + changes["removed"]:
+        stale_ids.update(manifest.files[path]["chunk_ids"])
 
+    chunks_with_ids = []
+    if to_process:
+        documents = load_documents(to_process)
+        chunks = split_documents(documents)
+        chunks_with_ids = calculate_chunk_ids(chunks)
+    stale_ids -= {c.metadata["id"] for c in chunks_with_ids}
 
-def split_documents(documents: list[Document]):
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=800,
-        chunk_overlap=80,
-        length_function=len,
-        is_separator_regex=False,
+    # Chunks indexed before the manifest existed (legacy UUID or `source:page:index` keys, or
+    # another chunker) duplicate the current chunks of their PDF and are dropped as well
+    listed = {c.metadata["id"] for c in chunks_with_ids}
+    for path in changes["unchanged"]:
+        listed.update(manifest.files[path]["chunk_ids"])
+    current = {path.replace("\\", "/") for path in to_process + changes["unchanged"]}
+    unlisted = unlisted_chunks(CHROMA_PATH, listed)
+    superseded = {chunk_id for chunk_id, source in unlisted.items() if source in current}
+    if superseded:
+        print(f"🧹 Dropping {len(superseded)} chunks indexed under keys the manifest does not list")
+        stale_ids |= superseded
+    orphans = [c for c, source in unlisted.items() if source not in current and c not in stale_ids]
+    if orphans:
+        print(f"ℹ️ {len(orphans)} indexed chunks belong to no PDF in {DATA_PATH}/; `populate_db.py --vacuum` drops them")
+
+    if to_process or stale_ids:
+        index_chunks(chunks_with_ids, CHROMA_PATH, delete_ids=stale_ids, index_options=index_options)
+
+        manifest.index_version += 1
+        for path in to_process:
+            manifest.record(
+                path,
+                [c.metadata["id"] for c in chunks_with_ids if c.metadata.get("source") == path],
+                chunker=chunker_signature(),
+            )
+        for path in changes["removed"]:
+            manifest.forget(path)
+    else:
+        print("✅ No new or modified PDFs")
+        if any(v is not None for v in index_options.values()):
+            convert_index(CHROMA_PATH, index_options)
+        backfill_retrieval_indexes(CHROMA_PATH)
+    manifest.save()
+
+    print(
+        f"📁 Files processed: {len(to_process)}, unchanged: {len(changes['unchanged'])}, "
+        f"removed: {len(changes['removed'])} ({time.perf_counter() - start:.2f}s)"
     )
-    return splitter.split_documents(documents)
 
 
-def add_to_faiss(chunks: list[Document]):
-    embedding_fn = get_embedding_function()
+def unlisted_chunks(path: str, listed: set[str]) -> dict[str, str]:
+    """Chunk ID -> source PDF of every chunk in the index at path whose ID is not in listed."""
+    store = current_store(path)
+    if not os.path.exists(os.path.join(store, INDEX_FILE)):
+        return {}
+    db = load_store(store, get_embedding_function())
+    unlisted = {}
+    for chunk_id in db.index_to_docstore_id.values():
+        if chunk_id not in listed:
+            source = db.docstore.search(chunk_id).metadata.get("source", "unknown_source")
+            unlisted[chunk_id] = str(source).replace("\\", "/")
+    return unlisted
 
-    if os.path.exists(CHROMA_PATH):
-        # Load existing FAISS index and metadata
-        db = FAISS.load_local(
-    CHROMA_PATH,
-    embedding_fn,
-    allow_dangerous_deserialization=True
-)
 
-    else:
-        # Create new FAISS index
-        db = FAISS.from_documents(chunks, embedding_fn)
+def load_documents(paths: list[str] | None = None):
+    # PDFs (and page ranges of large PDFs) are parsed on a process pool
+    return load_pdfs_parallel(DATA_PATH, paths=paths)
+
+
+def split_documents(documents: list[Document]):
+    if CHUNKER == "recursive":
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=800,
+            chunk_overlap=80,
+            length_function=len,
+            is_separator_regex=False,
+        )
+        return tag_chunks(splitter.split_documents(documents))
+    # Token-measured chunks that follow headings and list items, across page breaks,
+    # tagged with the products their section and text are about
+    return tag_chunks(list(iter_chunks(documents)))
+
 
-    # Calculate IDs and assign to chunks metadata
+def add_to_faiss(chunks: list[Document]):
+    # Calculate IDs first so every chunk is embedded at most once, even on a cold build
     chunks_with_ids = calculate_chunk_ids(chunks)
 
     ids = [c.metadata["id"] for c in chunks_with_ids]
     print("Unique IDs generated:", len(set(ids)), "out of", len(ids))
 
+    index_chunks(chunks_with_ids, CHROMA_PATH)
+    return chunks_with_ids
+
+
+def index_chunks(chunks_with_ids: list[Document], path: str, delete_ids=(), index_options: dict | None = None):
+    """
+    Delete `delete_ids` from the index, embed chunks whose ID is not in the
+    index yet (once each) and save the index in the configured FAISS layout.
+    """
+    start = time.perf_counter()
+    # Vectors for unchanged text come from the on-disk cache, even after --reset
+    embedding_fn = CachedEmbeddings(BatchEmbedder(get_embedding_function()))
+
+    db = None
+    store = current_store(path)
+    meta = read_index_meta(store)
+    config = resolve_config(meta, **(index_options or {}))
+    if os.path.exists(os.path.join(store, INDEX_FILE)):
+        # Load existing FAISS index and metadata
+        db = load_index(store, embedding_fn, writable=True)
+    existing_ids = set(db.docstore._dict.keys()) if db else set()
+
+    # Near-duplicates of indexed chunks are recorded instead of embedded; one whose
+    # representative is deleted now is promoted and goes through the check again
+    near_dups = NearDuplicateIndex(path) if NEAR_DUP_ENABLED else None
+    promoted = near_dups.remove(delete_ids) if near_dups else []
 
-    # Filter out already existing document IDs
-    existing_ids = set(db.docstore._dict.keys())
-    new_chunks = [c for c in chunks_with_ids if c.metadata["id"] not in existing_ids]
+    delete_ids = [i for i in delete_ids if i in existing_ids]
+    if delete_ids:
+        print(f"🧹 Removing stale chunks: {len(delete_ids)}")
+        db = delete_chunks(db, delete_ids)
+        existing_ids.difference_update(delete_ids)
+        if not existing_ids:
+            db = None  # every vector was stale; start from an empty index
+    if near_dups and db is not None:
+        near_dups.backfill(db)
+
+    # Filter out already existing document IDs, duplicate chunks within this run and near-duplicates
+    new_chunks = {}
+    folded = 0
+    for chunk in list(chunks_with_ids) + promoted:
+        chunk_id = chunk.metadata["id"]
+        if chunk_id in existing_ids or chunk_id in new_chunks:
+            continue
+        if near_dups:
+            if near_dups.is_duplicate(chunk_id):
+                continue
+            signature = minhash(chunk.page_content)
+            match = near_dups.find(signature)
+            if match:
+                near_dups.add_duplicate(chunk, *match)
+                folded += 1
+                continue
+            near_dups.add(chunk_id, signature)
+        new_chunks[chunk_id] = chunk
+    skipped = len(chunks_with_ids) + len(promoted) - len(new_chunks)
+    if promoted:
+        print(f"🔁 Promoted {len(promoted)} near-duplicates of deleted chunks")
+    if folded:
+        print(f"🪞 Near-duplicates: {folded} chunks folded into indexed ones instead of embedded")
 
     if new_chunks:
         print(f"👉 Adding new documents: {len(new_chunks)}")
-        db.add_documents(new_chunks)
-        db.save_local(CHROMA_PATH)
+        chunk_list = list(new_chunks.values())
+        texts = [c.page_content for c in chunk_list]
+
+        # Batches are added to the index as soon as their vectors arrive
+        for positions, vectors in embedding_fn.iter_batches(texts):
+            text_embeddings = [(texts[i], vector) for i, vector in zip(positions, vectors)]
+            metadatas = [chunk_list[i].metadata for i in positions]
+            ids = [chunk_list[i].metadata["id"] for i in positions]
+            if db is None:
+                # Create new FAISS index straight from the vectors, keyed by our chunk IDs
+                db = FAISS.from_embeddings(text_embeddings, embedding_fn, metadatas=metadatas, ids=ids)
+            else:
+                db.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        save_index(db, path, config, meta)
+        embedding_fn.embeddings.report()
     else:
         print("✅ No new documents to add")
+        if delete_ids:
+            save_or_clear(db, path, config, meta)
+
+    if near_dups:
+        # Only now that the index is saved do the new representatives count as indexed
+        near_dups.commit()
+        near_dups.close()
+
+    cache_stats = embedding_fn.cache.stats()
+    print(
+        f"📊 Chunks embedded: {len(new_chunks)} ({embedding_fn.api_texts} via API, "
+        f"{cache_stats['hits']} from cache), skipped: {skipped}, "
+        f"wall time: {time.perf_counter() - start:.2f}s"
+    )
+    print(
+        f"🗄️ Embedding cache: {cache_stats['entries']} vectors, {cache_stats['size_mb']:.1f} MB, "
+        f"{cache_stats['evictions']} evicted"
+    )
+    return db
+
+
+def save_index(db, path: str, config, meta: dict):
+    """
+    Convert to the configured index type if needed, then save it with its
+    metadata, per-product partitions, section summaries and lexical index.
+    """
+    db, meta = apply_index_config(db, config, meta)
+    save_version(db, path, config, meta)
+    return db
 
 
+def save_version(db, path: str, config, meta: dict):
+    """
+    Write every file of the index into a new version directory, then point
+    faiss_index/CURRENT at it. Readers switch from one complete set of files
+    to the next in that one rename; a crash before it leaves the old set served.
+    """
+    previous = current_store(path)
+    directory = new_version(path)
+    sizes = save_partitions(db, directory, config)
+    if sizes:
+        print("🗂️ Product partitions: " + ", ".join(f"{product} {n}" for product, n in sizes.items()))
+    print(f"🧭 Section summaries: {save_summaries(db, directory)}")
+    save_store(db, directory)
+    write_index_meta(directory, meta)
+    sync_lexical_index(db, directory, previous)
+    publish_version(path, directory)
+    if previous == path:
+        remove_unversioned_files(path)
+
+
+def save_or_clear(db, path: str, config, meta: dict):
+    if db is None:
+        # Nothing left to index; remove the FAISS files but keep the manifest and the chosen layout
+        remove_versions(path)
+        remove_unversioned_files(path)
+        if meta.get("requested"):
+            write_index_meta(path, {"requested": meta["requested"]})
+    else:
+        save_index(db, path, config, meta)
+
+
+def remove_unversioned_files(path: str):
+    """The files of an index saved before versioning, which kept them in faiss_index/ itself."""
+    remove_store(path)
+    remove_partitions(path)
+    remove_summaries(path)
+    for name in os.listdir(path):
+        if name.startswith(LEXICAL_FILE) or name == INDEX_META_FILE:
+            os.remove(os.path.join(path, name))
+
+
+def sync_lexical_index(db, path: str, previous: str | None = None):
+    """
+    Bring the BM25 index at path in step with db, starting from a copy of the
+    one in previous (the version being replaced), touching only changed chunks.
+    """
+    if previous is not None and os.path.exists(os.path.join(previous, LEXICAL_FILE)):
+        shutil.copyfile(os.path.join(previous, LEXICAL_FILE), os.path.join(path, LEXICAL_FILE))
+    lexical = LexicalIndex(path)
+    added, removed = lexical.sync(db)
+    lexical.close()
+    if added or removed:
+        print(f"🔤 Lexical index: {added} chunks added, {removed} removed")
+
+
+def backfill_retrieval_indexes(path: str):
+    """
+    Indexes built before hybrid retrieval have no lexical part yet, those
+    built before product scoping have no partitions and an untagged lexical
+    index (rebuilt by sync), and older ones still no section summaries.
+    They are saved again as a new version with every part; chunks are
+    classified by text alone and nothing is embedded.
+    """
+    store = current_store(path)
+    if not os.path.exists(os.path.join(store, INDEX_FILE)):
+        return
+    lexical = LexicalIndex.open(store)
+    scoped = lexical is not None and lexical.scoped
+    if lexical is not None:
+        lexical.close()
+    if scoped and has_partitions(store) and has_summaries(store):
+        return
+    meta = read_index_meta(store)
+    db = load_index(store, get_embedding_function())
+    save_version(db, path, resolve_config(meta), meta)
+    print("🗂️ Added the missing retrieval indexes")
+
+
+def convert_index(path: str, index_options: dict):
+    """Rebuild an existing index in a new layout without re-embedding anything."""
+    store = current_store(path)
+    if not os.path.exists(os.path.join(store, INDEX_FILE)):
+        return
+    meta = read_index_meta(store)
+    config = resolve_config(meta, **index_options)
+    db = load_index(store, get_embedding_function(), writable=True)
+    save_index(db, path, config, meta)
+
+
+def chunk_id(source, page, text: str) -> str:
+    """Canonical chunk ID: `source:page:md5(text)`, with `/` as the path separator."""
+    # Use md5 hash of the chunk text to ensure uniqueness
+    content_hash = hashlib.md5(text.encode('utf-8')).hexdigest()
+    source = str(source).replace("\\", "/")
+    return f"{source}:{page}:{content_hash}"
+
 
 def calculate_chunk_ids(chunks):
     for chunk in chunks:
-        # Use md5 hash of the chunk text to ensure uniqueness
-        content_hash = hashlib.md5(chunk.page_content.encode('utf-8')).hexdigest()
-        
         source = chunk.metadata.get("source", "unknown_source")
         page = chunk.metadata.get("page", "unknown_page")
-        
-        chunk.metadata["id"] = f"{source}:{page}:{content_hash}"
-    
+
+        chunk.metadata["id"] = chunk_id(source, page, chunk.page_content)
+
     return chunks
 
 
+def vacuum_index(path: str, data_path: str = DATA_PATH, index_options: dict | None = None):
+    """
+    Rebuild the index from its own vectors, keeping one entry per canonical
+    chunk ID and dropping orphans: chunks whose PDF is gone from data/, or that
+    the manifest no longer lists for their PDF. Legacy UUID / `source:page:index`
+    keys are re-keyed to the canonical scheme. No embeddings are requested.
+    """
+    store = current_store(path)
+    if not os.path.exists(os.path.join(store, INDEX_FILE)):
+        print("✅ Nothing to vacuum")
+        return
+
+    embedding_fn = get_embedding_function()
+    db = load_index(store, embedding_fn, writable=True)
+    meta = read_index_meta(store)
+    config = resolve_config(meta, **(index_options or {}))
+    size_before = index_size_bytes(path)
+    latency_before = search_latency_ms(db)
+
+    manifest = IngestManifest(path)
+    present = {p.replace("\\", "/") for p in list_pdfs(data_path)}
+    tracked = {p.replace("\\", "/") for p in manifest.files}
+    listed = {cid for entry in manifest.files.values() for cid in entry["chunk_ids"]}
+
+    seen = set()
+    kept_ids, kept_positions, texts, metadatas = [], [], [], []
+    orphans = duplicates = 0
+    for position, docstore_id in db.index_to_docstore_id.items():
+        doc = db.docstore.search(docstore_id)
+        source = str(doc.metadata.get("source", "unknown_source")).replace("\\", "/")
+        canonical = chunk_id(source, doc.metadata.get("page", "unknown_page"), doc.page_content)
+        if source not in present or (source in tracked and canonical not in listed):
+            orphans += 1
+            continue
+        if canonical in seen:
+            duplicates += 1
+            continue
+        seen.add(canonical)
+        kept_ids.append(canonical)
+        kept_positions.append(position)
+        texts.append(doc.page_content)
+        metadatas.append({**doc.metadata, "id": canonical})
+
+    total = db.index.ntotal
+    if kept_ids:
+        vectors = index_vectors(db.index, kept_positions)
+        compact = FAISS.from_embeddings(zip(texts, vectors.tolist()), embedding_fn, metadatas=metadatas, ids=kept_ids)
+        compact = save_index(compact, path, config, meta)
+    else:
+        compact = None
+        save_or_clear(None, path, config, meta)
+
+    print(f"🧽 Vacuum: {total} → {len(kept_ids)} vectors ({orphans} orphans, {duplicates} duplicates removed)")
+    if os.path.exists(os.path.join(path, NEAR_DUPLICATES_FILE)):
+        compact = vacuum_near_duplicates(compact, path, present, index_options) or compact
+    print(f"💾 Index size: {size_before / 1024:.0f} KB → {index_size_bytes(path) / 1024:.0f} KB")
+    if compact is not None:
+        print(f"⏱️ Search latency (k=4): {latency_before:.3f} ms → {search_latency_ms(compact):.3f} ms")
+
+
+def vacuum_near_duplicates(db, path: str, present: set[str], index_options: dict | None):
+    """
+    Drop the near-duplicate records of chunks the vacuum removed and re-key the
+    rest; near-duplicates left without a representative are ingested in its place.
+    """
+    near_dups = NearDuplicateIndex(path)
+    promoted = near_dups.retain(db.index_to_docstore_id.values() if db is not None else ())
+    if db is not None:
+        near_dups.backfill(db)
+    near_dups.commit()
+    near_dups.close()
+    promoted = [doc for doc in promoted if str(doc.metadata.get("source")).replace("\\", "/") in present]
+    if promoted:
+        return index_chunks(promoted, path, index_options=index_options)
+    return None
+
+
+def index_size_bytes(path: str) -> int:
+    store = current_store(path)
+    return sum(
+        os.path.getsize(os.path.join(store, name))
+        for name in store_files(store)
+        if os.path.exists(os.path.join(store, name))
+    )
+
+
+def search_latency_ms(db, queries: int = 200) -> float:
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((queries, db.index.d)).astype(np.float32)
+    start = time.perf_counter()
+    for vector in vectors:
+        db.similarity_search_by_vector(vector.tolist(), k=4)
+    return (time.perf_counter() - start) * 1000 / queries
+
+
 def clear_database():
     if os.path.exists(CHROMA_PATH):
+        # The chosen layout (type, codec, reduction) survives a reset; the vectors do not
+        requested = read_index_meta(current_store(CHROMA_PATH)).get("requested")
         shutil.rmtree(CHROMA_PATH)
+        if requested:
+            os.makedirs(CHROMA_PATH)
+            write_index_meta(CHROMA_PATH, {"requested": requested})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,160 @@
+import json
+import os
+import re
+import shutil
+
+import faiss
+import numpy as np
+from langchain.schema.document import Document
+
+from ann_index import build_index, copy_codes, effective_config, index_layout, index_vectors, set_search_params
+from faiss_store import FAISS_MMAP
+
+PARTITIONS_DIR = "partitions"
+PARTITION_IDS_FILE = "ids.json"
+# Partition (and lexical tag) of the chunks about no product in particular: company,
+# pricing, platform. Searched together with every product, so those answers stay reachable.
+GENERAL = "general"
+# Questions that name a product search only that product's chunks (RAG_PRODUCT_SCOPE=0 searches everything)
+RAG_PRODUCT_SCOPE = os.getenv("RAG_PRODUCT_SCOPE", "1") == "1"
+
+# Product names as the knowledge base and users write them ("Prime Leads", "PrimeReach-Out");
+# VisionFlow is what Primius.ai calls PrimeVision
+PRODUCTS = {
+    "primeleads": re.compile(r"\bprime\s?leads?\b", re.IGNORECASE),
+    "primerecruits": re.compile(r"\bprime\s?recruits?\b", re.IGNORECASE),
+    "primereachout": re.compile(r"\bprime\s?reach\s?-?\s?out\b", re.IGNORECASE),
+    "primevision": re.compile(r"\bprime\s?vision\b|\bvision\s?-?flow\b", re.IGNORECASE),
+    "primecrm": re.compile(r"\bprime\s?crm\b", re.IGNORECASE),
+}
+
+
+def detect_products(text: str) -> list[str]:
+    """The products a text names, in PRODUCTS order."""
+    return [product for product, pattern in PRODUCTS.items() if pattern.search(text or "")]
+
+
+def question_products(question: str) -> list[str]:
+    """Partitions a question is searched in: the products it names plus GENERAL, or [] for everything."""
+    products = detect_products(question)
+    return products + [GENERAL] if products else []
+
+
+def chunk_products(doc: Document) -> list[str]:
+    """A chunk's partitions; chunks ingested before tagging are classified by their text."""
+    products = doc.metadata.get("products")
+    products = list(products) if products is not None else detect_products(doc.page_content)
+    return products or [GENERAL]
+
+
+def tag_chunks(chunks: list[Document]) -> list[Document]:
+    """
+    Record in metadata["products"] the products a chunk is about: those named
+    by the section heading it falls under (see chunker.iter_chunks) and those
+    named in its own text. Chunks about no product in particular get [].
+    """
+    for chunk in chunks:
+        named = detect_products(chunk.metadata.get("section", "")) + detect_products(chunk.page_content)
+        chunk.metadata["products"] = sorted(set(named))
+    return chunks
+
+
+def _partition_index(db, members: list[int], config):
+    """
+    The index of one partition. Float32 vectors are read back exactly and
+    indexed as the config asks for a partition of this size; compressed or
+    reduced ones keep their stored codes, since decoding and encoding them
+    again would move every vector.
+    """
+    layout = index_layout(db.index)
+    if layout["codec"] == "float32" and layout["reduce"] == "none":
+        vectors = index_vectors(db.index, members)
+        target, _ = effective_config(config, len(members), vectors.shape[1])
+        return build_index(target, vectors)
+    return copy_codes(db.index, members)
+
+
+def save_partitions(db, path: str, config):
+    """
+    Write one small FAISS index per product under path/partitions/,
+    holding only the vectors of that product's chunks, one for the GENERAL
+    chunks, and the position -> chunk ID map of each. A question about one
+    product then scans two small partitions instead of the whole index and
+    never sees other products' chunks. Vectors are copied from db, so nothing
+    is embedded again. path is the new version of the index (see
+    faiss_store.new_version), so readers switch to these files together with
+    the vectors they were copied from.
+    """
+    directory = os.path.join(path, PARTITIONS_DIR)
+    os.makedirs(directory)
+    positions: dict[str, list[int]] = {product: [] for product in [*PRODUCTS, GENERAL]}
+    for position, chunk_id in db.index_to_docstore_id.items():
+        for product in chunk_products(db.docstore.search(chunk_id)):
+            if product in positions:
+                positions[product].append(position)
+
+    ids = {}
+    for product, members in positions.items():
+        if members:
+            faiss.write_index(_partition_index(db, members, config), os.path.join(directory, f"{product}.faiss"))
+            ids[product] = [db.index_to_docstore_id[position] for position in members]
+    with open(os.path.join(directory, PARTITION_IDS_FILE), "w", encoding="utf-8") as f:
+        json.dump(ids, f)
+    return {product: len(members) for product, members in ids.items()}
+
+
+def has_partitions(path: str) -> bool:
+    return os.path.exists(os.path.join(path, PARTITIONS_DIR, PARTITION_IDS_FILE))
+
+
+def remove_partitions(path: str):
+    shutil.rmtree(os.path.join(path, PARTITIONS_DIR), ignore_errors=True)
+
+
+class ProductPartitions:
+    """Read-only handle on the per-product indexes written by save_partitions()."""
+
+    def __init__(self, indexes: dict, ids: dict[str, list[str]]):
+        self.indexes = indexes
+        self.ids = ids
+
+    @classmethod
+    def open(cls, path: str, nprobe: int, ef_search: int) -> "ProductPartitions | None":
+        """The partitions of the index at path, or None if it was built without them."""
+        if not has_partitions(path):
+            return None
+        directory = os.path.join(path, PARTITIONS_DIR)
+        with open(os.path.join(directory, PARTITION_IDS_FILE), encoding="utf-8") as f:
+            ids = json.load(f)
+        indexes = {}
+        flags = faiss.IO_FLAG_MMAP_IFC if FAISS_MMAP else 0
+        for product in ids:
+            index = faiss.read_index(os.path.join(directory, f"{product}.faiss"), flags)
+            set_search_params(index, nprobe, ef_search)
+            indexes[product] = index
+        return cls(indexes, ids)
+
+    def size(self, products: list[str]) -> int:
+        """Vectors a search over these products looks at."""
+        return sum(self.indexes[p].ntotal for p in products if p in self.indexes)
+
+    def search(self, products: list[str], vector: list[float], k: int) -> list[tuple[str, float]]:
+        """
+        Best k (chunk ID, squared L2 distance) pairs over the partitions of
+        products, nearest first; a chunk about several products counts once.
+        """
+        query = np.asarray([vector], dtype=np.float32)
+        best: dict[str, float] = {}
+        for product in products:
+            index = self.indexes.get(product)
+            if index is None:
+                continue
+            distances, positions = index.search(query, min(k, index.ntotal))
+            ids = self.ids[product]
+            for distance, position in zip(distances[0], positions[0]):
+                # -1 pads missing hits; the map is checked too in case it and the index disagree
+                if not 0 <= position < len(ids):
+                    continue
+                chunk_id = ids[position]
+                best[chunk_id] = min(float(distance), best.get(chunk_id, float("inf")))
+        return sorted(best.items(), key=lambda item: item[1])[:k]
@@ -0,0 +1,109 @@
+import asyncio
+import contextlib
+import os
+import time
+from collections import deque
+
+import numpy as np
+
+# Questions arriving within this many ms of each other share one embeddings request (0 = off)
+RAG_EMBED_BATCH_WINDOW_MS = float(os.getenv("RAG_EMBED_BATCH_WINDOW_MS", "5"))
+# A batch is sent as soon as it holds this many questions, without waiting out the window
+RAG_EMBED_BATCH_MAX = int(os.getenv("RAG_EMBED_BATCH_MAX", "16"))
+
+
+class QueryEmbeddingBatcher:
+    """
+    Micro-batcher for question embeddings on one event loop. The first
+    question opens a window of window_ms; every question that arrives before
+    it closes (up to max_batch) goes out in the same aembed_documents call,
+    and each caller gets its own vector back. Identical questions in a batch
+    are embedded once. A failed call fails only the questions of its batch.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        window_ms: float = RAG_EMBED_BATCH_WINDOW_MS,
+        max_batch: int = RAG_EMBED_BATCH_MAX,
+        limit=None,
+    ):
+        self.embeddings = embeddings
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        # Async context manager factory held around each embeddings call, e.g. a concurrency limit
+        self.limit = limit or contextlib.nullcontext
+        self.requests = 0
+        self.calls = 0
+        self.texts = 0
+        self._waits_ms = deque(maxlen=10_000)  # time each question spent waiting for its batch
+        self._pending: list[tuple[str, asyncio.Future, float]] = []
+        self._timer = None
+        self._tasks = set()
+
+    async def embed_query(self, text: str) -> list[float]:
+        self.requests += 1
+        if self.window <= 0 or self.max_batch <= 1:
+            self.calls += 1
+            self.texts += 1
+            self._waits_ms.append(0.0)
+            async with self.limit():
+                return await self.embeddings.aembed_query(text)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._send(batch))
+            self._tasks.add(task)  # the loop only keeps weak references to tasks
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: list[tuple[str, asyncio.Future, float]]):
+        sent_at = time.perf_counter()
+        self._waits_ms.extend((sent_at - arrived) * 1000 for _, _, arrived in batch)
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        self.calls += 1
+        self.texts += len(texts)
+        try:
+            async with self.limit():
+                vectors = await self.embeddings.aembed_documents(texts)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():  # the caller may have been cancelled meanwhile
+                    future.set_exception(e)
+            return
+        by_text = dict(zip(texts, vectors))
+        for text, future, _ in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+
+    def stats(self) -> dict:
+        waits = np.array(self._waits_ms) if self._waits_ms else np.zeros(1)
+        return {
+            "requests": self.requests,
+            "calls": self.calls,
+            "calls_saved": self.requests - self.calls,
+            "mean_batch": self.requests / self.calls if self.calls else 0.0,
+            "texts_deduplicated": self.requests - self.texts,
+            "wait_ms_p50": float(np.percentile(waits, 50)),
+            "wait_ms_p95": float(np.percentile(waits, 95)),
+        }
+
+    def report(self):
+        stats = self.stats()
+        print(
+            f"📦 Query embeddings: {stats['requests']} questions in {stats['calls']} calls "
+            f"({stats['calls_saved']} saved, {stats['mean_batch']:.1f} per call), "
+            f"added wait p50 {stats['wait_ms_p50']:.1f} ms / p95 {stats['wait_ms_p95']:.1f} ms"
+        )
@@ -1,13 +1,28 @@
-import argparse
+import asyncio
 import os
-import shutil
-from langchain_community.document_loaders import PyPDFDirectoryLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import re
+import time
+import weakref
 from langchain.schema.document import Document
-from get_embading_function import get_embedding_function
-from langchain.vectorstores.faiss import FAISS  
-from langchain.chains import RetrievalQA
-from langchain_openai import ChatOpenAI
+from langchain_core.messages import HumanMessage, SystemMessage
+import hybrid_search
+from context_packer import pack_context, source_ids
+from intent_router import route_intent
+from model_router import FAST, choose_model, escalate, question_features, unsure_opening
+from query_batcher import QueryEmbeddingBatcher
+from single_flight import SingleFlight
+# Ingestion lives in populate_db; `python query_data.py [--reset]` still builds the index
+from populate_db import (
+    CHROMA_PATH as FAISS_PATH,
+    add_to_faiss,
+    calculate_chunk_ids,
+    clear_database,
+    load_documents,
+    main,
+    split_documents,
+)
+from rag_runtime import get_runtime
+from token_utils import count_tokens
 from dotenv import load_dotenv
 import sys
 
@@ -15,97 +30,19 @@ load_dotenv()
 
 api_key = os.getenv("OPENAI_API_KEY")
 
+# Max questions per event loop that may have embedding/LLM calls in flight at once
+RAG_MAX_CONCURRENCY = int(os.getenv("RAG_MAX_CONCURRENCY", "8"))
+_semaphores = weakref.WeakKeyDictionary()
+_batchers = weakref.WeakKeyDictionary()
+# Shared by every thread and event loop of the process; .stats() has the coalescing rate
+question_flights = SingleFlight()
 
 
-FAISS_PATH = "faiss_index"  # Use this folder for FAISS persistence
-DATA_PATH = "data"
-
-
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--reset", action="store_true", help="Reset the database.")
-    args = parser.parse_args()
-    if args.reset:
-        print("✨ Clearing Database")
-        clear_database()
-
-    documents = load_documents()
-    chunks = split_documents(documents)
-    add_to_faiss(chunks)
-
-
-def load_documents():
-    loader = PyPDFDirectoryLoader(DATA_PATH)
-    return loader.load()
-
-
-def split_documents(documents: list[Document]):
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=800,
-        chunk_overlap=80,
-        length_function=len,
-        is_separator_regex=False,
-    )
-    return splitter.split_documents(documents)
-
-
-def add_to_faiss(chunks: list[Document]):
-    embedding_fn = get_embedding_function()
-
-    if os.path.exists(FAISS_PATH):
-        db = FAISS.load_local(
-            FAISS_PATH,
-            embedding_fn,
-            allow_dangerous_deserialization=True  # <-- Add this
-        )
-    else:
-        db = FAISS.from_documents(chunks, embedding_fn)
-
-    chunks_with_ids = calculate_chunk_ids(chunks)
-
-    existing_ids = set(db.docstore._dict.keys())
-    new_chunks = [c for c in chunks_with_ids if c.metadata["id"] not in existing_ids]
-
-    if new_chunks:
-        print(f"👉 Adding new documents: {len(new_chunks)}")
-        db.add_documents(new_chunks)
-        db.save_local(FAISS_PATH)
-    else:
-        print("✅ No new documents to add")
-
-
-def calculate_chunk_ids(chunks):
-    last_page_id = None
-    current_chunk_index = 0
-
-    for chunk in chunks:
-        source = chunk.metadata.get("source")
-        page = chunk.metadata.get("page")
-        current_page_id = f"{source}:{page}"
-
-        if current_page_id == last_page_id:
-            current_chunk_index += 1
-        else:
-            current_chunk_index = 0
-
-        chunk_id = f"{current_page_id}:{current_chunk_index}"
-        last_page_id = current_page_id
-
-        chunk.metadata["id"] = chunk_id
-
-    return chunks
-
-
-def clear_database():
-    if os.path.exists(FAISS_PATH):
-        shutil.rmtree(FAISS_PATH)
-
-
-def query_rag(question: str) -> str:
-    custom_prompt = (
-        f"You are the **Strategic Business Developer** for FastAutomate, creators of the Primius.ai hybrid AI automation platform. Your specialization is in **identifying and deeply understanding a prospect’s or customer’s pain points**, then mapping them to  the right solution in the FastAutomate / Primius.ai product suite. You are a trusted advisor who adds measurable value by connecting client challenges to features, workflows, and outcomes that solve them. "
-        f"Core Mission: - Diagnose the user's needs through targeted questioning. - Present accurate, KB-backed solutions from the FastAutomate ecosystem. - Position solutions in a way that drives adoption, retention, and measurable ROI. - Maintain strict product boundary rules. "
-        f"""
+# Static instructions, sent to the LLM as a system message and never embedded for retrieval
+SYSTEM_PROMPT = (
+    "You are the **Strategic Business Developer** for FastAutomate, creators of the Primius.ai hybrid AI automation platform. Your specialization is in **identifying and deeply understanding a prospect’s or customer’s pain points**, then mapping them to  the right solution in the FastAutomate / Primius.ai product suite. You are a trusted advisor who adds measurable value by connecting client challenges to features, workflows, and outcomes that solve them. "
+    "Core Mission: - Diagnose the user's needs through targeted questioning. - Present accurate, KB-backed solutions from the FastAutomate ecosystem. - Position solutions in a way that drives adoption, retention, and measurable ROI. - Maintain strict product boundary rules. "
+    """
 ## Product Boundaries
 
 - **PrimeLeads** → Lead identification, enrichment, scoring, ranking, shortlisting. **No outreach.**  
@@ -162,36 +99,397 @@ Any user request involving sending messages, emailing, contacting, following up,
 - After the URL is provided, the system will call the function `main_primeleads(url)` to execute.
 - Keep your reply short and clear when asking for the URL.
 """
-        f"Question: {question}"
-    )
-    db = FAISS.load_local(
-    FAISS_PATH,
-    embeddings=get_embedding_function(),
-    allow_dangerous_deserialization=True
 )
+SYSTEM_MESSAGE = SystemMessage(content=SYSTEM_PROMPT)
 
-    retriever = db.as_retriever()
+QUESTION_TEMPLATE = """Use the following pieces of context to answer the question at the end. If you don't know the answer, just say that you don't know, don't try to make up an answer.
 
-    llm = ChatOpenAI(
-        model="gpt-4",
-        temperature=0,
-        api_key=api_key,
-    )
+{context}
 
-    qa_chain = RetrievalQA.from_chain_type(
-        llm=llm,
-        retriever=retriever,
-    )
+Question: {question}
+Helpful Answer:"""
 
-    result = qa_chain.invoke({"query": custom_prompt})
+# Sent without an LLM call when retrieval finds nothing relevant to the question
+NOT_IN_KB_REPLY = (
+    "I couldn't find anything about that in the FastAutomate / Primius.ai knowledge base. "
+    "Could you rephrase, or tell me which product or workflow you're asking about?"
+)
 
-    answer = result["result"] if isinstance(result, dict) else result
 
-    # --- NEW LOGIC: check if PrimeLeads is requested ---
-    if "prime leads" in question.lower():
-        return "🔗 Please provide the URL you want PrimeLeads to process."
+def normalize_question(question: str) -> str:
+    return re.sub(r"\s+", " ", question).strip()
+
+
+def flight_key(question: str) -> str:
+    """Key under which identical in-flight questions share one answer: case and trailing punctuation ignored."""
+    return normalize_question(question).casefold().rstrip("?!. ")
+
+
+def _retrieve(question: str):
+    """
+    Cache lookups + hybrid search + context packing + model choice:
+    (snapshot, finished result or None, question vector, docs, ModelChoice).
+    The result is set for cache hits and for questions the knowledge base has
+    nothing on.
+    """
+    # Index, retriever and LLM are loaded once per process and reused across questions
+    runtime = get_runtime()
+    snapshot = runtime.snapshot()
+
+    cache = runtime.answer_cache
+    if cache:
+        cached = cache.lookup_exact(question, snapshot.version)
+        if cached:
+            return snapshot, _cached_result(cached, "exact", embedding_tokens=0), None, [], None
+
+    # Only the user question is embedded, so similarity is driven by what was asked.
+    # The same vector is used for the cache lookup and the dense half of the search.
+    vector = runtime.embeddings.embed_query(question)
+    if cache:
+        cached = cache.lookup(vector, snapshot.version)
+        if cached:
+            return snapshot, _cached_result(cached, "semantic", embedding_tokens=count_tokens(question)), vector, [], None
+
+    result, docs, choice = _context(snapshot, question, vector)
+    return snapshot, result, vector, docs, choice
+
+
+async def _aretrieve(question: str):
+    runtime = get_runtime()
+    snapshot = await asyncio.to_thread(runtime.snapshot)
+
+    cache = runtime.answer_cache
+    if cache:
+        cached = await asyncio.to_thread(cache.lookup_exact, question, snapshot.version)
+        if cached:
+            return snapshot, _cached_result(cached, "exact", embedding_tokens=0), None, [], None
+
+    # Questions from concurrent users share one embeddings request
+    vector = await query_batcher().embed_query(question)
+    if cache:
+        cached = await asyncio.to_thread(cache.lookup, vector, snapshot.version)
+        if cached:
+            return snapshot, _cached_result(cached, "semantic", embedding_tokens=count_tokens(question)), vector, [], None
+
+    # FAISS, BM25 and context packing block; other questions keep running on the loop meanwhile
+    result, docs, choice = await asyncio.to_thread(_context, snapshot, question, vector)
+    return snapshot, result, vector, docs, choice
+
+
+def _context(snapshot, question: str, vector) -> tuple:
+    """(not-in-KB result or None, packed docs, chat model to answer with)."""
+    thresholds = get_runtime().thresholds
+    candidates = hybrid_search.search_scored(snapshot, question, vector)
+    docs = pack_context(
+        candidates, max_chunks=hybrid_search.result_size(snapshot), min_similarity=thresholds.relevant
+    )
+    if not docs:
+        return _not_in_kb_result(question, candidates), [], None
+    # Retrieval confidence is one of the routing features, so the model is picked only now
+    return None, docs, choose_model(question_features(question, candidates), thresholds.confident)
+
+
+def answer_question(question: str) -> dict:
+    """Run one RAG round trip and return the answer with its sources and token usage."""
+    question = normalize_question(question)
+    flight = question_flights.join(flight_key(question))
+    if not flight.leader:
+        return _coalesced_result(question, flight.result)
+
+    with flight:
+        snapshot, cached, vector, docs, choice = _retrieve(question)
+        if cached:
+            flight.publish(cached)
+        else:
+            response, choice = _complete(_build_messages(question, docs), choice)
+            flight.publish(_finish(question, vector, docs, response, snapshot, choice))
+    return flight.result
+
+
+async def aanswer_question(question: str) -> dict:
+    """Async twin of answer_question: network calls are awaited instead of blocking the loop."""
+    question = normalize_question(question)
+    flight = await question_flights.ajoin(flight_key(question))
+    if not flight.leader:
+        return _coalesced_result(question, flight.result)
+
+    with flight:
+        snapshot, cached, vector, docs, choice = await _aretrieve(question)
+        if cached:
+            flight.publish(cached)
+        else:
+            async with _concurrency_limit():
+                response, choice = await _acomplete(_build_messages(question, docs), choice)
+            flight.publish(await asyncio.to_thread(_finish, question, vector, docs, response, snapshot, choice))
+    return flight.result
+
+
+def _complete(messages: list, choice):
+    """The routed model's response and choice; a fast answer that opens with "I don't know" is asked again on the strong tier."""
+    runtime = get_runtime()
+    start = time.perf_counter()
+    response = runtime.llm_for(choice.tier).invoke(messages)
+    usage = _usage(response, messages)
+    runtime.model_router.record(choice, time.perf_counter() - start, *usage)
+    if choice.tier == FAST and unsure_opening(response.content, done=True):
+        return _complete(messages, escalate(choice, usage))
+    return response, choice
+
+
+async def _acomplete(messages: list, choice):
+    runtime = get_runtime()
+    start = time.perf_counter()
+    response = await runtime.llm_for(choice.tier).ainvoke(messages)
+    usage = _usage(response, messages)
+    runtime.model_router.record(choice, time.perf_counter() - start, *usage)
+    if choice.tier == FAST and unsure_opening(response.content, done=True):
+        return await _acomplete(messages, escalate(choice, usage))
+    return response, choice
+
+
+def _usage(response, messages: list) -> tuple[int, int]:
+    """(input, output) tokens of a completion, counted locally if it was cut off before reporting usage."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    return sum(count_tokens(m.content) for m in messages), count_tokens(response.content if response else "")
+
+
+def _concurrency_limit() -> asyncio.Semaphore:
+    # One semaphore per event loop; RAG_MAX_CONCURRENCY bounds in-flight LLM/embedding calls
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(RAG_MAX_CONCURRENCY)
+    return semaphore
+
+
+def query_batcher() -> QueryEmbeddingBatcher:
+    """The running event loop's question-embedding batcher (see query_batcher.py); .stats() has its metrics."""
+    loop = asyncio.get_running_loop()
+    batcher = _batchers.get(loop)
+    if batcher is None:
+        # Each batched call counts once against RAG_MAX_CONCURRENCY, not once per question
+        batcher = _batchers[loop] = QueryEmbeddingBatcher(get_runtime().embeddings, limit=_concurrency_limit)
+    return batcher
+
+
+def _build_messages(question: str, docs: list[Document]) -> list:
+    context = "\n\n".join(doc.page_content for doc in docs)
+    return [
+        SYSTEM_MESSAGE,
+        HumanMessage(content=QUESTION_TEMPLATE.format(context=context, question=question)),
+    ]
+
+
+def _finish(question: str, vector, docs: list[Document], response, snapshot, choice) -> dict:
+    cache = get_runtime().answer_cache
+    usage = response.usage_metadata or {}
+    # An escalated answer also paid for the unsure fast attempt
+    fast_input, fast_output = choice.fast_usage
+    stats = {
+        "embedding_tokens": count_tokens(question),
+        # What the retriever used to embed when the instructions were part of the query
+        "embedding_tokens_saved": count_tokens(SYSTEM_PROMPT),
+        "llm_input_tokens": usage.get("input_tokens", 0) + fast_input,
+        "llm_output_tokens": usage.get("output_tokens", 0) + fast_output,
+        "context_tokens": sum(count_tokens(doc.page_content) for doc in docs),
+        "cache": "miss" if cache else "off",
+        "model": choice.model,
+        "tier": choice.tier,
+    }
+    print(
+        f"📊 Tokens — embedding: {stats['embedding_tokens']} (saved {stats['embedding_tokens_saved']}), "
+        f"LLM in: {stats['llm_input_tokens']} ({stats['context_tokens']} context), LLM out: {stats['llm_output_tokens']}"
+    )
+
+    sources = [chunk_id for doc in docs for chunk_id in source_ids(doc)]
+    if cache:
+        cache.store(question, vector, response.content, sources, snapshot.version)
+
+    return {"answer": response.content, "sources": sources, "stats": stats}
+
+
+def _cached_result(entry, kind: str, embedding_tokens: int) -> dict:
+    stats = get_runtime().answer_cache.stats()
+    print(f"♻️ Answer cache {kind} hit for \"{entry.question}\" (hit rate {stats['hit_rate']:.0%})")
+    return {
+        "answer": entry.answer,
+        "sources": entry.sources,
+        "stats": {"embedding_tokens": embedding_tokens, "llm_input_tokens": 0, "llm_output_tokens": 0, "cache": kind},
+    }
+
+
+def _coalesced_result(question: str, shared: dict) -> dict:
+    stats = question_flights.stats()
+    print(f"🔗 Shared the in-flight answer to \"{question}\" (coalescing rate {stats['coalescing_rate']:.0%})")
+    return {
+        "answer": shared["answer"],
+        "sources": shared["sources"],
+        "stats": {"embedding_tokens": 0, "llm_input_tokens": 0, "llm_output_tokens": 0, "cache": "coalesced"},
+    }
+
+
+def _not_in_kb_result(question: str, candidates) -> dict:
+    best = max((c.similarity for c in candidates if c.similarity is not None), default=0.0)
+    print(f"🚫 Nothing relevant in the KB for \"{question}\" (best similarity {best:.3f}); LLM skipped")
+    return {
+        "answer": NOT_IN_KB_REPLY,
+        "sources": [],
+        "stats": {
+            "embedding_tokens": count_tokens(question),
+            "llm_input_tokens": 0,
+            "llm_output_tokens": 0,
+            "cache": "miss" if get_runtime().answer_cache else "off",
+            "not_in_kb": True,
+        },
+    }
 
-    return answer
+
+def query_rag(question: str) -> str:
+    # PrimeLeads / PrimeReachOut handoffs and greetings are answered locally, before retrieval
+    route = route_intent(question)
+    if route:
+        print(f"🧭 Routed to {route.intent} ({route.stage}, score {route.score:.2f})")
+        return route.reply
+
+    return answer_question(question)["answer"]
+
+
+async def aquery_rag(question: str) -> str:
+    route = route_intent(question)
+    if route:
+        print(f"🧭 Routed to {route.intent} ({route.stage}, score {route.score:.2f})")
+        return route.reply
+
+    return (await aanswer_question(question))["answer"]
+
+
+def stream_rag(question: str):
+    """
+    Generator version of query_rag that yields the answer as the LLM produces it.
+    Routed intents, cache hits, shared in-flight answers and not-in-KB replies are
+    yielded as a single chunk.
+    """
+    start = time.perf_counter()
+    route = route_intent(question)
+    if route:
+        yield route.reply
+        return
+
+    question = normalize_question(question)
+    flight = question_flights.join(flight_key(question))
+    if not flight.leader:
+        yield _coalesced_result(question, flight.result)["answer"]
+        return
+
+    # Followers get the whole answer once this stream ends; closing it early makes one of them lead instead
+    with flight:
+        snapshot, cached, vector, docs, choice = _retrieve(question)
+        if cached:
+            flight.publish(cached)
+            yield cached["answer"]
+            return
+
+        runtime = get_runtime()
+        messages = _build_messages(question, docs)
+        first_token_at = None
+        while True:
+            full = None
+            # The fast tier's opening is held back until it is clearly not "I don't know"
+            held = choice.tier == FAST
+            llm_start = time.perf_counter()
+            for chunk in runtime.llm_for(choice.tier).stream(messages):
+                full = chunk if full is None else full + chunk
+                if held:
+                    unsure = unsure_opening(full.content)
+                    if unsure is None:
+                        continue
+                    if unsure:
+                        break
+                    held, text = False, full.content
+                else:
+                    text = chunk.content
+                if text:
+                    first_token_at = first_token_at or time.perf_counter()
+                    yield text
+            usage = _usage(full, messages)
+            runtime.model_router.record(choice, time.perf_counter() - llm_start, *usage)
+            if held and unsure_opening(full.content if full else "", done=True):
+                choice = escalate(choice, usage)
+                continue
+            if held:  # a short answer that ended before the hold did
+                first_token_at = first_token_at or time.perf_counter()
+                yield full.content
+            break
+
+        _report_stream_latency(start, first_token_at)
+        if full is not None:
+            flight.publish(_finish(question, vector, docs, full, snapshot, choice))
+
+
+async def astream_rag(question: str):
+    """Async generator twin of stream_rag, for the Telegram bot."""
+    start = time.perf_counter()
+    route = route_intent(question)
+    if route:
+        yield route.reply
+        return
+
+    question = normalize_question(question)
+    flight = await question_flights.ajoin(flight_key(question))
+    if not flight.leader:
+        yield _coalesced_result(question, flight.result)["answer"]
+        return
+
+    with flight:
+        snapshot, cached, vector, docs, choice = await _aretrieve(question)
+        if cached:
+            flight.publish(cached)
+            yield cached["answer"]
+            return
+
+        runtime = get_runtime()
+        messages = _build_messages(question, docs)
+        first_token_at = None
+        async with _concurrency_limit():
+            while True:
+                full = None
+                held = choice.tier == FAST
+                llm_start = time.perf_counter()
+                async for chunk in runtime.llm_for(choice.tier).astream(messages):
+                    full = chunk if full is None else full + chunk
+                    if held:
+                        unsure = unsure_opening(full.content)
+                        if unsure is None:
+                            continue
+                        if unsure:
+                            break
+                        held, text = False, full.content
+                    else:
+                        text = chunk.content
+                    if text:
+                        first_token_at = first_token_at or time.perf_counter()
+                        yield text
+                usage = _usage(full, messages)
+                runtime.model_router.record(choice, time.perf_counter() - llm_start, *usage)
+                if held and unsure_opening(full.content if full else "", done=True):
+                    choice = escalate(choice, usage)
+                    continue
+                if held:
+                    first_token_at = first_token_at or time.perf_counter()
+                    yield full.content
+                break
+
+        _report_stream_latency(start, first_token_at)
+        if full is not None:
+            flight.publish(await asyncio.to_thread(_finish, question, vector, docs, full, snapshot, choice))
+
+
+def _report_stream_latency(start: float, first_token_at: float | None):
+    total_ms = (time.perf_counter() - start) * 1000
+    ttft_ms = (first_token_at - start) * 1000 if first_token_at else total_ms
+    print(f"⏱️ Time to first token: {ttft_ms:.0f} ms, total: {total_ms:.0f} ms")
 
 
 if __name__ == "__main__":
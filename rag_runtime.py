@@ -0,0 +1,155 @@
+import hashlib
+import os
+import threading
+import time
+
+from langchain_openai import ChatOpenAI
+from ann_index import FAISS_EF_SEARCH, FAISS_NPROBE, load_index, search_params
+from answer_cache import AnswerCache
+from faiss_store import current_store, store_files
+from lexical_index import LexicalIndex
+from get_embading_function import EmbeddingMismatchError, get_embedding_function, similarity_thresholds
+from model_router import FAST, RAG_FAST_MODEL, RAG_STRONG_MODEL, ModelRouter
+from product_scope import ProductPartitions
+from section_summaries import load_summaries
+
+FAISS_PATH = "faiss_index"
+
+# How often (seconds) a query is allowed to stat() the index files for changes
+RELOAD_CHECK_INTERVAL = float(os.getenv("RAG_RELOAD_CHECK_INTERVAL", "2.0"))
+
+
+def index_signature(path: str = FAISS_PATH):
+    """
+    (name, size, mtime) of every index file of the current version, or None if
+    the index is missing. Each save is a new version directory, so its path
+    alone changes with every save.
+    """
+    store = current_store(path)
+    signature = [store]
+    for name in store_files(store):
+        try:
+            st = os.stat(os.path.join(store, name))
+        except FileNotFoundError:
+            return None
+        signature.append((name, st.st_size, st.st_mtime_ns))
+    return tuple(signature)
+
+
+class IndexSnapshot:
+    """Everything that depends on one on-disk version of the index."""
+
+    def __init__(self, version: str, db, retriever, lexical=None, partitions=None, summaries=None):
+        self.version = version
+        self.db = db
+        self.retriever = retriever
+        self.lexical = lexical
+        self.partitions = partitions
+        self.summaries = summaries
+        self.loaded_at = time.time()
+
+
+class RagRuntime:
+    """
+    Process-wide retrieval runtime: the FAISS index, embeddings client and chat
+    model are built once and reused by every query. When the files under
+    faiss_index/ change on disk the index is reloaded in the background of the
+    calling query and swapped in atomically; in-flight queries keep the snapshot
+    they started with.
+    """
+
+    def __init__(self, path: str = FAISS_PATH):
+        self.path = path
+        self.embeddings = get_embedding_function()
+        self.llm = _chat_model(RAG_STRONG_MODEL)
+        # Short factual questions are answered by this cheaper, faster model (see model_router.py)
+        self.fast_llm = _chat_model(RAG_FAST_MODEL)
+        self.model_router = ModelRouter()
+        # Similarity cutoffs on the scale of the configured embedding model
+        self.thresholds = similarity_thresholds(self.embeddings)
+        enabled = os.getenv("ANSWER_CACHE_ENABLED", "1") == "1"
+        self.answer_cache = AnswerCache(threshold=self.thresholds.same_question) if enabled else None
+        self.reloads = 0
+        self._snapshot = None
+        self._signature = None
+        self._last_check = 0.0
+        self._reload_lock = threading.Lock()
+
+    def llm_for(self, tier: str) -> ChatOpenAI:
+        return self.fast_llm if tier == FAST else self.llm
+
+    def snapshot(self) -> IndexSnapshot:
+        now = time.monotonic()
+        if self._snapshot is None or now - self._last_check >= RELOAD_CHECK_INTERVAL:
+            self._last_check = now
+            if index_signature(self.path) != self._signature:
+                self._reload()
+        if self._snapshot is None:
+            raise FileNotFoundError(f"No FAISS index found at '{self.path}'. Run populate_db.py first.")
+        return self._snapshot
+
+    def _reload(self):
+        with self._reload_lock:
+            signature = index_signature(self.path)
+            if signature is None or signature == self._signature:
+                return
+            # Every part is opened from the same version, however many saves happen meanwhile
+            store = signature[0]
+            try:
+                # Flat, IVF, HNSW or IVF-PQ, with the search knobs stored in index_meta.json
+                db = load_index(store, self.embeddings)
+                # Per-product indexes, searched with the same knobs; None for indexes built without them
+                params = search_params(db.index)
+                partitions = ProductPartitions.open(
+                    store, params.get("nprobe", FAISS_NPROBE), params.get("efSearch", FAISS_EF_SEARCH)
+                )
+                # Section summaries for coarse-to-fine retrieval; None for indexes built without them
+                summaries = load_summaries(store, self.embeddings)
+                # BM25 side of hybrid retrieval; older indexes without one stay dense-only
+                lexical = LexicalIndex.open(store)
+            except EmbeddingMismatchError as e:
+                if self._snapshot is None:
+                    raise
+                # An index rebuilt with other embeddings; the one being served still matches them
+                print(f"⚠️ Not reloading FAISS index, keeping current version: {e}")
+                return
+            except Exception as e:
+                if self._snapshot is None:
+                    # Nothing to fall back on; the cause says more than "no index found"
+                    raise
+                # An unreadable version; keep serving the old one
+                print(f"⚠️ Could not reload FAISS index, keeping current version: {e}")
+                return
+
+            if index_signature(self.path) != signature:
+                # Files changed while we were reading them, pick it up on the next check
+                return
+
+            retriever = db.as_retriever()
+            version = hashlib.md5(repr(signature).encode("utf-8")).hexdigest()[:12]
+            self._snapshot = IndexSnapshot(version, db, retriever, lexical, partitions, summaries)
+            self._signature = signature
+            self.reloads += 1
+            print(f"📚 Loaded FAISS index version {version} ({db.index.ntotal} vectors)")
+
+
+def _chat_model(model: str) -> ChatOpenAI:
+    return ChatOpenAI(
+        model=model,
+        temperature=0,
+        api_key=os.getenv("OPENAI_API_KEY"),
+        stream_usage=True,  # token usage is also reported for streamed answers
+    )
+
+
+_runtime = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime() -> RagRuntime:
+    global _runtime
+    if _runtime is None:
+        with _runtime_lock:
+            if _runtime is None:
+                _runtime = RagRuntime()
+    return _runtime
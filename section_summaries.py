@@ -0,0 +1,134 @@
+import os
+import re
+import shutil
+
+import numpy as np
+from langchain.schema.document import Document
+from langchain.vectorstores.faiss import FAISS
+
+from ann_index import index_vectors
+from faiss_store import INDEX_FILE, load_store, save_store
+from token_utils import count_tokens
+
+SUMMARIES_DIR = "summaries"
+# Coarse-to-fine retrieval: pick sections by their summaries, then search only their chunks
+RAG_HIERARCHICAL = os.getenv("RAG_HIERARCHICAL", "1") == "1"
+# Below this many chunks one flat search is both faster and more accurate than two stages
+RAG_HIERARCHICAL_MIN_CHUNKS = int(os.getenv("RAG_HIERARCHICAL_MIN_CHUNKS", "2000"))
+# Sections whose chunks a question is searched in
+RAG_SECTION_K = int(os.getenv("RAG_SECTION_K", "5"))
+SUMMARY_TOKENS = int(os.getenv("SUMMARY_TOKENS", "120"))
+# A document without headings is summarized in runs of this many chunks, not as one blob
+SECTION_MAX_CHUNKS = 12
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def _title(source: str) -> str:
+    return re.sub(r"\.pdf$", "", os.path.basename(str(source)), flags=re.IGNORECASE)
+
+
+def _lead(text: str) -> str:
+    """First sentence of a chunk, on one line."""
+    return " ".join(_SENTENCE_END.split(text.strip(), maxsplit=1)[0].split())
+
+
+def summarize(source: str, section: str | None, chunks: list[Document], max_tokens: int = SUMMARY_TOKENS) -> str:
+    """
+    Extractive summary of a section: document title and heading, then the
+    opening sentence of each of its chunks in reading order, up to
+    max_tokens. Costs no model call, so rebuilding it on every save is free.
+    """
+    lines = [f"{_title(source)} — {section}" if section else _title(source)]
+    used = count_tokens(lines[0])
+    for chunk in chunks:
+        lead = _lead(chunk.page_content)
+        if not lead or lead == section:
+            continue
+        tokens = count_tokens(lead)
+        if used + tokens > max_tokens:
+            break
+        lines.append(lead)
+        used += tokens
+    return "\n".join(lines)
+
+
+def sections(db) -> list[tuple[str, str | None, list[tuple[int, Document]]]]:
+    """
+    The indexed chunks grouped by (source, section heading) in reading order,
+    as (source, section, [(FAISS position, chunk)]). Runs of more than
+    SECTION_MAX_CHUNKS chunks are split. Chunks of older indexes have no
+    section and share one group per source.
+    """
+    groups: dict[tuple, list[tuple[int, Document]]] = {}
+    for position, chunk_id in db.index_to_docstore_id.items():
+        doc = db.docstore.search(chunk_id)
+        if not isinstance(doc, Document):  # a position the docstore no longer has
+            continue
+        key = (str(doc.metadata.get("source")), doc.metadata.get("section"))
+        groups.setdefault(key, []).append((position, doc))
+    result = []
+    for (source, section), members in groups.items():
+        members.sort(key=lambda item: (item[1].metadata.get("page") or 0, item[0]))
+        for start in range(0, len(members), SECTION_MAX_CHUNKS):
+            result.append((source, section, members[start:start + SECTION_MAX_CHUNKS]))
+    return result
+
+
+def save_summaries(db, path: str) -> int:
+    """
+    Write the summary index under path/summaries/: one entry per
+    section, holding its extractive summary, the docstore IDs of the
+    section's chunks and their positions in db.index. A section's vector is the normalized mean
+    of its chunks' vectors, so the summary index never calls the embedding
+    model and can be rebuilt on every save; returns the number of sections.
+    """
+    directory = os.path.join(path, SUMMARIES_DIR)
+    docs = []
+    for source, section, members in sections(db):
+        chunks = [doc for _, doc in members]
+        positions = [position for position, _ in members]
+        docs.append(Document(
+            page_content=summarize(source, section, chunks),
+            metadata={
+                # A position belongs to one section only; chunks of older indexes may share or lack an "id"
+                "id": f"summary:{positions[0]}",
+                "source": source,
+                "section": section,
+                "page": chunks[0].metadata.get("page"),
+                # What hybrid_search checks db.index_to_docstore_id against
+                "ids": [db.index_to_docstore_id[position] for position in positions],
+                "positions": positions,
+            },
+        ))
+    if not docs:
+        remove_summaries(path)
+        return 0
+    texts = [doc.page_content for doc in docs]
+    vectors = []
+    for doc in docs:
+        centroid = index_vectors(db.index, doc.metadata["positions"]).mean(axis=0)
+        vectors.append((centroid / max(float(np.linalg.norm(centroid)), 1e-12)).tolist())
+    summaries = FAISS.from_embeddings(
+        list(zip(texts, vectors)),
+        db.embedding_function,
+        metadatas=[doc.metadata for doc in docs],
+        ids=[doc.metadata["id"] for doc in docs],
+    )
+    save_store(summaries, directory)
+    return len(docs)
+
+
+def has_summaries(path: str) -> bool:
+    return os.path.exists(os.path.join(path, SUMMARIES_DIR, INDEX_FILE))
+
+
+def remove_summaries(path: str):
+    shutil.rmtree(os.path.join(path, SUMMARIES_DIR), ignore_errors=True)
+
+
+def load_summaries(path: str, embeddings) -> FAISS | None:
+    """Read-only summary index of the index at path, or None if it was built without one."""
+    if not has_summaries(path):
+        return None
+    return load_store(os.path.join(path, SUMMARIES_DIR), embeddings)
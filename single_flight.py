@@ -0,0 +1,128 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Future
+
+# Identical questions asked while one is being answered wait for that answer instead of their own LLM call
+RAG_SINGLE_FLIGHT = os.getenv("RAG_SINGLE_FLIGHT", "1") == "1"
+
+
+class FlightAbandoned(Exception):
+    """The leader stopped (cancelled, or its stream was closed early) before producing a result."""
+
+
+class Flight:
+    """
+    One caller's place in a flight. A follower has .result set by
+    SingleFlight.join/ajoin. A leader runs the work inside `with flight:` and
+    hands the followers its result with publish(); leaving the block without
+    publishing fails them with the leader's exception.
+    """
+
+    def __init__(self, group: "SingleFlight", key: str, future: Future | None, leader: bool):
+        self.group = group
+        self.key = key
+        self.future = future
+        self.leader = leader
+        self.result = None
+        self.finished = future is None
+
+    def publish(self, result):
+        """Release the followers now, e.g. before a stream's consumer has read it all."""
+        self.result = result
+        self.group._finish(self, None)
+
+    def __enter__(self) -> "Flight":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.group._finish(self, exc)
+        return False
+
+
+class SingleFlight:
+    """
+    In-flight request coalescing keyed on a string. The first caller for a key
+    leads and does the work; callers with the same key that arrive before it
+    finishes get the leader's result (or exception) instead of repeating the
+    work. Nothing is kept once the leader is done, so this is not a cache.
+    Safe to share between threads and event loops: the shared result is a
+    concurrent.futures.Future, awaited through asyncio.wrap_future.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.leaders = 0
+        self.coalesced = 0
+        self._flights: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _begin(self, key: str) -> Flight:
+        if not RAG_SINGLE_FLIGHT:
+            return Flight(self, key, None, leader=True)
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                return Flight(self, key, future, leader=False)
+            future = self._flights[key] = Future()
+            return Flight(self, key, future, leader=True)
+
+    def _count(self, flight: Flight) -> Flight:
+        with self._lock:
+            self.requests += 1
+            if flight.leader:
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        return flight
+
+    def _finish(self, flight: Flight, error: BaseException | None):
+        if flight.finished:
+            return
+        flight.finished = True
+        with self._lock:
+            if self._flights.get(flight.key) is flight.future:
+                del self._flights[flight.key]
+        if error is None and flight.result is None:
+            error = FlightAbandoned()
+        if error is None:
+            flight.future.set_result(flight.result)
+        elif isinstance(error, Exception):
+            flight.future.set_exception(error)
+        else:
+            # Cancellation or an early-closed generator: followers retry rather than fail
+            flight.future.set_exception(FlightAbandoned())
+
+    def join(self, key: str) -> Flight:
+        """Lead a flight for key, or block until the one in progress finishes and return it with its result."""
+        while True:
+            flight = self._begin(key)
+            if flight.leader:
+                return self._count(flight)
+            try:
+                flight.result = flight.future.result()
+            except FlightAbandoned:
+                continue
+            return self._count(flight)
+
+    async def ajoin(self, key: str) -> Flight:
+        """Async join: waiting followers do not block the event loop."""
+        while True:
+            flight = self._begin(key)
+            if flight.leader:
+                return self._count(flight)
+            try:
+                # Shielded so one cancelled follower does not cancel the future the others share
+                flight.result = await asyncio.shield(asyncio.wrap_future(flight.future))
+            except FlightAbandoned:
+                continue
+            return self._count(flight)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "coalescing_rate": self.coalesced / self.requests if self.requests else 0.0,
+            "in_flight": len(self._flights),
+        }
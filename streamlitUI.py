@@ -1,13 +1,26 @@
 import streamlit as st
-from query_data import query_rag  # your custom RAG pipeline
+from query_data import stream_rag  # your custom RAG pipeline
+from intent_router import ASK_TOKEN
+from rag_runtime import get_runtime
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
+
+@st.cache_resource
+def load_runtime():
+    # Streamlit re-runs this script on every interaction; keep one index/LLM per server process
+    runtime = get_runtime()
+    runtime.snapshot()
+    return runtime
+
+
 st.set_page_config(page_title="RAG Chatbot", layout="centered")
 st.title("Ask Fast Automate ChatBot")
 
+load_runtime()
+
 st.markdown("""
 This assistant uses **your uploaded knowledge base** + **LLM reasoning**  
 to generate answers based only on your data.  
@@ -21,12 +34,14 @@ if st.button("Get Answer"):
     if not question.strip():
         st.warning("Please enter a valid question.")
     else:
-        with st.spinner("Querying your knowledge base + LLM..."):
-            try:
-                answer = query_rag(question)
-                st.success("✅ Answer Generated")
-                st.markdown("### 🤖 LLM Answer (RAG-based)")
-                st.write(answer)
-
-            except Exception as e:
-                st.error(f"❌ Error during RAG query:\n{e}")
+        try:
+            st.markdown("### 🤖 LLM Answer (RAG-based)")
+            # Tokens are rendered as they arrive instead of after the whole answer is ready
+            st.write_stream(
+                chunk.replace(ASK_TOKEN, "").lstrip() if i == 0 else chunk
+                for i, chunk in enumerate(stream_rag(question))
+            )
+            st.success("✅ Answer Generated")
+
+        except Exception as e:
+            st.error(f"❌ Error during RAG query:\n{e}")
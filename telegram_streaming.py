@@ -0,0 +1,66 @@
+"""
+Streams an answer into one Telegram message: the first non-blank text is sent
+as a reply, later text is written into it by edits at most once per
+EDIT_INTERVAL, and the last edit is retried until Telegram accepts it.
+"""
+import asyncio
+import os
+import time
+
+from telegram.error import BadRequest, RetryAfter
+
+from intent_router import ASK_TOKEN
+
+# Telegram allows roughly one edit per second per chat before returning 429s
+EDIT_INTERVAL = float(os.getenv("TELEGRAM_EDIT_INTERVAL", "1.0"))
+
+
+async def stream_reply(incoming, chunks) -> str:
+    """
+    Reply to the message `incoming` with the text of the async iterator `chunks`
+    as it arrives, and return the whole text. Routed replies (they contain
+    ASK_TOKEN) are not sent; the caller handles them.
+    """
+    response = ""
+    message = None
+    shown = ""
+    last_edit = 0.0
+    async for chunk in chunks:
+        response += chunk
+        if ASK_TOKEN in response:
+            continue  # routed replies arrive in one piece
+        if not response.strip():
+            continue  # Telegram rejects a blank message; wait for the first words
+
+        now = time.monotonic()
+        if message is None:
+            message = await incoming.reply_text(response)
+            shown, last_edit = response, now
+        elif now - last_edit >= EDIT_INTERVAL and response != shown:
+            last_edit = now
+            if await safe_edit(message, response):
+                shown = response
+
+    if ASK_TOKEN in response or not response.strip():
+        return response
+    # Make sure the final answer is what the user sees
+    if message is None:
+        await incoming.reply_text(response)
+    elif response != shown:
+        while not await safe_edit(message, response):
+            pass
+    return response
+
+
+async def safe_edit(message, text: str) -> bool:
+    """Edit a message, backing off when Telegram rate-limits us. Returns False if it should be retried."""
+    try:
+        await message.edit_text(text)
+    except RetryAfter as e:
+        delay = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+        await asyncio.sleep(delay)
+        return False
+    except BadRequest as e:
+        if "not modified" not in str(e).lower():
+            raise
+    return True
@@ -0,0 +1,105 @@
+import faiss
+import numpy as np
+import pytest
+from langchain.vectorstores.faiss import FAISS
+
+import ann_index
+from ann_index import IndexConfig, apply_index_config, delete_chunks, load_index, read_index_meta, write_index_meta
+from fake_embeddings import NoEmbeddings
+from faiss_store import save_store
+
+
+def _flat_db(n=2000, dim=16):
+    vectors = np.random.default_rng(0).standard_normal((n, dim)).astype(np.float32)
+    db = FAISS.from_embeddings(
+        [(f"chunk {i}", v.tolist()) for i, v in enumerate(vectors)],
+        NoEmbeddings(),
+        ids=[f"id-{i}" for i in range(n)],
+    )
+    return db, vectors
+
+
+@pytest.mark.parametrize("kind", ["ivf", "hnsw", "ivfpq"])
+def test_converted_index_is_searchable_reloadable_and_deletable(kind, tmp_path, monkeypatch):
+    monkeypatch.setattr(ann_index, "FAISS_ANN_MIN_VECTORS", 100)
+    db, vectors = _flat_db()
+    db, meta = apply_index_config(db, IndexConfig(kind=kind, nprobe=64, ef_search=128), {})
+    assert meta["index_type"] == kind and ann_index.index_kind(db.index) == kind
+
+    save_store(db, str(tmp_path))
+    write_index_meta(str(tmp_path), meta)
+    db = load_index(str(tmp_path), NoEmbeddings(), writable=True)
+    assert read_index_meta(str(tmp_path))["params"] == ann_index.search_params(db.index)
+
+    db = delete_chunks(db, ["id-3", "id-7"])
+    assert db.index.ntotal == len(db.index_to_docstore_id) == 1998
+    top = db.similarity_search_by_vector(vectors[10].tolist(), k=1)[0]
+    assert top.page_content == "chunk 10"
+    hits = db.similarity_search_by_vector(vectors[3].tolist(), k=4)
+    assert "chunk 3" not in [d.page_content for d in hits]
+
+
+def test_small_indexes_stay_flat(monkeypatch):
+    monkeypatch.setattr(ann_index, "FAISS_ANN_MIN_VECTORS", 10_000)
+    db, _ = _flat_db(n=500)
+    db, meta = apply_index_config(db, IndexConfig(kind="hnsw"), {})
+    assert meta["index_type"] == "flat" and meta["requested"]["kind"] == "hnsw"
+    assert ann_index.resolve_config(meta).kind == "hnsw"
+
+
+@pytest.mark.parametrize(
+    "kind, codec, reduce",
+    [("flat", "float16", "none"), ("flat", "int8", "pca"), ("hnsw", "int8", "truncate"), ("ivf", "float16", "pca")],
+)
+def test_compressed_layouts_take_full_size_queries(kind, codec, reduce, tmp_path, monkeypatch):
+    monkeypatch.setattr(ann_index, "FAISS_ANN_MIN_VECTORS", 100)
+    db, vectors = _flat_db()
+    config = IndexConfig(kind=kind, codec=codec, reduce=reduce, reduce_dim=12, nprobe=64, ef_search=128)
+    db, meta = apply_index_config(db, config, {})
+    assert (meta["index_type"], meta["codec"], meta["reduce"]) == (kind, codec, reduce)
+
+    save_store(db, str(tmp_path))
+    write_index_meta(str(tmp_path), meta)
+    reader = load_index(str(tmp_path), NoEmbeddings())
+    assert reader.index.d == 16
+    hits = [reader.similarity_search_by_vector(vectors[i].tolist(), k=1)[0].page_content for i in range(50)]
+    assert sum(h == f"chunk {i}" for i, h in enumerate(hits)) >= 45
+
+    db = delete_chunks(load_index(str(tmp_path), NoEmbeddings(), writable=True), ["id-5"])
+    assert ann_index.index_layout(db.index) == {"kind": kind, "codec": codec, "reduce": reduce, "reduce_dim": 12 if reduce != "none" else 0}
+    assert db.similarity_search_by_vector(vectors[6].tolist(), k=1)[0].page_content == "chunk 6"
+
+
+def _stored_codes(index) -> dict[int, bytes]:
+    """Position -> the bytes index stores for it."""
+    index = ann_index._base(index)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, faiss.IndexIVF):
+        codes, invlists = {}, index.invlists
+        for list_no in range(index.nlist):
+            size = invlists.list_size(list_no)
+            if size:
+                ids = faiss.rev_swig_ptr(invlists.get_ids(list_no), size)
+                data = faiss.rev_swig_ptr(invlists.get_codes(list_no), size * invlists.code_size)
+                rows = data.reshape(size, invlists.code_size)
+                codes.update({int(p): rows[j].tobytes() for j, p in enumerate(ids)})
+        return codes
+    data = faiss.vector_to_array(index.codes).reshape(index.ntotal, index.code_size)
+    return {p: data[p].tobytes() for p in range(index.ntotal)}
+
+
+@pytest.mark.parametrize(
+    "kind, codec, reduce",
+    [("ivfpq", "float32", "none"), ("ivf", "int8", "none"), ("hnsw", "int8", "none"), ("flat", "int8", "pca")],
+)
+def test_delete_keeps_the_stored_codes_of_the_other_vectors(kind, codec, reduce, monkeypatch):
+    monkeypatch.setattr(ann_index, "FAISS_ANN_MIN_VECTORS", 100)
+    db, _ = _flat_db()
+    db, _ = apply_index_config(db, IndexConfig(kind=kind, codec=codec, reduce=reduce, reduce_dim=12), {})
+    before = _stored_codes(db.index)
+    db = delete_chunks(db, ["id-3", "id-1500"])
+    after = _stored_codes(db.index)
+    kept = [p for p in range(2000) if p not in (3, 1500)]
+    assert len(after) == 1998 and all(after[i] == before[p] for i, p in enumerate(kept))
+    assert [db.index_to_docstore_id[i] for i in (3, 1499)] == ["id-4", "id-1501"]
@@ -0,0 +1,47 @@
+import time
+
+import numpy as np
+
+from answer_cache import AnswerCache
+from get_embading_function import SIMILARITY_THRESHOLDS
+
+
+def make_cache(tmp_path, **kwargs):
+    kwargs.setdefault("threshold", SIMILARITY_THRESHOLDS["openai"].same_question)
+    return AnswerCache(path=str(tmp_path / "cache.sqlite3"), **kwargs)
+
+
+def test_semantic_hit_and_miss(tmp_path):
+    cache = make_cache(tmp_path, threshold=0.9)
+    cache.store("what is primeleads", [1.0, 0.0, 0.0], "Lead generation.", ["kb:1"], "v1")
+
+    hit = cache.lookup([0.99, 0.05, 0.0], "v1")
+    assert hit is not None and hit.answer == "Lead generation."
+    assert cache.lookup([0.0, 1.0, 0.0], "v1") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_new_index_version_invalidates(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.store("q", [1.0, 0.0], "a", [], "v1")
+    assert cache.lookup_exact("q", "v1") is not None
+    assert cache.lookup_exact("q", "v2") is None
+
+
+def test_lru_eviction_and_ttl(tmp_path):
+    cache = make_cache(tmp_path, max_entries=2, ttl=0.05)
+    cache.store("a", [1.0, 0.0, 0.0], "A", [], "v1")
+    cache.store("b", [0.0, 1.0, 0.0], "B", [], "v1")
+    cache.lookup_exact("a", "v1")  # "b" is now least recently used
+    cache.store("c", [0.0, 0.0, 1.0], "C", [], "v1")
+    assert cache.lookup_exact("b", "v1") is None
+    assert cache.stats()["evictions"] == 1
+
+    time.sleep(0.06)
+    assert cache.lookup_exact("a", "v1") is None
+
+
+def test_persists_across_restarts(tmp_path):
+    make_cache(tmp_path).store("q", np.array([0.6, 0.8]), "a", ["kb:2"], "v1")
+    entry = make_cache(tmp_path).lookup([0.6, 0.8], "v1")
+    assert entry is not None and entry.sources == ["kb:2"]
@@ -0,0 +1,50 @@
+import time
+
+from langchain_openai import OpenAIEmbeddings
+
+from batch_embedder import BatchEmbedder, RateLimiter, make_batches
+from fake_openai_server import FakeOpenAIServer, fake_embedding
+
+
+def fake_server_embeddings(server):
+    # max_retries=0 so retrying is left to BatchEmbedder
+    return OpenAIEmbeddings(
+        base_url=server.base_url, api_key="sk-fake", check_embedding_ctx_length=False, max_retries=0
+    )
+
+
+def test_make_batches_respects_token_and_size_budgets():
+    assert make_batches([5, 5, 5, 20, 1], max_tokens=10, max_size=10) == [[0, 1], [2], [3], [4]]
+    assert make_batches([1] * 5, max_tokens=100, max_size=2) == [[0, 1], [2, 3], [4]]
+
+
+def test_rate_limiter_blocks_when_requests_run_out():
+    limiter = RateLimiter(rpm=600, tpm=10**6)  # 10 requests/s once the bucket is empty
+    for _ in range(600):
+        limiter.acquire(1)
+    start = time.perf_counter()
+    limiter.acquire(1)
+    assert time.perf_counter() - start >= 0.05
+
+
+def test_embeds_all_texts_in_concurrent_batches():
+    server = FakeOpenAIServer(0, embedding_latency=0.05).start()
+    try:
+        embedder = BatchEmbedder(fake_server_embeddings(server), batch_tokens=40, concurrency=4)
+        texts = [f"chunk number {i} about PrimeLeads" for i in range(40)]
+        vectors = embedder.embed_documents(texts)
+        assert [round(v[0], 5) for v in vectors] == [round(float(fake_embedding(t)[0]), 5) for t in texts]
+        assert server.embedding_calls == embedder.batches > 1
+    finally:
+        server.shutdown()
+
+
+def test_retries_rate_limited_batches():
+    server = FakeOpenAIServer(0, embedding_latency=0).start()
+    server.rate_limit_next = 2
+    try:
+        embedder = BatchEmbedder(fake_server_embeddings(server), concurrency=1)
+        assert len(embedder.embed_documents(["a", "b"])) == 2
+        assert embedder.retries == 2
+    finally:
+        server.shutdown()
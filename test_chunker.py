@@ -0,0 +1,60 @@
+from langchain.schema.document import Document
+
+from chunker import is_heading, iter_chunks, page_blocks
+from token_utils import count_tokens
+
+SECTION = "\n".join(
+    [
+        "2. The Primius.ai Platform",
+        "Primius.ai is FastAutomate's flagship AI automation platform, previously known as",
+        "PrimeFlow, and represents the culmination of the company's research.",
+        "• Intelligent RPA for rules-driven, high-accuracy process",
+        "execution.",
+        "• Agentic AI for decision-making and adaptive workflow logic.",
+    ]
+)
+
+
+def _page(text, page, source="data/kb.pdf"):
+    return Document(page_content=text, metadata={"source": source, "page": page})
+
+
+def test_page_blocks_join_wrapped_lines_under_headings_and_bullets():
+    blocks = list(page_blocks(_page(SECTION, 0)))
+    assert [b.kind for b in blocks] == ["heading", "text", "item", "item"]
+    assert blocks[2].text.endswith("process\nexecution.")
+    assert is_heading("3.2 Creating a New ICP") and is_heading("Core Differentiators")
+    assert not is_heading("1. Click Knowledge Base in sidebar.") and not is_heading("User Story:")
+    assert is_heading("## Proof Points") and is_heading("== PrimeCRM ==")
+
+
+def test_chunks_start_at_headings_and_span_pages_with_provenance():
+    intro = "1. Introduction\n" + "FastAutomate builds no-code automation for revenue teams. " * 8
+    pages = [_page(intro, 0), _page(SECTION, 1), _page("Pricing is per seat.", 2)]
+    chunks = list(iter_chunks(pages, chunk_tokens=150, overlap_tokens=0))
+
+    assert chunks[1].page_content.startswith("2. The Primius.ai Platform")
+    assert (chunks[1].metadata["page"], chunks[1].metadata["page_end"]) == (1, 2)
+    assert all(count_tokens(c.page_content) <= 150 for c in chunks)
+
+
+def test_oversized_blocks_are_split_and_sources_never_mix():
+    long_paragraph = "Overview\n" + " ".join(f"Sentence number {i} about PrimeVision." for i in range(80))
+    pages = [_page(long_paragraph, 0), _page(SECTION, 0, source="data/other.pdf")]
+    chunks = list(iter_chunks(pages, chunk_tokens=60, overlap_tokens=0))
+
+    assert len(chunks) > 4 and all(count_tokens(c.page_content) <= 62 for c in chunks)
+    assert {c.metadata["source"] for c in chunks[-1:]} == {"data/other.pdf"}
+    assert all("Primius" not in c.page_content for c in chunks if c.metadata["source"] == "data/kb.pdf")
+
+
+def test_iter_chunks_streams_pages_lazily():
+    consumed = []
+
+    def pages():
+        for i in range(1000):
+            consumed.append(i)
+            yield _page(f"Section {i}\n" + "Text about workflows and leads. " * 20, i)
+
+    first = next(iter_chunks(pages(), chunk_tokens=200))
+    assert first.metadata["page"] == 0 and len(consumed) < 5
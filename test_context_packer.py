@@ -0,0 +1,55 @@
+from langchain.schema.document import Document
+
+from context_packer import deduplicate, merge_adjacent, overlap, pack_context
+from hybrid_search import Candidate
+
+PAGE = (
+    "PrimeVision records a business process once and turns it into a self-healing workflow. "
+    "It reads invoices, purchase orders and forms, validates every field against your ERP, "
+    "and hands exceptions to a human reviewer with the document already annotated."
+)
+
+
+def _doc(text, chunk_id, source="data/kb.pdf", page=0):
+    return Document(page_content=text, metadata={"source": source, "page": page, "id": chunk_id})
+
+
+def test_merge_adjacent_joins_overlapping_chunks_of_one_page():
+    first, second = _doc(PAGE[:140], "kb:0:a"), _doc(PAGE[100:], "kb:0:b")
+    assert overlap(first.page_content, second.page_content) == 40
+
+    # Ranked second-before-first: the merged chunk keeps the better rank and reads in page order
+    other = _doc("Pricing is per seat.", "pricing:0:c", source="data/pricing.pdf")
+    merged = merge_adjacent([second, other, first])
+    assert [d.page_content for d in merged] == [PAGE, other.page_content]
+    assert merged[0].metadata["ids"] == ["kb:0:a", "kb:0:b"]
+
+    # Same text on another page is not joined
+    assert len(merge_adjacent([first, _doc(PAGE[100:], "kb:1:b", page=1)])) == 2
+
+
+def test_deduplicate_keeps_the_better_ranked_copy():
+    copy = _doc(PAGE.upper() + " Contact sales.", "copy:0:x", source="data/kb (1).pdf")
+    distinct = _doc("PrimeCRM deduplicates and enriches CRM records.", "crm:0:y")
+    assert [d.metadata["id"] for d in deduplicate([_doc(PAGE, "kb:0:a"), copy, distinct])] == ["kb:0:a", "crm:0:y"]
+
+
+def test_pack_context_drops_irrelevant_chunks_and_respects_budget():
+    candidates = [
+        Candidate(_doc(PAGE, "kb:0:a"), 0.85, None),
+        Candidate(_doc("Unrelated footer text " * 5, "kb:2:f", page=2), 0.60, None),
+        Candidate(_doc("PrimeReachOut books meetings.", "reach:0:r", source="data/reach.pdf"), None, 1, 0.9),
+        # BM25 found it through one common word of the question
+        Candidate(_doc("Export the list of leads.", "list:0:l", source="data/leads.pdf"), None, 2, 0.2),
+    ]
+    packed = pack_context(candidates, budget=1000, min_similarity=0.75)
+    assert [d.metadata["id"] for d in packed] == ["kb:0:a", "reach:0:r"]
+
+    # Only the best chunk fits: it is truncated rather than dropped
+    packed = pack_context(candidates, budget=10, min_similarity=0.75)
+    assert len(packed) == 1 and PAGE.startswith(packed[0].page_content) and packed[0].page_content
+
+
+def test_pack_context_is_empty_when_nothing_is_relevant():
+    candidates = [Candidate(_doc(PAGE, "kb:0:a"), 0.70, None)]
+    assert pack_context(candidates, min_similarity=0.75) == []
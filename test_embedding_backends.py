@@ -0,0 +1,149 @@
+import importlib.util
+
+import numpy as np
+import pytest
+from langchain.vectorstores.faiss import FAISS
+
+from ann_index import IndexConfig, apply_index_config, load_index, write_index_meta
+import get_embading_function
+from embedding_backends import LocalEmbeddings
+from faiss_store import save_store
+from get_embading_function import (
+    SIMILARITY_THRESHOLDS,
+    EmbeddingMismatchError,
+    embedding_identity,
+    get_embedding_function,
+    similarity_thresholds,
+)
+from rag_runtime import RagRuntime
+
+
+def test_hash_backend_is_deterministic_and_unit_length():
+    first, second = get_embedding_function("hash"), get_embedding_function("hash")
+    vector = np.array(first.embed_query("How does PrimeVision work?"))
+    assert np.allclose(vector, second.embed_documents(["How does PrimeVision work?"])[0])
+    assert np.isclose(np.linalg.norm(vector), 1.0)
+
+
+def test_hash_vectors_match_their_model_version(monkeypatch):
+    # A failure here means stored hash vectors change: bump HASH_EMBEDDING_VERSION with the new buckets
+    monkeypatch.setattr("intent_router.FEATURE_DIM", 64)  # the intent router's features are not used
+    vector = np.array(get_embedding_function("hash").embed_query("Lead scoring"))
+    buckets = [215, 413, 459, 714, 787, 810, 879, 892, 950, 1402, 1432, 1918, 1927, 2004]
+    assert get_embedding_function("hash").model == "hashed-ngrams-2048-v1"
+    assert np.nonzero(vector)[0].tolist() == buckets
+    assert np.allclose(vector[buckets], 1 / np.sqrt(len(buckets)))
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="EMBEDDING_BACKEND"):
+        get_embedding_function("word2vec")
+
+
+@pytest.mark.skipif(importlib.util.find_spec("onnxruntime") is not None, reason="onnxruntime is installed")
+def test_local_backend_names_its_missing_dependencies():
+    with pytest.raises(ImportError, match="onnxruntime"):
+        LocalEmbeddings()
+
+
+class _Encoding:
+    def __init__(self, text, width):
+        words = text.split()
+        self.ids = [len(w) for w in words] + [0] * (width - len(words))
+        self.attention_mask = [1] * len(words) + [0] * (width - len(words))
+
+
+class _Tokenizer:
+    """Whitespace tokens, padded to the longest text of the batch like the real tokenizer."""
+
+    def encode_batch(self, texts):
+        width = max(len(t.split()) for t in texts)
+        return [_Encoding(t, width) for t in texts]
+
+
+class _Session:
+    """Token id i becomes the hidden state [i, 1]; padding positions hold noise pooling must ignore."""
+
+    def __init__(self):
+        self.batches = []
+
+    def run(self, outputs, feeds):
+        ids, mask = feeds["input_ids"], feeds["attention_mask"]
+        self.batches.append(ids.shape)
+        hidden = np.stack([ids, np.ones_like(ids)], axis=-1).astype(np.float32)
+        return [np.where(mask[..., None] == 1, hidden, 100.0)]
+
+
+def _local_embeddings(batch_size):
+    embeddings = LocalEmbeddings.__new__(LocalEmbeddings)
+    embeddings.model = "sentence-transformers/all-MiniLM-L6-v2"
+    embeddings.batch_size = batch_size
+    embeddings.tokenizer = _Tokenizer()
+    embeddings.session = _Session()
+    embeddings._input_names = {"input_ids", "attention_mask"}
+    return embeddings
+
+
+def test_local_backend_mean_pools_and_batches_by_length():
+    embeddings = _local_embeddings(batch_size=2)
+    texts = ["aaa bbbbb c", "dd", "eeee ff", "g"]
+    vectors = np.array(embeddings.embed_documents(texts))
+
+    # Padding is left out of the mean, and every vector has unit length
+    expected = np.array([[3, 1], [2, 1], [3, 1], [1, 1]], dtype=float)
+    expected /= np.linalg.norm(expected, axis=1, keepdims=True)
+    assert np.allclose(vectors, expected)
+    # The two shortest texts share a batch, the two longest the next one; results keep input order
+    assert embeddings.session.batches == [(2, 1), (2, 3)]
+    assert np.allclose(embeddings.embed_query("dd"), vectors[1])
+
+
+def test_similarity_thresholds_follow_the_backend(monkeypatch):
+    for name in ("ANSWER_CACHE_THRESHOLD", "RAG_MIN_SIMILARITY", "ROUTE_FAST_MIN_SIMILARITY"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("API_KEY", "sk-test")
+    assert similarity_thresholds(get_embedding_function("hash")) == SIMILARITY_THRESHOLDS["hash"]
+    assert similarity_thresholds(get_embedding_function("openai")) == SIMILARITY_THRESHOLDS["openai"]
+    assert similarity_thresholds(_local_embeddings(batch_size=2)) == SIMILARITY_THRESHOLDS["local"]
+
+    monkeypatch.setenv("RAG_MIN_SIMILARITY", "0.5")
+    thresholds = similarity_thresholds(get_embedding_function("hash"))
+    assert thresholds.relevant == 0.5 and thresholds.same_question == SIMILARITY_THRESHOLDS["hash"].same_question
+
+
+def test_index_records_its_backend_and_refuses_others(tmp_path, monkeypatch):
+    monkeypatch.setenv("API_KEY", "sk-test")  # the OpenAI client is built, never called
+    embeddings = get_embedding_function("hash")
+    db = FAISS.from_texts(["PrimeVision automates documents.", "PrimeLeads scores leads."], embeddings)
+    db, meta = apply_index_config(db, IndexConfig(), {})
+    save_store(db, str(tmp_path))
+    write_index_meta(str(tmp_path), meta)
+    assert meta["embedding"] == embedding_identity(embeddings) == {"backend": "hash", "model": "hashed-ngrams-2048-v1"}
+
+    assert load_index(str(tmp_path), get_embedding_function("hash")).index.ntotal == 2
+    with pytest.raises(EmbeddingMismatchError, match="EMBEDDING_BACKEND=hash"):
+        load_index(str(tmp_path), get_embedding_function("openai"))
+
+
+def test_a_reload_onto_other_embeddings_keeps_the_current_index(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")  # the chat models are built, never called
+    monkeypatch.setattr(get_embading_function, "EMBEDDING_BACKEND", "hash")
+    embeddings = get_embedding_function("hash")
+    db = FAISS.from_texts(["PrimeVision automates documents."], embeddings)
+    db, meta = apply_index_config(db, IndexConfig(), {})
+    save_store(db, str(tmp_path))
+    write_index_meta(str(tmp_path), meta)
+    runtime = RagRuntime(str(tmp_path))
+    served = runtime.snapshot()
+
+    # Rebuilt by a writer configured for another backend
+    meta["embedding"] = {"backend": "openai", "model": "text-embedding-ada-002"}
+    write_index_meta(str(tmp_path), meta)
+    db.add_texts(["PrimeLeads scores leads."])
+    save_store(db, str(tmp_path))
+    runtime._reload()
+    assert runtime.snapshot() is served and runtime.reloads == 1
+
+    # Without an index to fall back on, the mismatch is an error
+    with pytest.raises(EmbeddingMismatchError):
+        RagRuntime(str(tmp_path)).snapshot()
@@ -0,0 +1,27 @@
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+from fake_embeddings import CountingEmbeddings
+
+
+def test_unchanged_text_is_never_re_embedded(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first = CountingEmbeddings()
+    assert CachedEmbeddings(first, EmbeddingCache(path)).embed_documents(["a", "bb", "a"]) == [
+        [1.0, 1.0], [2.0, 1.0], [1.0, 1.0]
+    ]
+    assert first.calls == [["a", "bb"]]
+
+    # A fresh process (e.g. after --reset) finds everything on disk
+    second = CountingEmbeddings()
+    cached = CachedEmbeddings(second, EmbeddingCache(path))
+    assert cached.embed_documents(["bb", "a"]) == [[2.0, 1.0], [1.0, 1.0]]
+    assert second.calls == []
+    assert cached.cache.stats()["hits"] == 2
+
+
+def test_eviction_keeps_cache_under_budget(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), max_mb=100 / (1024 * 1024))
+    for i in range(10):
+        cache.put_many("m", {f"h{i}": [0.0] * 8})  # 32 bytes each
+    stats = cache.stats()
+    assert stats["entries"] == 3 and stats["evictions"] == 7
+    assert cache.get_many("m", ["h9"]) and not cache.get_many("m", ["h0"])
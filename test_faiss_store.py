@@ -0,0 +1,110 @@
+import os
+
+import numpy as np
+from langchain.schema.document import Document
+from langchain.vectorstores.faiss import FAISS
+
+from ann_index import read_index_meta, resolve_config, write_index_meta
+from fake_embeddings import NoEmbeddings
+from faiss_store import (
+    CURRENT_FILE,
+    VERSIONS_DIR,
+    PositionMap,
+    SqliteDocstore,
+    current_store,
+    load_store,
+    save_store,
+    store_files,
+)
+from lexical_index import LexicalIndex
+from populate_db import save_index, sync_lexical_index
+from product_scope import ProductPartitions, tag_chunks
+from section_summaries import load_summaries
+
+
+def _db(texts, vectors):
+    return FAISS.from_embeddings(
+        [(t, v.tolist()) for t, v in zip(texts, vectors)],
+        NoEmbeddings(),
+        metadatas=[{"source": "data/a.pdf", "page": i} for i in range(len(texts))],
+        ids=[f"id-{i}" for i in range(len(texts))],
+    )
+
+
+def test_pickle_index_is_converted_and_loaded_lazily(tmp_path):
+    path = str(tmp_path)
+    vectors = np.random.default_rng(0).standard_normal((50, 8)).astype(np.float32)
+    _db([f"chunk {i}" for i in range(50)], vectors).save_local(path)
+    assert store_files(path) == ("index.faiss", "index.pkl")
+
+    save_store(load_store(path, NoEmbeddings()), path)
+    assert store_files(path) == ("index.faiss", "docstore.sqlite3")
+    assert not os.path.exists(os.path.join(path, "index.pkl"))
+
+    db = load_store(path, NoEmbeddings())
+    assert isinstance(db.docstore, SqliteDocstore) and isinstance(db.index_to_docstore_id, PositionMap)
+    top = db.similarity_search_by_vector(vectors[7].tolist(), k=1)[0]
+    assert (top.page_content, top.metadata["page"], top.id) == ("chunk 7", 7, "id-7")
+
+
+def test_loaded_snapshot_survives_a_rewrite(tmp_path):
+    path = str(tmp_path)
+    vectors = np.random.default_rng(1).standard_normal((20, 8)).astype(np.float32)
+    save_store(_db([f"old {i}" for i in range(20)], vectors), path)
+    old = load_store(path, NoEmbeddings())
+
+    save_store(_db([f"new {i}" for i in range(20)], vectors[::-1].copy()), path)
+    assert old.similarity_search_by_vector(vectors[3].tolist(), k=1)[0].page_content == "old 3"
+    new = load_store(path, NoEmbeddings())
+    assert new.similarity_search_by_vector(vectors[3].tolist(), k=1)[0].page_content == "new 16"
+
+
+def _tagged_db(texts, vectors):
+    chunks = tag_chunks([
+        Document(page_content=text, metadata={"id": f"id-{i}", "source": "data/a.pdf", "section": "3.2 PrimeLeads"})
+        for i, text in enumerate(texts)
+    ])
+    return FAISS.from_embeddings(
+        [(c.page_content, v.tolist()) for c, v in zip(chunks, vectors)],
+        NoEmbeddings(),
+        metadatas=[c.metadata for c in chunks],
+        ids=[c.metadata["id"] for c in chunks],
+    )
+
+
+def test_each_save_is_a_complete_version_switched_to_in_one_rename(tmp_path):
+    path = str(tmp_path)
+    vectors = np.random.default_rng(2).standard_normal((12, 8)).astype(np.float32)
+    # An index saved before versioning kept every file in faiss_index/ itself
+    legacy = _tagged_db([f"PrimeLeads old {i}" for i in range(12)], vectors)
+    save_store(legacy, path)
+    write_index_meta(path, {"index_type": "flat"})
+    sync_lexical_index(legacy, path)
+    assert current_store(path) == path
+
+    save_index(legacy, path, resolve_config({}), {})
+    first = current_store(path)
+    assert sorted(os.listdir(path)) == [CURRENT_FILE, VERSIONS_DIR]
+    assert {"index.faiss", "docstore.sqlite3", "index_meta.json", "lexical.sqlite3", "partitions", "summaries"} <= set(
+        os.listdir(first)
+    )
+    reader = load_store(first, NoEmbeddings())
+
+    db = _tagged_db([f"PrimeLeads new {i}" for i in range(10)], vectors[:10])
+    save_index(db, path, resolve_config({}), {})
+    second = current_store(path)
+    save_index(db, path, resolve_config({}), {})
+    third = current_store(path)
+    # The version just replaced stays for readers that resolved CURRENT before the swap
+    assert sorted(os.listdir(os.path.join(path, VERSIONS_DIR))) == sorted(
+        [os.path.basename(second), os.path.basename(third)]
+    )
+    assert reader.similarity_search_by_vector(vectors[3].tolist(), k=1)[0].page_content == "PrimeLeads old 3"
+
+    # Every part of the current version describes the same chunks
+    ids = {f"id-{i}" for i in range(10)}
+    assert set(load_store(third, NoEmbeddings()).index_to_docstore_id.values()) == ids
+    assert LexicalIndex.open(third).ids() == ids
+    assert set(ProductPartitions.open(third, nprobe=1, ef_search=16).ids["primeleads"]) == ids
+    assert load_summaries(third, NoEmbeddings()).index.ntotal == 1
+    assert read_index_meta(third)["index_type"] == "flat"
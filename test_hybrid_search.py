@@ -0,0 +1,89 @@
+import numpy as np
+from langchain.vectorstores.faiss import FAISS
+
+import hybrid_search
+from context_packer import pack_context
+from fake_embeddings import NoEmbeddings
+from lexical_index import LexicalIndex, match_query, term_coverage
+from rag_runtime import IndexSnapshot
+
+TEXTS = [
+    "PrimeVision records the screen once and turns it into a self-healing workflow.",
+    "PrimeLeads scores and ranks leads from your ideal customer profile.",
+    "PrimeReachOut sends personalized outreach and books meetings.",
+    "Pricing is per seat with a free trial for every product.",
+]
+
+
+def _db(texts):
+    vectors = np.random.default_rng(0).standard_normal((len(texts), 8)).astype(np.float32)
+    db = FAISS.from_embeddings(
+        [(t, v.tolist()) for t, v in zip(texts, vectors)],
+        NoEmbeddings(),
+        metadatas=[{"id": f"c{i}"} for i in range(len(texts))],
+        ids=[f"c{i}" for i in range(len(texts))],
+    )
+    return db, vectors
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = hybrid_search.reciprocal_rank_fusion([["a", "b", "c"], ["d", "b", "e"]])
+    assert [key for key, _ in fused][:3] == ["b", "a", "d"]
+    assert {key for key, _ in fused} == {"a", "b", "c", "d", "e"}
+
+
+def test_match_query_quotes_terms_and_drops_stopwords():
+    assert match_query('What is "PrimeVision"?') == '"primevision"'
+    assert match_query("what is it") == ""
+    assert match_query("What's the plan you'll offer?") == '"plan" OR "offer"'
+
+
+def test_lexical_sync_is_incremental(tmp_path):
+    db, _ = _db(TEXTS)
+    lexical = LexicalIndex(str(tmp_path))
+    assert lexical.sync(db) == (4, 0)
+    assert lexical.sync(db) == (0, 0)
+    assert lexical.search("How does PrimeVision work?", 3)[0][0] == "c0"
+
+    db.delete(["c0"])
+    assert lexical.sync(db) == (0, 1)
+    assert lexical.search("PrimeVision", 3) == []
+    assert lexical.sync(None) == (0, 3)
+
+
+def test_hybrid_search_surfaces_exact_name_matches(tmp_path):
+    db, vectors = _db(TEXTS)
+    lexical = LexicalIndex(str(tmp_path))
+    lexical.sync(db)
+
+    # The query vector is nearest to the pricing chunk; the name only matches lexically
+    docs = hybrid_search.search(IndexSnapshot("test", db, None, LexicalIndex.open(str(tmp_path))), "What is PrimeVision?", vectors[3].tolist(), k=2)
+    assert {d.metadata["id"] for d in docs} == {"c0", "c3"}
+
+    dense_only = hybrid_search.search(IndexSnapshot("test", db, None), "What is PrimeVision?", vectors[3].tolist(), k=2)
+    assert dense_only[0].metadata["id"] == "c3" and len(dense_only) == 2
+
+
+def test_off_topic_questions_do_not_pass_on_one_shared_word(tmp_path):
+    texts = TEXTS + [
+        "Export the shortlist as a list of leads, sorted by score.",
+        "Tell us about your ideal customer and we build the profile.",
+    ]
+    db, vectors = _db(texts)
+    LexicalIndex(str(tmp_path)).sync(db)
+    lexical = LexicalIndex.open(str(tmp_path))
+    snapshot = IndexSnapshot("test", db, None, lexical)
+
+    weights = lexical.term_weights("Can you write me a python script to sort a list?")
+    assert set(weights) == {"write", "python", "script", "sort", "list"}
+    assert weights["python"] > weights["list"]
+    assert term_coverage(weights, texts[4]) < 0.4
+
+    # No dense hit is close enough here, so only the BM25 gate decides
+    for question in ["Tell me a joke about cats", "Can you write me a python script to sort a list?"]:
+        candidates = hybrid_search.search_scored(snapshot, question, vectors[0].tolist())
+        assert any(c.lexical_rank for c in candidates)
+        assert pack_context(candidates, min_similarity=1.01) == []
+
+    candidates = hybrid_search.search_scored(snapshot, "How do I export the leads shortlist?", vectors[0].tolist())
+    assert [d.metadata["id"] for d in pack_context(candidates, min_similarity=1.01)] == ["c4"]
@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+from langchain.schema.document import Document
+from langchain.vectorstores.faiss import FAISS
+
+import populate_db
+from fake_embeddings import CountingEmbeddings, NoEmbeddings
+from faiss_store import current_store, load_store
+from ingest_manifest import IngestManifest
+
+
+def test_diff_detects_added_modified_touched_and_removed(tmp_path):
+    index_path = tmp_path / "faiss_index"
+    a, b, c = (tmp_path / name for name in ("a.pdf", "b.pdf", "c.pdf"))
+    for f in (a, b, c):
+        f.write_bytes(b"%PDF " + f.name.encode())
+
+    manifest = IngestManifest(str(index_path))
+    assert manifest.diff([str(a), str(b), str(c)])["added"] == [str(a), str(b), str(c)]
+    for f in (a, b, c):
+        manifest.record(str(f), [f"{f.name}:0:x"])
+    manifest.save()
+
+    b.write_bytes(b"%PDF edited")
+    os.utime(c, ns=(0, 123))  # touched, same bytes
+    changes = IngestManifest(str(index_path)).diff([str(a), str(b)] + [str(c)])
+    assert changes["modified"] == [str(b)]
+    assert changes["unchanged"] == [str(a), str(c)]
+
+    changes = IngestManifest(str(index_path)).diff([str(a)])
+    assert sorted(changes["removed"]) == [str(b), str(c)]
+
+
+def test_diff_reports_files_chunked_with_other_settings_as_modified(tmp_path):
+    a = tmp_path / "a.pdf"
+    a.write_bytes(b"%PDF a")
+    manifest = IngestManifest(str(tmp_path / "faiss_index"))
+    manifest.record(str(a), ["a.pdf:0:x"], chunker="structured:200:20")
+
+    assert manifest.diff([str(a)], chunker="structured:200:20")["unchanged"] == [str(a)]
+    assert manifest.diff([str(a)], chunker="structured:300:20")["modified"] == [str(a)]
+
+
+def test_a_normal_run_drops_chunks_indexed_under_legacy_keys(tmp_path, monkeypatch, capsys):
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "a.pdf").write_bytes(b"%PDF a")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("sys.argv", ["populate_db.py"])
+    embeddings = CountingEmbeddings()
+    monkeypatch.setattr(populate_db, "get_embedding_function", lambda: embeddings)
+    pages = [Document(page_content="PrimeLeads scores and ranks leads.", metadata={"source": "data/a.pdf", "page": 0})]
+    monkeypatch.setattr(populate_db, "load_documents", lambda paths: pages)
+
+    # Built before the manifest, with UUID keys; b.pdf has been deleted since
+    rows = [("PrimeLeads scores leads.", "data\\a.pdf"), ("Old pricing.", "data/b.pdf")]
+    vectors = np.random.default_rng(0).standard_normal((len(rows), 2)).astype(np.float32)
+    FAISS.from_embeddings(
+        [(text, v.tolist()) for (text, _), v in zip(rows, vectors)],
+        NoEmbeddings(),
+        metadatas=[{"source": source, "page": 0} for _, source in rows],
+        ids=["uuid-0", "uuid-1"],
+    ).save_local("faiss_index")
+
+    populate_db.main()
+    db = load_store(current_store("faiss_index"), NoEmbeddings(), writable=True)
+    manifest = IngestManifest("faiss_index")
+    assert sorted(db.docstore._dict) == sorted(manifest.files["data/a.pdf"]["chunk_ids"] + ["uuid-1"])
+    assert "1 indexed chunks belong to no PDF in data/; `populate_db.py --vacuum` drops them" in capsys.readouterr().out
+
+    populate_db.main()
+    assert "No new or modified PDFs" in capsys.readouterr().out
@@ -0,0 +1,34 @@
+from intent_router import ASK_TOKEN, GREETING, PRIMELEADS, PRIMEREACHOUT, route_intent
+
+
+def test_greetings_are_routed():
+    for text in ["hi", "Hello!", "good morning", "hey there, how are you"]:
+        route = route_intent(text)
+        assert route is not None and route.intent == GREETING, text
+
+
+def test_primeleads_request_asks_for_url():
+    route = route_intent("Please use PrimeLeads on our website")
+    assert route.intent == PRIMELEADS
+    assert ASK_TOKEN in route.reply
+
+
+def test_outreach_is_handed_to_primereachout():
+    route = route_intent("email these leads and schedule calls with them")
+    assert route is not None and route.intent == PRIMEREACHOUT
+
+
+def test_kb_questions_fall_through():
+    for text in ["What does PrimeLeads do?", "Can PrimeLeads send emails?", "How do I use PrimeLeads?", ""]:
+        assert route_intent(text) is None, text
+
+
+def test_questions_that_mention_an_action_fall_through():
+    for text in [
+        "Can I use PrimeLeads for recruiting?",
+        "Should I use PrimeLeads or PrimeRecruits?",
+        "Is it possible to use PrimeLeads without a website?",
+        "Send me the pricing pdf",
+    ]:
+        assert route_intent(text) is None, text
+    assert route_intent("can you run primeleads for me").intent == PRIMELEADS
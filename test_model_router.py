@@ -0,0 +1,84 @@
+import pytest
+from langchain.schema.document import Document
+
+import model_router
+from get_embading_function import SIMILARITY_THRESHOLDS
+from hybrid_search import Candidate
+from model_router import (
+    FAST,
+    STRONG,
+    ModelRouter,
+    QuestionFeatures,
+    choose_model,
+    escalate,
+    question_features,
+    unsure_opening,
+)
+
+# Features and similarities on text-embedding-ada-002's scale
+CONFIDENT_SIMILARITY = SIMILARITY_THRESHOLDS["openai"].confident
+CONFIDENT = dict(tokens=8, products=1, simple_form=True, hard_terms=False, best_similarity=0.9, lexical_agrees=False)
+
+
+@pytest.mark.parametrize("changes, tier, reason", [
+    ({}, FAST, "short factual question"),
+    ({"best_similarity": 0.78, "lexical_agrees": True}, FAST, "short factual question"),
+    ({"best_similarity": 0.78}, STRONG, "low retrieval confidence"),
+    ({"best_similarity": None}, STRONG, "low retrieval confidence"),
+    ({"hard_terms": True}, STRONG, "asks for reasoning or advice"),
+    ({"products": 2}, STRONG, "spans 2 products"),
+    ({"tokens": 60}, STRONG, "long question (60 tokens)"),
+    ({"simple_form": False}, STRONG, "open-ended question"),
+])
+def test_routing_policy(changes, tier, reason):
+    choice = choose_model(QuestionFeatures(**{**CONFIDENT, **changes}), CONFIDENT_SIMILARITY)
+    assert (choice.tier, choice.reason) == (tier, reason)
+
+
+def test_routing_can_be_turned_off(monkeypatch):
+    monkeypatch.setattr(model_router, "RAG_MODEL_ROUTING", False)
+    assert choose_model(QuestionFeatures(**CONFIDENT), CONFIDENT_SIMILARITY).tier == STRONG
+
+
+def test_features_come_from_the_question_and_its_candidates():
+    doc = Document(page_content="Starter costs 49 dollars.")
+    features = question_features(
+        "How much does the Starter plan cost?",
+        [Candidate(doc, None, 1), Candidate(doc, 0.81, 2), Candidate(doc, 0.86, None)],
+    )
+    assert features.simple_form and not features.hard_terms and features.products == 0
+    assert features.best_similarity == 0.86 and features.lexical_agrees
+    features = question_features("Why pick PrimeLeads over PrimeCRM?", [])
+    assert features.hard_terms and features.products == 2
+    assert features.best_similarity is None and not features.lexical_agrees
+
+
+def test_unsure_opening_waits_for_enough_of_a_stream():
+    assert unsure_opening("I don't know") is True
+    assert unsure_opening("  I'm sorry, the context doesn't say.") is True
+    assert unsure_opening("Starter") is None
+    assert unsure_opening("Starter", done=True) is False
+    assert unsure_opening("", done=True) is True
+    assert unsure_opening("The Starter plan costs 49 dollars per month, billed monthly.") is False
+
+
+def test_escalations_are_charged_to_the_strong_tier():
+    router = ModelRouter()
+    fast = choose_model(QuestionFeatures(**CONFIDENT), CONFIDENT_SIMILARITY)
+    router.record(fast, 0.4, 1000, 10)
+    router.record(escalate(fast, (1000, 10)), 3.0, 1000, 200)
+
+    stats = router.stats()
+    assert stats[FAST]["answers"] == 0 and stats[STRONG]["answers"] == 1
+    assert stats["escalations"] == 1 and stats["escalation_rate"] == 1.0
+    assert stats[STRONG]["latency_ms_p50"] == pytest.approx(3000)
+    # Nothing was saved, and the unsure fast attempt was paid for on top
+    assert stats["cost_saved_usd"] == pytest.approx(-(1000 * 0.15 + 10 * 0.6) / 1e6)
+
+    router.record(fast, 0.5, 1000, 100)
+    stats = router.stats()
+    assert stats[FAST]["answers"] == 1 and stats["escalation_rate"] == 0.5
+    assert stats[FAST]["cost_usd"] == pytest.approx((1000 * 0.15 + 10 * 0.6 + 1000 * 0.15 + 100 * 0.6) / 1e6)
+    # The kept fast answer saved the difference to its strong price
+    saved = model_router.cost("gpt-4", 1000, 100) - model_router.cost("gpt-4o-mini", 1000, 100)
+    assert stats["cost_saved_usd"] == pytest.approx(saved - 0.000156)
@@ -0,0 +1,53 @@
+from langchain.schema.document import Document
+
+from fake_embeddings import CountingEmbeddings
+from faiss_store import current_store, load_store
+from near_duplicates import NearDuplicateIndex, minhash, similarity
+from populate_db import calculate_chunk_ids, index_chunks
+
+BOUNDARIES = (
+    "PrimeLeads handles lead identification, enrichment, scoring, ranking and shortlisting. "
+    "PrimeRecruits handles candidate identification, profiling, scoring and shortlisting. "
+    "Neither product does outreach: PrimeReachOut is the exclusive owner of messaging, "
+    "reply analysis and calendar scheduling for every campaign."
+)
+PRICING = "The Starter plan costs 49 dollars per month and includes 500 credits with overage billed per credit."
+
+
+def _chunk(text, source, page=0):
+    return Document(page_content=text, metadata={"source": source, "page": page})
+
+
+def test_minhash_estimates_jaccard():
+    edited = BOUNDARIES.replace("every campaign", "all campaigns")
+    assert similarity(minhash(BOUNDARIES), minhash(BOUNDARIES.upper())) == 1.0
+    assert similarity(minhash(BOUNDARIES), minhash(edited)) > 0.8
+    assert similarity(minhash(BOUNDARIES), minhash(PRICING)) < 0.2
+
+
+def test_ingestion_keeps_one_representative_and_promotes_on_delete(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    embeddings = CountingEmbeddings()
+    monkeypatch.setattr("populate_db.get_embedding_function", lambda: embeddings)
+
+    chunks = calculate_chunk_ids([
+        _chunk(BOUNDARIES, "data/kb.pdf"),
+        _chunk(PRICING, "data/kb.pdf", page=1),
+        _chunk(BOUNDARIES.replace("every campaign", "all campaigns"), "data/part1.pdf"),
+        _chunk(BOUNDARIES + " ", "data/part2.pdf", page=3),
+    ])
+    index_chunks(chunks, "faiss_index")
+    assert len(embeddings.texts) == 2
+
+    representative = chunks[0].metadata["id"]
+    near_dups = NearDuplicateIndex("faiss_index")
+    assert [d["source"] for d in near_dups.duplicates_of(representative)] == ["data/part1.pdf", "data/part2.pdf"]
+    near_dups.close()
+
+    # kb.pdf is edited and loses the paragraph: a copy from another PDF takes its place
+    index_chunks([], "faiss_index", delete_ids={representative})
+    db = load_store(current_store("faiss_index"), embeddings, writable=True)
+    sources = sorted(doc.metadata["source"] for doc in db.docstore._dict.values())
+    assert sources == ["data/kb.pdf", "data/part1.pdf"]
+    near_dups = NearDuplicateIndex("faiss_index")
+    assert near_dups.counts() == (2, 1)
@@ -0,0 +1,25 @@
+from langchain_community.document_loaders import PyPDFDirectoryLoader
+from pypdf import PdfWriter
+
+from bench_pdf_loading import write_synthetic_pdf
+from parallel_pdf_loader import load_pdfs_parallel
+
+
+def test_same_pages_and_metadata_as_pypdf_directory_loader(tmp_path):
+    for name, pages in [("b.pdf", 5), ("a.pdf", 3), ("nested/c.pdf", 7)]:
+        (tmp_path / name).parent.mkdir(exist_ok=True)
+        write_synthetic_pdf(str(tmp_path / name), pages, lines_per_page=3)
+    writer = PdfWriter(clone_from=str(tmp_path / "a.pdf"))
+    writer.add_metadata({"/Author": " FastAutomate ", "/CreationDate": "D:20250811144114+01'00'"})
+    writer.write(str(tmp_path / "a.pdf"))
+
+    # PyPDFDirectoryLoader returns the files in directory order, the parallel loader sorted
+    expected = sorted(
+        (d.metadata["source"], d.metadata["page"], d.page_content, d.metadata)
+        for d in PyPDFDirectoryLoader(str(tmp_path)).load()
+    )
+    assert expected[0][3]["author"] == "FastAutomate"
+    assert expected[0][3]["creationdate"] == "2025-08-11T14:41:14+01:00"
+    for workers, pages_per_task in [(1, 32), (2, 2), (3, 1)]:
+        docs = load_pdfs_parallel(str(tmp_path), workers=workers, pages_per_task=pages_per_task)
+        assert [(d.metadata["source"], d.metadata["page"], d.page_content, d.metadata) for d in docs] == expected
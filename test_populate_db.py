@@ -0,0 +1,38 @@
+from langchain.schema.document import Document
+
+import populate_db
+from fake_embeddings import CountingEmbeddings, NoEmbeddings
+from faiss_store import current_store, load_store
+from populate_db import add_to_faiss, chunk_id, clear_database
+
+PAGES = [
+    (0, "PrimeLeads scores and ranks leads from your ideal customer profile."),
+    (0, "PrimeLeads scores and ranks leads from your ideal customer profile."),
+    (1, "PrimeVision records a workflow once and replays it on every document."),
+    (2, "Every plan includes 500 credits per month, with overage billed per credit."),
+]
+
+
+def _chunks():
+    return [Document(page_content=text, metadata={"source": "data/kb.pdf", "page": page}) for page, text in PAGES]
+
+
+def test_a_cold_build_embeds_each_chunk_once(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    embeddings = CountingEmbeddings()
+    monkeypatch.setattr(populate_db, "get_embedding_function", lambda: embeddings)
+
+    add_to_faiss(_chunks())
+    unique = sorted(set(text for _, text in PAGES))
+    assert sorted(embeddings.texts) == unique
+    db = load_store(current_store("faiss_index"), NoEmbeddings(), writable=True)
+    assert sorted(db.docstore._dict) == sorted({chunk_id("data/kb.pdf", page, text) for page, text in PAGES})
+    assert db.index.ntotal == len(unique)
+    assert "Chunks embedded: 3 (3 via API, 0 from cache), skipped: 1" in capsys.readouterr().out
+
+    # Nothing new on a second run, and a rebuild after --reset takes every vector from the cache
+    add_to_faiss(_chunks())
+    clear_database()
+    add_to_faiss(_chunks())
+    assert sorted(embeddings.texts) == unique
+    assert "Chunks embedded: 3 (0 via API, 3 from cache), skipped: 1" in capsys.readouterr().out
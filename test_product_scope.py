@@ -0,0 +1,110 @@
+import numpy as np
+from langchain.schema.document import Document
+from langchain.vectorstores.faiss import FAISS
+
+import hybrid_search
+from ann_index import IndexConfig, apply_index_config, resolve_config, search_within
+from chunker import iter_chunks
+from fake_embeddings import NoEmbeddings
+from lexical_index import LexicalIndex
+from product_scope import (
+    ProductPartitions,
+    detect_products,
+    save_partitions,
+    tag_chunks,
+)
+from rag_runtime import IndexSnapshot
+
+TEXTS = [
+    "PrimeLeads scores and ranks leads from your ideal customer profile.",
+    "Leads are exported as CSV with their score.",
+    "PrimeRecruits screens candidates and exports a shortlist of leads.",
+    "VisionFlow records the screen once and replays the workflow.",
+    "Every plan includes 500 leads credits per month.",
+]
+SECTIONS = ["3.2 PrimeLeads", "3.2 PrimeLeads", "3.3 PrimeRecruits", "3.1 PrimeVision", "4. Pricing"]
+
+
+def _db():
+    chunks = tag_chunks([
+        Document(page_content=text, metadata={"id": f"c{i}", "section": section})
+        for i, (text, section) in enumerate(zip(TEXTS, SECTIONS))
+    ])
+    vectors = np.random.default_rng(0).standard_normal((len(TEXTS), 8)).astype(np.float32)
+    db = FAISS.from_embeddings(
+        [(c.page_content, v.tolist()) for c, v in zip(chunks, vectors)],
+        NoEmbeddings(),
+        metadatas=[c.metadata for c in chunks],
+        ids=[c.metadata["id"] for c in chunks],
+    )
+    return db, vectors
+
+
+def test_detect_products_accepts_spelling_variants():
+    assert detect_products("Does Prime Reach-Out book meetings?") == ["primereachout"]
+    assert detect_products("VisionFlow vs PrimeCRM") == ["primevision", "primecrm"]
+    assert detect_products("How much does it cost?") == []
+
+
+def test_chunks_are_tagged_from_section_and_text():
+    pages = [Document(
+        page_content="3.2 PrimeLeads — Lead Generation\n\nLeads are scored by fit.\n\n"
+        "3.3 PrimeCRM — Data Hygiene\n\nDuplicates are merged nightly.",
+        metadata={"source": "kb.pdf", "page": 0},
+    )]
+    chunks = tag_chunks(list(iter_chunks(pages, chunk_tokens=12, overlap_tokens=0)))
+    assert [c.metadata["products"] for c in chunks] == [["primeleads"], ["primecrm"]]
+    assert chunks[1].metadata["section"] == "3.3 PrimeCRM — Data Hygiene"
+
+
+def test_partition_search_only_returns_the_named_products(tmp_path):
+    db, vectors = _db()
+    assert save_partitions(db, str(tmp_path), resolve_config({})) == {
+        "primeleads": 2, "primerecruits": 1, "primevision": 1, "general": 1,
+    }
+    partitions = ProductPartitions.open(str(tmp_path), nprobe=1, ef_search=16)
+    assert partitions.size(["primeleads"]) == 2
+
+    hits = partitions.search(["primeleads"], vectors[3].tolist(), k=4)
+    assert {chunk_id for chunk_id, _ in hits} == {"c0", "c1"}
+    hits = partitions.search(["primerecruits", "primevision"], vectors[3].tolist(), k=4)
+    assert hits[0] == ("c3", 0.0)
+
+
+def test_compressed_partitions_keep_the_stored_codes(tmp_path):
+    db, vectors = _db()
+    db, _ = apply_index_config(db, IndexConfig(codec="int8", reduce="pca", reduce_dim=4), {})
+    save_partitions(db, str(tmp_path), resolve_config({}))
+    partitions = ProductPartitions.open(str(tmp_path), nprobe=1, ef_search=16)
+
+    query = vectors[1].tolist()
+    expected = [(db.index_to_docstore_id[p], d) for p, d in search_within(db.index, query, [0, 1], 2)]
+    hits = partitions.search(["primeleads"], query, k=2)
+    assert [chunk_id for chunk_id, _ in hits] == [chunk_id for chunk_id, _ in expected]
+    assert np.allclose([d for _, d in hits], [d for _, d in expected])
+
+
+def test_positions_past_the_id_map_are_skipped(tmp_path):
+    db, vectors = _db()
+    save_partitions(db, str(tmp_path), resolve_config({}))
+    partitions = ProductPartitions.open(str(tmp_path), nprobe=1, ef_search=16)
+    partitions.ids["primeleads"] = partitions.ids["primeleads"][:1]
+    assert [chunk_id for chunk_id, _ in partitions.search(["primeleads"], vectors[1].tolist(), k=2)] == ["c0"]
+
+
+def test_scoped_search_filters_dense_and_lexical_hits(tmp_path):
+    db, vectors = _db()
+    save_partitions(db, str(tmp_path), resolve_config({}))
+    LexicalIndex(str(tmp_path)).sync(db)
+    lexical = LexicalIndex.open(str(tmp_path))
+    assert {chunk_id for chunk_id, _ in lexical.search("shortlist of leads", 5)} == {"c0", "c1", "c2", "c4"}
+    assert [chunk_id for chunk_id, _ in lexical.search("shortlist of leads", 4, ["primerecruits"])] == ["c2"]
+
+    snapshot = IndexSnapshot("test", db, None, lexical, ProductPartitions.open(str(tmp_path), nprobe=1, ef_search=16))
+    docs = hybrid_search.search(snapshot, "How does PrimeLeads score leads?", vectors[3].tolist(), k=4)
+    # The product's chunks and the general ones, never another product's
+    assert {doc.metadata["id"] for doc in docs} == {"c0", "c1", "c4"}
+    # Questions that name no product search everything
+    docs = hybrid_search.search(snapshot, "How are leads scored?", vectors[3].tolist(), k=5)
+    assert len(docs) == 5
+    lexical.close()
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from fake_embeddings import CountingEmbeddings
+from query_batcher import QueryEmbeddingBatcher
+
+
+def _embed_all(batcher, texts):
+    async def run():
+        return await asyncio.gather(*(batcher.embed_query(t) for t in texts), return_exceptions=True)
+
+    return asyncio.run(run())
+
+
+def test_concurrent_questions_share_one_call_and_get_their_own_vectors():
+    embeddings = CountingEmbeddings()
+    batcher = QueryEmbeddingBatcher(embeddings, window_ms=20, max_batch=16)
+    vectors = _embed_all(batcher, ["a", "bb", "ccc", "bb"])
+    assert vectors == [[1.0, 1.0], [2.0, 1.0], [3.0, 1.0], [2.0, 1.0]]
+    # One request, and the repeated question is sent once
+    assert embeddings.calls == [["a", "bb", "ccc"]]
+    stats = batcher.stats()
+    assert (stats["requests"], stats["calls"], stats["calls_saved"], stats["texts_deduplicated"]) == (4, 1, 3, 1)
+
+
+def test_full_batches_are_sent_without_waiting_for_the_window():
+    embeddings = CountingEmbeddings()
+    batcher = QueryEmbeddingBatcher(embeddings, window_ms=10_000, max_batch=4)
+    _embed_all(batcher, [f"q{i}" for i in range(8)])
+    assert [len(batch) for batch in embeddings.calls] == [4, 4]
+    assert batcher.stats()["wait_ms_p95"] < 1000
+
+
+def test_a_failed_call_fails_every_question_of_its_batch():
+    batcher = QueryEmbeddingBatcher(CountingEmbeddings(fail=True), window_ms=5, max_batch=16)
+    results = _embed_all(batcher, ["a", "b"])
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.parametrize("window_ms, max_batch", [(0, 16), (5, 1)])
+def test_batching_can_be_turned_off(window_ms, max_batch):
+    embeddings = CountingEmbeddings()
+    batcher = QueryEmbeddingBatcher(embeddings, window_ms=window_ms, max_batch=max_batch)
+    _embed_all(batcher, ["a", "b", "c"])
+    assert embeddings.calls == [["a"], ["b"], ["c"]]
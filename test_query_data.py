@@ -0,0 +1,120 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+from langchain.schema.document import Document
+from langchain_core.messages import AIMessage
+
+import query_data
+from fake_embeddings import CountingEmbeddings
+from model_router import FAST, RAG_FAST_MODEL, RAG_STRONG_MODEL, STRONG, ModelChoice, ModelRouter
+from token_utils import count_tokens
+
+
+class _ChatModel:
+    """Answers after `latency` seconds, reporting the usage an API would."""
+
+    def __init__(self, latency: float = 0.0, answer: str = "PrimeLeads scores leads.", usage=(1200, 7)):
+        self.latency = latency
+        self.answer = answer
+        self.usage = usage
+        self.prompts = []
+
+    def invoke(self, messages):
+        self.prompts.append(messages)
+        time.sleep(self.latency)
+        input_tokens, output_tokens = self.usage
+        return AIMessage(
+            content=self.answer,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        )
+
+
+def _runtime(embeddings, llm_for):
+    return SimpleNamespace(
+        snapshot=lambda: SimpleNamespace(version="test"),
+        answer_cache=None,
+        embeddings=embeddings,
+        llm_for=llm_for,
+        model_router=ModelRouter(),
+    )
+
+
+def test_only_the_question_is_embedded_and_usage_is_reported(monkeypatch):
+    embeddings, llm = CountingEmbeddings(), _ChatModel(latency=0.05)
+    runtime = _runtime(embeddings, lambda tier: llm)
+    monkeypatch.setattr(query_data, "get_runtime", lambda: runtime)
+    docs = [Document(page_content="PrimeLeads ranks leads by fit score.", metadata={"id": "c0"})]
+    choice = ModelChoice(FAST, RAG_FAST_MODEL, "test")
+    monkeypatch.setattr(query_data, "_context", lambda snapshot, question, vector: (None, docs, choice))
+
+    result = query_data.answer_question("  What does   PrimeLeads do? ")
+    assert embeddings.texts == ["What does PrimeLeads do?"]
+    # The instructions go to the LLM once, as the system message
+    assert llm.prompts[0][0] is query_data.SYSTEM_MESSAGE
+    assert result["stats"] == {
+        "embedding_tokens": count_tokens("What does PrimeLeads do?"),
+        "embedding_tokens_saved": count_tokens(query_data.SYSTEM_PROMPT),
+        "llm_input_tokens": 1200,
+        "llm_output_tokens": 7,
+        "context_tokens": count_tokens("PrimeLeads ranks leads by fit score."),
+        "cache": "off",
+        "model": RAG_FAST_MODEL,
+        "tier": FAST,
+    }
+    latency = runtime.model_router.stats()[FAST]["latency_ms_p50"]
+    assert 50 <= latency < 1000
+
+
+def test_an_escalated_answer_reports_the_tokens_of_both_attempts(monkeypatch):
+    llms = {
+        FAST: _ChatModel(answer="I don't know, the context does not say.", usage=(1000, 10)),
+        STRONG: _ChatModel(),
+    }
+    runtime = _runtime(CountingEmbeddings(), llms.__getitem__)
+    monkeypatch.setattr(query_data, "get_runtime", lambda: runtime)
+    docs = [Document(page_content="PrimeLeads ranks leads by fit score.", metadata={"id": "c0"})]
+    choice = ModelChoice(FAST, RAG_FAST_MODEL, "test")
+    monkeypatch.setattr(query_data, "_context", lambda snapshot, question, vector: (None, docs, choice))
+
+    result = query_data.answer_question("How does PrimeLeads rank leads?")
+    assert result["answer"] == "PrimeLeads scores leads."
+    assert result["stats"]["llm_input_tokens"] == 1000 + 1200
+    assert result["stats"]["llm_output_tokens"] == 10 + 7
+    assert (result["stats"]["model"], result["stats"]["tier"]) == (RAG_STRONG_MODEL, STRONG)
+
+
+def test_concurrent_aquery_rag_calls_retrieve_in_parallel(monkeypatch):
+    runtime = SimpleNamespace(
+        snapshot=lambda: SimpleNamespace(version="test"), answer_cache=None, embeddings=CountingEmbeddings()
+    )
+    monkeypatch.setattr(query_data, "get_runtime", lambda: runtime)
+    lock = threading.Lock()
+    active = peak = 0
+
+    def slow_context(snapshot, question, vector):
+        # Stands in for the blocking FAISS / BM25 search and context packing
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.2)
+        with lock:
+            active -= 1
+        return {"answer": question}, [], None
+
+    monkeypatch.setattr(query_data, "_context", slow_context)
+    questions = [f"What does product {i} do?" for i in range(4)]
+
+    async def run():
+        return await asyncio.gather(*(query_data.aquery_rag(q) for q in questions))
+
+    start = time.perf_counter()
+    assert asyncio.run(run()) == questions
+    assert peak > 1
+    assert time.perf_counter() - start < 0.2 * len(questions)
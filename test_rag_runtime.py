@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+import pytest
+from langchain.schema.document import Document
+from langchain.vectorstores.faiss import FAISS
+
+import get_embading_function
+import rag_runtime
+from ann_index import resolve_config
+from faiss_store import INDEX_FILE, LEGACY_DOCSTORE_FILE, new_version, publish_version
+from get_embading_function import get_embedding_function
+from populate_db import save_index
+from rag_runtime import RagRuntime
+
+
+def _db(texts):
+    chunks = [Document(page_content=t, metadata={"id": f"id-{i}", "source": "data/a.pdf"}) for i, t in enumerate(texts)]
+    return FAISS.from_documents(chunks, get_embedding_function("hash"), ids=[c.metadata["id"] for c in chunks])
+
+
+@pytest.fixture
+def runtime_env(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")  # the chat models are built, never called
+    monkeypatch.setattr(get_embading_function, "EMBEDDING_BACKEND", "hash")
+    monkeypatch.setattr(rag_runtime, "RELOAD_CHECK_INTERVAL", 0.0)
+
+
+def test_a_new_version_is_swapped_in_and_the_old_snapshot_keeps_working(tmp_path, runtime_env):
+    path = str(tmp_path)
+    save_index(_db(["PrimeVision automates documents."]), path, resolve_config({}), {})
+    runtime = RagRuntime(path)
+    served = runtime.snapshot()
+    assert runtime.snapshot() is served
+
+    save_index(_db(["PrimeVision automates documents.", "PrimeLeads scores leads."]), path, resolve_config({}), {})
+    swapped = runtime.snapshot()
+    assert swapped is not served and swapped.version != served.version and runtime.reloads == 2
+    assert swapped.db.index.ntotal == 2 and swapped.lexical.ids() == {"id-0", "id-1"}
+    assert served.db.similarity_search("PrimeVision", k=1)[0].id == "id-0"
+
+
+def test_an_unreadable_index_is_an_error_only_without_a_snapshot(tmp_path, runtime_env):
+    path = str(tmp_path)
+    save_index(_db(["PrimeVision automates documents."]), path, resolve_config({}), {})
+    runtime = RagRuntime(path)
+    served = runtime.snapshot()
+
+    broken = new_version(path)
+    for name in (INDEX_FILE, LEGACY_DOCSTORE_FILE):
+        with open(os.path.join(broken, name), "wb") as f:
+            f.write(b"not an index")
+    publish_version(path, broken)
+    assert runtime.snapshot() is served
+
+    with pytest.raises(RuntimeError, match="not recognized"):
+        RagRuntime(path).snapshot()
@@ -0,0 +1,97 @@
+import numpy as np
+from langchain.schema.document import Document
+from langchain.vectorstores.faiss import FAISS
+
+import hybrid_search
+from fake_embeddings import NoEmbeddings
+from rag_runtime import IndexSnapshot
+from section_summaries import load_summaries, save_summaries, summarize
+
+SECTIONS = {
+    "1. Company": ["FastAutomate builds automation products. It was founded in 2020.", "Its motto is simple."],
+    "2. Pricing": ["Plans are billed per credit. Starter costs 49 dollars.", "Overage is billed per credit."],
+    "3. Support": ["Support answers within a day. Email is the fastest channel."],
+}
+
+
+def _db():
+    """Chunks of a section lie close together; each section has its own direction."""
+    rng = np.random.default_rng(0)
+    texts, metadatas, vectors = [], [], []
+    for s, (section, chunks) in enumerate(SECTIONS.items()):
+        for c, text in enumerate(chunks):
+            vector = np.full(8, 0.05, dtype=np.float32)
+            vector[s] = 1.0
+            vector += rng.normal(0, 0.05, 8).astype(np.float32)
+            texts.append(text)
+            vectors.append(vector / np.linalg.norm(vector))
+            metadatas.append({"id": f"kb.pdf:{s}:{c}", "source": "data/kb.pdf", "page": s, "section": section})
+    db = FAISS.from_embeddings(
+        [(t, v.tolist()) for t, v in zip(texts, vectors)],
+        NoEmbeddings("summaries must not be embedded"),
+        metadatas=metadatas,
+        ids=[m["id"] for m in metadatas],
+    )
+    return db, vectors
+
+
+def test_summary_is_title_heading_and_lead_sentences():
+    chunks = [Document(page_content=text) for text in SECTIONS["2. Pricing"]]
+    assert summarize("data/kb.pdf", "2. Pricing", chunks) == (
+        "kb — 2. Pricing\nPlans are billed per credit.\nOverage is billed per credit."
+    )
+    assert summarize("data/kb.pdf", "2. Pricing", chunks, max_tokens=12).count("\n") == 1
+
+
+def test_summaries_group_chunks_by_section_without_embedding(tmp_path):
+    db, _ = _db()
+    assert save_summaries(db, str(tmp_path)) == 3
+    summaries = load_summaries(str(tmp_path), NoEmbeddings("summaries must not be embedded"))
+    sections = {doc.metadata["section"]: doc.metadata for doc in (
+        summaries.docstore.search(i) for i in summaries.index_to_docstore_id.values()
+    )}
+    assert sections["2. Pricing"]["ids"] == ["kb.pdf:1:0", "kb.pdf:1:1"]
+    assert sections["2. Pricing"]["positions"] == [2, 3]
+
+
+def test_dense_search_stays_within_the_chosen_sections(tmp_path, monkeypatch):
+    monkeypatch.setattr(hybrid_search, "RAG_HIERARCHICAL_MIN_CHUNKS", 0)
+    db, vectors = _db()
+    save_summaries(db, str(tmp_path))
+    summaries = load_summaries(str(tmp_path), NoEmbeddings("summaries must not be embedded"))
+    snapshot = IndexSnapshot("test", db, None, summaries=summaries)
+
+    assert [s.metadata["section"] for s in hybrid_search.chosen_sections(snapshot, vectors[2], k=1)] == ["2. Pricing"]
+    monkeypatch.setattr(hybrid_search, "RAG_SECTION_K", 1)
+    docs = hybrid_search.search(snapshot, "How is overage billed?", vectors[2].tolist(), k=5)
+    assert [doc.metadata["id"] for doc in docs] == ["kb.pdf:1:0", "kb.pdf:1:1"]
+
+    # Small indexes keep one flat search over every chunk
+    monkeypatch.setattr(hybrid_search, "RAG_HIERARCHICAL_MIN_CHUNKS", 1000)
+    assert len(hybrid_search.search(snapshot, "How is overage billed?", vectors[2].tolist(), k=5)) == 5
+
+
+def test_summaries_of_a_legacy_index_without_sections_or_unique_ids(tmp_path, monkeypatch):
+    monkeypatch.setattr(hybrid_search, "RAG_HIERARCHICAL_MIN_CHUNKS", 0)
+    # Recursive-splitter chunks keyed by UUID: no section, and "id" repeated or missing
+    vectors = np.random.default_rng(0).standard_normal((14, 8)).astype(np.float32)
+    metadatas = [{"source": "data/kb.pdf", "page": i // 4} for i in range(14)]
+    for metadata in metadatas[1::2]:
+        metadata["id"] = "data/kb.pdf:0"
+    db = FAISS.from_embeddings(
+        [(f"Chunk {i}. More text.", v.tolist()) for i, v in enumerate(vectors)],
+        NoEmbeddings("summaries must not be embedded"),
+        metadatas=metadatas,
+        ids=[f"uuid-{i}" for i in range(14)],
+    )
+    assert save_summaries(db, str(tmp_path)) == 2  # 14 chunks of one source, in runs of 12
+    summaries = load_summaries(str(tmp_path), NoEmbeddings("summaries must not be embedded"))
+    entries = [summaries.docstore.search(i).metadata for i in summaries.index_to_docstore_id.values()]
+    assert [len(entry["ids"]) for entry in entries] == [12, 2] and entries[0]["section"] is None
+    assert sorted(chunk_id for entry in entries for chunk_id in entry["ids"]) == sorted(f"uuid-{i}" for i in range(14))
+
+    # The chunks of the chosen section are found through their docstore IDs
+    snapshot = IndexSnapshot("test", db, None, summaries=summaries)
+    monkeypatch.setattr(hybrid_search, "RAG_SECTION_K", 1)
+    docs = hybrid_search.search(snapshot, "Chunk 13", vectors[13].tolist(), k=1)
+    assert docs[0].page_content == "Chunk 13. More text."
@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def test_identical_calls_from_threads_share_one_result():
+    flights, calls, release = SingleFlight(), [], threading.Event()
+
+    def ask():
+        flight = flights.join("what is primeleads")
+        if not flight.leader:
+            return flight.result
+        with flight:
+            calls.append(1)
+            release.wait(5)
+            flight.publish("answer")
+        return flight.result
+
+    with ThreadPoolExecutor(8) as pool:
+        results = [pool.submit(ask) for _ in range(8)]
+        while not calls:
+            time.sleep(0.001)
+        time.sleep(0.05)  # let the followers queue up behind the leader
+        release.set()
+        assert [r.result() for r in results] == ["answer"] * 8
+    assert len(calls) == 1
+    stats = flights.stats()
+    assert (stats["requests"], stats["leaders"], stats["coalesced"], stats["in_flight"]) == (8, 1, 7, 0)
+    assert stats["coalescing_rate"] == pytest.approx(7 / 8)
+
+
+def _ask(flights, key, work):
+    async def ask():
+        flight = await flights.ajoin(key)
+        if not flight.leader:
+            return flight.result
+        with flight:
+            flight.publish(await work())
+        return flight.result
+
+    return ask()
+
+
+def test_async_followers_get_the_leaders_result_or_exception():
+    flights, calls = SingleFlight(), []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return "answer"
+
+    async def fail():
+        await asyncio.sleep(0.02)
+        raise RuntimeError("LLM down")
+
+    async def run():
+        same = await asyncio.gather(*(_ask(flights, "q", work) for _ in range(5)), _ask(flights, "other", work))
+        failed = await asyncio.gather(*(_ask(flights, "q", fail) for _ in range(3)), return_exceptions=True)
+        return same, failed
+
+    same, failed = asyncio.run(run())
+    assert same == ["answer"] * 6 and len(calls) == 2
+    assert all(isinstance(e, RuntimeError) for e in failed)
+    # Nothing is remembered once a flight lands
+    assert asyncio.run(_ask(flights, "q", work)) == "answer" and len(calls) == 3
+
+
+def test_a_cancelled_leader_hands_the_work_to_a_follower():
+    flights, calls = SingleFlight(), []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return f"answer {len(calls)}"
+
+    async def run():
+        leader = asyncio.create_task(_ask(flights, "q", work))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(_ask(flights, "q", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(run()) == "answer 2"
+    assert flights.stats()["in_flight"] == 0
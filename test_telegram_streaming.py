@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+from telegram.error import BadRequest, RetryAfter
+
+import telegram_streaming
+from intent_router import ASK_TOKEN
+from telegram_streaming import stream_reply
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+class _Message:
+    """Stands in for telegram.Message: records replies and edits, fails like the Bot API does."""
+
+    def __init__(self, rate_limited: int = 0):
+        self.replies = []
+        self.edits = []
+        self.rate_limited = rate_limited
+
+    async def reply_text(self, text):
+        if not text.strip():
+            raise BadRequest("Message text is empty")
+        reply = _Message(self.rate_limited)
+        self.replies.append((text, reply))
+        return reply
+
+    async def edit_text(self, text):
+        if self.rate_limited:
+            self.rate_limited -= 1
+            raise RetryAfter(3)
+        self.edits.append(text)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(telegram_streaming.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(telegram_streaming, "EDIT_INTERVAL", 1.0)
+    return clock
+
+
+def _stream(clock, timed_chunks):
+    async def chunks():
+        for at, chunk in timed_chunks:
+            clock.now = at
+            yield chunk
+    return chunks()
+
+
+def test_edits_are_throttled_to_one_per_interval(clock):
+    incoming = _Message()
+    timed = [(0.0, "Prime"), (0.3, "Leads"), (0.9, " scores"), (1.2, " leads"), (1.5, " by"), (2.4, " fit.")]
+    assert asyncio.run(stream_reply(incoming, _stream(clock, timed))) == "PrimeLeads scores leads by fit."
+
+    [(first, message)] = incoming.replies
+    assert first == "Prime"
+    # One edit per second of stream, then the final text
+    assert message.edits == ["PrimeLeads scores leads", "PrimeLeads scores leads by fit."]
+
+
+def test_rate_limited_edits_wait_and_are_retried(clock, monkeypatch):
+    waits = []
+
+    async def sleep(delay):
+        waits.append(delay)
+
+    monkeypatch.setattr(telegram_streaming.asyncio, "sleep", sleep)
+    incoming = _Message(rate_limited=2)
+    timed = [(0.0, "PrimeVision"), (1.5, " automates"), (1.6, " documents.")]
+    asyncio.run(stream_reply(incoming, _stream(clock, timed)))
+
+    [(_, message)] = incoming.replies
+    # The throttled edit is skipped after its back-off, the final one is retried until it lands
+    assert waits == [3, 3] and message.edits == ["PrimeVision automates documents."]
+
+
+def test_blank_first_chunks_are_buffered(clock):
+    incoming = _Message()
+    timed = [(0.0, " "), (0.1, "\n"), (0.2, "Hello"), (0.3, "!")]
+    asyncio.run(stream_reply(incoming, _stream(clock, timed)))
+    [(first, message)] = incoming.replies
+    assert first == " \nHello" and message.edits == [" \nHello!"]
+
+
+def test_routed_replies_are_left_to_the_caller(clock):
+    incoming = _Message()
+    reply = f"{ASK_TOKEN} 🔗 Please provide the URL you want PrimeLeads to process."
+    assert asyncio.run(stream_reply(incoming, _stream(clock, [(0.0, reply)]))) == reply
+    assert incoming.replies == []
@@ -0,0 +1,35 @@
+import numpy as np
+from langchain.vectorstores.faiss import FAISS
+
+from fake_embeddings import NoEmbeddings
+from faiss_store import current_store, load_store
+from populate_db import chunk_id, vacuum_index
+
+
+def test_chunk_id_is_separator_independent():
+    assert chunk_id("data\\a.pdf", 0, "text") == chunk_id("data/a.pdf", 0, "text")
+    assert chunk_id("data/a.pdf", 0, "text") != chunk_id("data/a.pdf", 1, "text")
+
+
+def test_vacuum_drops_duplicates_and_orphans_and_rekeys(tmp_path, monkeypatch):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a.pdf").write_bytes(b"%PDF")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("populate_db.get_embedding_function", lambda: NoEmbeddings("vacuum must not embed"))
+
+    rows = [("alpha", "data\\a.pdf"), ("alpha", "data/a.pdf"), ("beta", "data/a.pdf"), ("gone", "data/b.pdf")]
+    vectors = np.random.default_rng(0).standard_normal((len(rows), 8)).astype(np.float32)
+    db = FAISS.from_embeddings(
+        [(text, v.tolist()) for (text, _), v in zip(rows, vectors)],
+        NoEmbeddings("vacuum must not embed"),
+        metadatas=[{"source": source, "page": 0} for _, source in rows],
+        ids=[f"uuid-{i}" for i in range(len(rows))],
+    )
+    db.save_local("faiss_index")  # legacy pickle format
+
+    vacuum_index("faiss_index", "data")
+
+    compact = load_store(current_store("faiss_index"), NoEmbeddings("vacuum must not embed"), writable=True)
+    assert sorted(compact.docstore._dict) == sorted([chunk_id("data/a.pdf", 0, "alpha"), chunk_id("data/a.pdf", 0, "beta")])
+    assert np.allclose(compact.index.reconstruct(0), vectors[0])